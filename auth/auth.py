@@ -1,18 +1,44 @@
 import jwt
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from jwt import InvalidTokenError
 from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
+from auth.users import SqliteUserRepository, MemoryUserRepository
+from utils.timing import timings
+from config.configurator import ConfigManager
+from config.defaultParams import USERS_BACKEND, USERS_DB_PATH, USERS_CHECK_INTERVAL
 
 
 SECRET_KEY = "5a6a3d12b34d62006fa989d1ca11c80b72e2a02d78ed46960b50c3c88e466a17"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480
 
-# TODO: Implement a real database
+# Validated tokens kept in memory, and the maximum time (seconds) one is trusted without being decoded again
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TTL = 300
+
+# Password hashes are verified by a dedicated pool of threads, with at most PASSWORD_MAX_PENDING logins waiting
+PASSWORD_WORKERS = 2
+PASSWORD_MAX_PENDING = 32
+
+# Failed logins allowed per user and per IP address within LOGIN_WINDOW seconds before the logins are locked out.
+# The lockout starts at LOGIN_LOCKOUT seconds and doubles with every further failure, up to LOGIN_LOCKOUT_MAX
+LOGIN_MAX_FAILURES_USER = 5
+LOGIN_MAX_FAILURES_IP = 20
+LOGIN_WINDOW = 300
+LOGIN_LOCKOUT = 30
+LOGIN_LOCKOUT_MAX = 900
+LOGIN_THROTTLE_SIZE = 10000
+
+# Users created when the user database is empty (see create_user_repository)
 fake_users_db = {
     "admin": {
         "username": "admin",
@@ -20,13 +46,15 @@ fake_users_db = {
         "email": "mobilenettelma@gmail.com",
         "hashed_password": "$2a$12$1tPWMprSKGQ2Gg9mClG91ecTea/48GCfR5vk4Pgv8HaDPywYU9.ma",
         "disabled": False,
+        "admin": True,
     },
     "alice": {
         "username": "alice",
         "full_name": "Alice Wonderson",
         "email": "alice@example.com",
-        "hashed_password": "fakehashedsecret2",
+        "hashed_password": "$2b$12$M4VxmddJ6ICNNONFCIaRnudHh/9j48/Uw8bbA0LWaftrNgmi3oFbu",
         "disabled": True,
+        "admin": False,
     },
 }
 
@@ -45,8 +73,9 @@ These models are used to define the structure of the data.
 - TokenData: Represents the data contained in the token.
 - User: Represents a user with username, email, full name, and disabled status.
 - UserInDB: Represents a user in the database with hashed password.
-
-TODO: User creation model
+- UserCreate: Represents a user to be created, with its plain password.
+- UserUpdate: Represents the changes of a user. Unset fields are not changed.
+- UserImport: Represents a user of a bulk import, with its plain or already hashed password.
 """
 
 class Token(BaseModel):
@@ -63,11 +92,306 @@ class User(BaseModel):
     email: str | None = None
     full_name: str | None = None
     disabled: bool | None = None
+    admin: bool | None = None
 
 class UserInDB(User):
     hashed_password: str
 
 
+class UserCreate(BaseModel):
+    username: str = Field(min_length=1, max_length=64, pattern=r'^[\w.@-]+$')
+    password: str = Field(min_length=8)
+    email: str | None = None
+    full_name: str | None = None
+    disabled: bool = False
+    admin: bool = False
+
+
+class UserUpdate(BaseModel):
+    password: str | None = Field(default=None, min_length=8)
+    email: str | None = None
+    full_name: str | None = None
+    disabled: bool | None = None
+    admin: bool | None = None
+
+
+class UserImport(BaseModel):
+    username: str = Field(min_length=1, max_length=64, pattern=r'^[\w.@-]+$')
+    password: str | None = Field(default=None, min_length=8, description="Plain password, hashed on import")
+    hashed_password: str | None = Field(default=None, description="bcrypt hash, stored as is (rejected if it is not a bcrypt hash)")
+    email: str | None = None
+    full_name: str | None = None
+    disabled: bool = False
+    admin: bool = False
+
+
+# ************************************************************************************************************************************************
+# Token cache
+# ************************************************************************************************************************************************
+
+class TokenCache:
+    """
+    Bounded LRU cache of validated tokens to their resolved user.
+
+    An entry expires at the token's exp claim (or after TOKEN_CACHE_TTL seconds, if sooner). The entries of a user are
+    dropped with invalidate_user when the user is disabled, deleted or changed. The entries are guarded by a lock, since
+    the user repository notifies its changes from the threads that write it.
+    The time spent resolving tokens on misses and on hits is accumulated to report the time saved per request.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, token: str):
+        """
+        Return the cached user of a token, if it is cached and not expired.
+
+        Parameters:
+        - token (str): The JWT token.
+
+        Returns:
+        - UserInDB: The user object, or None.
+        """
+
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+
+    def set(self, token: str, user, expires: float):
+        """
+        Cache the user of a validated token, evicting the least recently used token if the cache is full.
+
+        Parameters:
+        - token (str): The JWT token.
+        - user (UserInDB): The resolved user.
+        - expires (float): The exp claim of the token (seconds since epoch).
+        """
+
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (user, min(expires, time.time() + self.ttl))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+    def invalidate_user(self, username: str):
+        """
+        Drop the cached tokens of a user.
+
+        Parameters:
+        - username (str): The username.
+
+        Returns:
+        - int: The number of tokens dropped.
+        """
+
+        with self._lock:
+            tokens = [token for token, (user, _) in self._entries.items() if user.username == username]
+            for token in tokens:
+                del self._entries[token]
+        return len(tokens)
+
+
+    def clear(self):
+        """Drop every cached token."""
+
+        with self._lock:
+            self._entries.clear()
+
+
+    def get_stats(self):
+        """
+        Return the counters of the cache.
+
+        Returns:
+        - dict: The size, hits, misses, hit rate, mean resolution time of hits and misses (microseconds) and time saved.
+        """
+
+        requests = self.hits + self.misses
+        mean_hit = self.hit_time / self.hits if self.hits else 0.0
+        mean_miss = self.miss_time / self.misses if self.misses else 0.0
+        saved = (mean_miss - mean_hit) if self.hits and self.misses else 0.0
+        return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "mean_hit_us": mean_hit * 1e6, "mean_miss_us": mean_miss * 1e6,
+                "saved_per_hit_us": saved * 1e6, "saved_total_ms": saved * self.hits * 1e3}
+
+
+token_cache = TokenCache()
+
+
+# ************************************************************************************************************************************************
+# User repository
+# ************************************************************************************************************************************************
+
+def create_user_repository():
+    """
+    Create the user repository selected by USERS_BACKEND ("sqlite" or "memory"). A new repository is seeded with fake_users_db.
+
+    Returns:
+    - UserRepository: The repository.
+    """
+
+    if ConfigManager.get_parameters('USERS_BACKEND', USERS_BACKEND) == "memory":
+        return MemoryUserRepository(seed=fake_users_db)
+    return SqliteUserRepository(path=ConfigManager.get_parameters('USERS_DB_PATH', USERS_DB_PATH), seed=fake_users_db,
+                                check_interval=ConfigManager.get_parameters('USERS_CHECK_INTERVAL', USERS_CHECK_INTERVAL))
+
+
+users = create_user_repository()
+
+# A changed user (or every user, if the database was changed by another process) must be resolved again
+users.add_listener(lambda username: token_cache.clear() if username is None else token_cache.invalidate_user(username))
+
+
+# ************************************************************************************************************************************************
+# Login throttling
+# ************************************************************************************************************************************************
+
+class LoginThrottle:
+    """
+    Counts the failed logins per key (a username or an IP address) and locks the key out when it exceeds its limit.
+
+    The failures of a key are forgotten LOGIN_WINDOW seconds after the last one. At most LOGIN_THROTTLE_SIZE keys are
+    tracked, the least recently failed ones are forgotten first.
+
+    The attempts being verified are reserved per key. Once a key has failed, its attempts in progress count as failures
+    until they are released, so concurrent guesses cannot all pass the lockout check before their failures are recorded.
+    """
+
+    def __init__(self, window: float = LOGIN_WINDOW, lockout: float = LOGIN_LOCKOUT, lockout_max: float = LOGIN_LOCKOUT_MAX,
+                 maxsize: int = LOGIN_THROTTLE_SIZE):
+        self.window = window
+        self.lockout = lockout
+        self.lockout_max = lockout_max
+        self.maxsize = maxsize
+        self.rejected = 0
+        # key -> [failures, last failure, locked until]
+        self._entries = OrderedDict()
+        # key -> attempts being verified
+        self._pending = {}
+
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[1] > max(self.window, entry[2] - entry[1]):
+            del self._entries[key]
+            return None
+        return entry
+
+
+    def retry_after(self, key):
+        """
+        Return the seconds left in the lockout of a key.
+
+        Parameters:
+        - key (tuple): The key, e.g. ("user", "admin") or ("ip", "10.0.0.1").
+
+        Returns:
+        - float: The seconds left, 0 if the key is not locked out.
+        """
+
+        entry = self._get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry[2] - time.time())
+
+
+    def reserve(self, key, limit: int) -> bool:
+        """
+        Reserve an attempt of a key before its password is verified. Release it with release once verified.
+
+        Parameters:
+        - key (tuple): The key.
+        - limit (int): The failures allowed within the window.
+
+        Returns:
+        - bool: True if the attempt is reserved. False if the key has recent failures and the attempts in progress
+          already reach the failures it has left (one at a time once a lockout is over). A key without failures is never
+          refused, so concurrent correct logins (e.g. clients sharing an account or an address) are not throttled.
+        """
+
+        entry = self._get(key)
+        pending = self._pending.get(key, 0)
+        if entry is not None and pending >= max(1, limit - entry[0]):
+            return False
+        self._pending[key] = pending + 1
+        return True
+
+
+    def release(self, key):
+        """Release an attempt reserved with reserve."""
+
+        pending = self._pending.get(key, 0) - 1
+        if pending > 0:
+            self._pending[key] = pending
+        else:
+            self._pending.pop(key, None)
+
+
+    def failure(self, key, limit: int):
+        """
+        Record a failed login of a key, locking it out if it exceeds the limit.
+
+        Parameters:
+        - key (tuple): The key.
+        - limit (int): The failures allowed within the window.
+        """
+
+        now = time.time()
+        entry = self._get(key)
+        if entry is None:
+            entry = self._entries[key] = [0, now, 0.0]
+        entry[0] += 1
+        entry[1] = now
+        if entry[0] >= limit:
+            entry[2] = now + min(self.lockout_max, self.lockout * 2 ** (entry[0] - limit))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+    def reset(self, key):
+        """Forget the failures of a key (e.g. after a successful login)."""
+
+        self._entries.pop(key, None)
+
+
+    def get_stats(self):
+        """
+        Return the counters of the throttle.
+
+        Returns:
+        - dict: The keys tracked, the keys locked out, the attempts being verified and the logins rejected.
+        """
+
+        now = time.time()
+        return {"tracked": len(self._entries), "locked": sum(1 for entry in self._entries.values() if entry[2] > now),
+                "pending": sum(self._pending.values()), "rejected": self.rejected}
+
+
+login_throttle = LoginThrottle()
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password")
+password_pending = 0
+
+
 # ************************************************************************************************************************************************
 # Authentication functions
 # ************************************************************************************************************************************************
@@ -99,20 +423,33 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+def is_password_hash(hashed_password: str) -> bool:
+    """
+    Check that a value is a bcrypt hash that verify_password can check (e.g. an imported hashed_password).
+
+    Parameters:
+    - hashed_password (str): The value to check.
+
+    Returns:
+    - bool: True if the value is a bcrypt hash, False otherwise.
+    """
+    return pwd_context.identify(hashed_password, required=False) == "bcrypt"
+
+
 def get_user(db, username: str):
     """
     Extract the user from the database by username.
 
     Parameters:
-    - db: The database to search in.
+    - db: The database to search in (a user repository or a dictionary).
     - username (str): The username to search for.
 
     Returns:
     - UserInDB: The user object if found, None otherwise.
     """
 
-    if username in db:
-        user_dict = db[username]
+    user_dict = db.get(username)
+    if user_dict:
         return UserInDB(**user_dict)
     
 
@@ -123,7 +460,7 @@ def authenticate_user(fake_db, username: str, password: str):
     Otherwise, return False.
 
     Parameters:
-    - fake_db: The database to check against.
+    - fake_db: The database to check against (a user repository or a dictionary).
     - username (str): The username to authenticate.
     - password (str): The password to authenticate.
     """
@@ -136,6 +473,78 @@ def authenticate_user(fake_db, username: str, password: str):
     return UserInDB(**user)
 
 
+async def authenticate_user_throttled(fake_db, username: str, password: str, client: str | None = None):
+    """
+    Authenticate a user without blocking the event loop, throttling the failed attempts.
+
+    The user is read on the event loop and only its password hash is verified in password_executor. A username or
+    client address with too many recent failures is rejected before the hash is verified, and so are the attempts
+    beyond the failures it has left while others are being verified.
+
+    Parameters:
+    - fake_db: The database to check against.
+    - username (str): The username to authenticate.
+    - password (str): The password to authenticate.
+    - client (str | None): The IP address of the client.
+
+    Returns:
+    - UserInDB: The user object if the credentials are correct, False otherwise.
+
+    Raises:
+    - HTTPException: 429 if the username or the client is locked out or has too many attempts in progress, 503 if too
+      many logins are already waiting.
+    """
+
+    global password_pending
+
+    keys = [(("user", username), LOGIN_MAX_FAILURES_USER)]
+    if client is not None:
+        keys.append((("ip", client), LOGIN_MAX_FAILURES_IP))
+
+    retry_after = max(login_throttle.retry_after(key) for key, _ in keys)
+    if retry_after > 0:
+        login_throttle.rejected += 1
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many failed login attempts",
+                            headers={"Retry-After": str(int(retry_after) + 1)})
+
+    if password_pending >= PASSWORD_MAX_PENDING:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many logins in progress",
+                            headers={"Retry-After": "1"})
+
+    reserved = []
+    for key, limit in keys:
+        if not login_throttle.reserve(key, limit):
+            for reserved_key in reserved:
+                login_throttle.release(reserved_key)
+            login_throttle.rejected += 1
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many login attempts in progress",
+                                headers={"Retry-After": "1"})
+        reserved.append(key)
+
+    # The user is read (and the repository refreshed, which may notify the token cache) on the event loop: only the
+    # hash is verified in password_executor
+    user = get_user(fake_db, username)
+    password_pending += 1
+    try:
+        if user and is_password_hash(user.hashed_password):
+            verified = await asyncio.get_running_loop().run_in_executor(password_executor, verify_password, password, user.hashed_password)
+        else:
+            verified = False
+    finally:
+        password_pending -= 1
+        # The failure below is recorded before any other coroutine runs, so the attempt is always counted
+        for key in reserved:
+            login_throttle.release(key)
+
+    if not verified:
+        for key, limit in keys:
+            login_throttle.failure(key, limit)
+        return False
+
+    login_throttle.reset(("user", username))
+    return user
+
+
 def create_access_token(data: dict, expires_delta: int | None = None):
     """
     Create a JWT token with an expiration time.
@@ -155,20 +564,28 @@ def create_access_token(data: dict, expires_delta: int | None = None):
     return encoded_jwt
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
-    """Get the current user from the token.
+def get_user_from_token(token: str):
+    """Get the user from a JWT token. Validated tokens are cached until they expire (see TokenCache).
 
     Parameters:
     - token (str): The JWT token.
     
     Returns:
-    - User: The user object if the token is valid.
+    - UserInDB: The user object if the token is valid.
 
     Raises:
-    - credentials_exception: If the token is invalid or expired.
-    - InvalidTokenError: If the token is invalid.
+    - credentials_exception: If the token is invalid or expired, or the user does not exist.
     """
 
+    start = time.perf_counter()
+    # Changes of other processes drop the cached tokens before they are looked up
+    users.refresh()
+    user = token_cache.get(token)
+    if user is not None:
+        token_cache.hits += 1
+        token_cache.hit_time += time.perf_counter() - start
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -182,12 +599,69 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         token_data = TokenData(username=username)
     except InvalidTokenError:
         raise credentials_exception
-    user = get_user(fake_users_db, username=token_data.username)
+    user = get_user(users, username=token_data.username)
     if user is None:
         raise credentials_exception
+
+    token_cache.misses += 1
+    token_cache.miss_time += time.perf_counter() - start
+    # Tokens without an exp claim are only trusted for TOKEN_CACHE_TTL seconds
+    token_cache.set(token, user, expires=payload.get("exp", float("inf")))
     return user
 
 
+def set_user_disabled(username: str, disabled: bool = True):
+    """Enable or disable a user. The cached tokens of the user are dropped, so the change applies to the next request.
+
+    Parameters:
+    - username (str): The username.
+    - disabled (bool): True to disable the user, False to enable it.
+
+    Returns:
+    - bool: True if the user exists, False otherwise.
+    """
+
+    user = users.get(username)
+    if user is None:
+        return False
+    user["disabled"] = disabled
+    # The repository drops the cached tokens of the user
+    users.upsert(user)
+    return True
+
+
+async def hash_passwords(passwords: list):
+    """Hash passwords in password_executor, without blocking the event loop.
+
+    Parameters:
+    - passwords (list[str]): The plain passwords.
+
+    Returns:
+    - list[str]: The hashed passwords, in the same order.
+    """
+
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(password_executor, get_password_hash, password) for password in passwords))
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    """Get the current user from the token.
+
+    Parameters:
+    - token (str): The JWT token.
+    
+    Returns:
+    - User: The user object if the token is valid.
+
+    Raises:
+    - credentials_exception: If the token is invalid or expired.
+    - InvalidTokenError: If the token is invalid.
+    """
+
+    with timings.stage("auth"):
+        return get_user_from_token(token)
+
+
 async def get_current_active_user(
     current_user: Annotated[User, Depends(get_current_user)]):
     """
@@ -203,4 +677,22 @@ async def get_current_active_user(
     """
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+async def get_current_admin_user(
+    current_user: Annotated[User, Depends(get_current_active_user)]):
+    """
+    Check if the current user is an administrator
+
+    Parameters:
+    - current_user (User): The current user object.
+
+    Returns:
+    - User: The current user object if the user is an administrator.
+    Raises:
+    - HTTPException: If the user is not an administrator.
+    """
+    if not current_user.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator privileges required")
+    return current_user
@@ -0,0 +1,278 @@
+"""
+User repositories of the API.
+
+A repository stores the users (username, full name, email, hashed password, disabled and admin flags) and keeps them
+in memory, so authenticating a request never reads the disk:
+- SqliteUserRepository: default backend, a local SQLite database. Changes committed by other processes are detected
+  through PRAGMA data_version, checked at most every check_interval seconds.
+- MemoryUserRepository: users held in a dictionary only (lost on restart).
+"""
+
+import abc
+import sqlite3
+import threading
+import time
+
+USER_FIELDS = ("username", "full_name", "email", "hashed_password", "disabled", "admin")
+
+
+class UserRepository(abc.ABC):
+    """
+    Base class of the user repositories. Users are plain dictionaries with the USER_FIELDS.
+
+    Listeners registered with add_listener are called with the username whenever a user changes, or with None when
+    every user may have changed (e.g. the database was modified by another process).
+    """
+
+    def __init__(self):
+        self.listeners = []
+
+
+    def add_listener(self, listener):
+        """
+        Register a function called on every change.
+
+        Parameters:
+        - listener (callable): Function called with the changed username, or None.
+        """
+
+        self.listeners.append(listener)
+
+
+    def notify(self, username: str | None):
+        for listener in self.listeners:
+            listener(username)
+
+
+    def refresh(self):
+        """Pick up the changes made outside of this repository, if the backend can have any."""
+
+        pass
+
+
+    @abc.abstractmethod
+    def get(self, username: str):
+        """
+        Return a user.
+
+        Parameters:
+        - username (str): The username.
+
+        Returns:
+        - dict: A copy of the user, or None if it does not exist.
+        """
+
+        raise NotImplementedError
+
+
+    @abc.abstractmethod
+    def list(self):
+        """
+        Return every user.
+
+        Returns:
+        - list[dict]: Copies of the users, ordered by username.
+        """
+
+        raise NotImplementedError
+
+
+    @abc.abstractmethod
+    def upsert_many(self, users: list):
+        """
+        Create or replace several users at once (all or none).
+
+        Parameters:
+        - users (list[dict]): The users.
+        """
+
+        raise NotImplementedError
+
+
+    @abc.abstractmethod
+    def delete(self, username: str):
+        """
+        Delete a user.
+
+        Parameters:
+        - username (str): The username.
+
+        Returns:
+        - bool: True if the user existed, False otherwise.
+        """
+
+        raise NotImplementedError
+
+
+    def upsert(self, user: dict):
+        """
+        Create or replace a user.
+
+        Parameters:
+        - user (dict): The user.
+        """
+
+        self.upsert_many([user])
+
+
+def normalize_user(user: dict):
+    """Return the USER_FIELDS of a user, with the flags as booleans."""
+
+    return {"username": user["username"], "full_name": user.get("full_name"), "email": user.get("email"),
+            "hashed_password": user["hashed_password"], "disabled": bool(user.get("disabled")), "admin": bool(user.get("admin"))}
+
+
+class MemoryUserRepository(UserRepository):
+    """
+    Repository holding the users in a dictionary.
+    """
+
+    def __init__(self, seed: dict | None = None):
+        super().__init__()
+        self._users = {username: normalize_user(user) for username, user in (seed or {}).items()}
+
+
+    def get(self, username: str):
+        user = self._users.get(username)
+        return dict(user) if user is not None else None
+
+
+    def list(self):
+        return [dict(self._users[username]) for username in sorted(self._users)]
+
+
+    def upsert_many(self, users: list):
+        users = [normalize_user(user) for user in users]
+        for user in users:
+            self._users[user["username"]] = user
+        for user in users:
+            self.notify(user["username"])
+
+
+    def delete(self, username: str):
+        if self._users.pop(username, None) is None:
+            return False
+        self.notify(username)
+        return True
+
+
+class SqliteUserRepository(UserRepository):
+    """
+    Repository storing the users in a SQLite database and caching all of them in memory.
+
+    Writes go to the database first and then refresh the cache. Writes of other processes are picked up on the first
+    lookup after check_interval seconds.
+    """
+
+    def __init__(self, path: str, seed: dict | None = None, check_interval: float = 1.0):
+        """
+        Parameters:
+        - path (str): The path to the database file. It is created if it does not exist.
+        - seed (dict | None): Users created when the database is empty.
+        - check_interval (float): The minimum time (seconds) between two checks for changes of other processes.
+        """
+
+        super().__init__()
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS users (
+                                        username TEXT PRIMARY KEY,
+                                        full_name TEXT,
+                                        email TEXT,
+                                        hashed_password TEXT NOT NULL,
+                                        disabled INTEGER NOT NULL DEFAULT 0,
+                                        admin INTEGER NOT NULL DEFAULT 0)""")
+
+        if seed and self._connection.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            self._write([normalize_user(user) for user in seed.values()])
+
+        self._users = {}
+        self._version = None
+        self._checked = 0.0
+        self._load()
+
+
+    def _load(self):
+        """Read every user into the cache."""
+
+        with self._lock:
+            self._version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            rows = self._connection.execute(f"SELECT {', '.join(USER_FIELDS)} FROM users").fetchall()
+            self._users = {row["username"]: normalize_user(dict(row)) for row in rows}
+            self._checked = time.monotonic()
+            self.reloads += 1
+
+
+    def refresh(self):
+        """Reload the cache if another process changed the database since the last check (at most every check_interval seconds)."""
+
+        if time.monotonic() - self._checked < self.check_interval:
+            return
+        with self._lock:
+            self._checked = time.monotonic()
+            if self._connection.execute("PRAGMA data_version").fetchone()[0] != self._version:
+                self._load()
+                self.notify(None)
+
+
+    def _write(self, users: list):
+        """Insert or replace users in a single transaction."""
+
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.executemany(
+                    f"INSERT OR REPLACE INTO users ({', '.join(USER_FIELDS)}) VALUES ({', '.join('?' * len(USER_FIELDS))})",
+                    [tuple(user[field] for field in USER_FIELDS) for user in users])
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+
+    def get(self, username: str):
+        self.refresh()
+        user = self._users.get(username)
+        return dict(user) if user is not None else None
+
+
+    def list(self):
+        self.refresh()
+        users = self._users
+        return [dict(users[username]) for username in sorted(users)]
+
+
+    def upsert_many(self, users: list):
+        users = [normalize_user(user) for user in users]
+        with self._lock:
+            self._write(users)
+            cached = dict(self._users)
+            for user in users:
+                cached[user["username"]] = user
+            self._users = cached
+        for user in users:
+            self.notify(user["username"])
+
+
+    def delete(self, username: str):
+        with self._lock:
+            deleted = self._connection.execute("DELETE FROM users WHERE username = ?", (username,)).rowcount > 0
+            if deleted:
+                cached = dict(self._users)
+                cached.pop(username, None)
+                self._users = cached
+        if deleted:
+            self.notify(username)
+        return deleted
+
+
+    def close(self):
+        """Close the database connection."""
+
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,215 @@
+"""
+Throughput and latency benchmark of the API endpoints against a local fake Remote API (benchmarks.fake_amari).
+
+The fake callbox runs in a child process, so its CPU does not compete with the API. The API runs in-process (httpx ASGI
+transport, one event loop), configured in memory to reach the fake callbox: config.json is not modified. Each
+endpoint is loaded by an increasing number of concurrent clients during a fixed time, and the requests/sec, p50, p99
+and errors of every step are reported. The results can be written as JSON and compared with a previous run.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_api --duration 3 --concurrency 1,4,16,64
+    python -m benchmarks.bench_api --endpoints enb_stats,ue_stats --latency 0.02 --output results.json
+    python -m benchmarks.bench_api --transport wsjs --concurrency 1,4 --compare results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import httpx
+import utils.utils  # Loads the configuration first, same import order as api.py
+from config.configurator import ConfigManager
+from benchmarks.fake_amari import FakeAmari
+
+BENCH_USER = "bench"
+
+# Benchmarked endpoints: name -> (method, path, query parameters, JSON body)
+ENDPOINTS = {
+    "users_me": ("GET", "/users/me", None, None),
+    "enb_config_cached": ("GET", "/enb/get_config", None, None),
+    "enb_config": ("GET", "/enb/get_config", {"use_cache": "false"}, None),
+    "enb_stats": ("POST", "/enb/get_stats", None, {}),
+    "enb_set_gain": ("POST", "/enb/set_gain", None, {"gain": -10, "cell_id": 1}),
+    "channel_stats": ("POST", "/enb/get_channel_stats", None, {"channels": ["PDSCH", "PUSCH"], "max": 100}),
+    "channel_stats_columnar": ("POST", "/enb/get_channel_stats", None, {"channels": ["PDSCH", "PUSCH"], "max": 100, "format": "columnar"}),
+    "ue_stats": ("POST", "/ue/get_stats", None, {"stats": True}),
+    "ue_lookup": ("GET", "/ue/lookup", {"rnti": 0x4601, "max_age": 1}, None),
+    "core_config": ("GET", "/core/get_config", {"use_cache": "false"}, None),
+    "core_stats": ("GET", "/core/get_stats", None, None),
+    "core_gnb": ("GET", "/core/get_attached_gnb", None, None),
+    "core_ue": ("POST", "/core/get_ue", None, {}),
+}
+
+
+def free_port() -> int:
+    '''Return a free TCP port of the loopback interface'''
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_amari(args, ports: dict) -> subprocess.Popen:
+    '''Start the fake Remote API in a child process and wait until it listens'''
+
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_amari", "--enb-port", str(ports["enb"]), "--mme-port", str(ports["mme"]),
+                                "--latency", str(args.latency), "--jitter", str(args.jitter), "--ues", str(args.ues),
+                                "--cells", str(args.cells), "--log-entries", str(args.log_entries)],
+                               stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()
+    deadline = time.monotonic() + 10
+    for port in ports.values():
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    process.kill()
+                    raise RuntimeError("The fake Remote API did not start")
+                time.sleep(0.05)
+    return process
+
+
+async def load(client: httpx.AsyncClient, headers: dict, endpoint: tuple, concurrency: int, duration: float) -> dict:
+    '''
+    Request an endpoint from concurrency clients in a loop during duration seconds
+
+    Returns:
+    - The requests, errors, requests/sec and latency percentiles (milliseconds): dict
+    '''
+
+    method, path, params, body = endpoint
+    latencies = []
+    errors = 0
+
+    async def worker(end: float):
+        nonlocal errors
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    # Warm-up (connections, caches, UE snapshot)
+    await asyncio.gather(*(worker(time.perf_counter() + min(0.2, duration)) for _ in range(concurrency)))
+    latencies.clear()
+    errors = 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(start + duration) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    values = np.array(latencies) * 1000
+    return {"requests": len(values), "errors": errors, "rps": len(values) / elapsed,
+            "p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99)),
+            "mean_ms": float(values.mean()), "max_ms": float(values.max())}
+
+
+def get_commit() -> str:
+    '''Return the current git commit, or None outside of a repository'''
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, path: str):
+    '''Print the change of the requests/sec and p99 of each step against a previous run'''
+
+    with open(path) as f:
+        previous = {(item["endpoint"], item["concurrency"]): item for item in json.load(f)["results"]}
+
+    print(f"\nCompared with {path}")
+    print(f"{'endpoint':<24}{'conc':>6}{'rps':>10}{'Δ rps':>9}{'p99 ms':>10}{'Δ p99':>9}")
+    for item in results:
+        before = previous.get((item["endpoint"], item["concurrency"]))
+        if before is None:
+            continue
+        print(f"{item['endpoint']:<24}{item['concurrency']:>6}{item['rps']:>10.1f}{(item['rps'] / before['rps'] - 1) * 100:>8.1f}%"
+              f"{item['p99_ms']:>10.2f}{(item['p99_ms'] / before['p99_ms'] - 1) * 100:>8.1f}%")
+
+
+async def main(args):
+    ports = {"enb": free_port(), "mme": free_port()}
+    amari_path = tempfile.mkdtemp(prefix="fake-amari-")
+    fake = None
+    names = args.endpoints.split(",") if args.endpoints else list(ENDPOINTS)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = []
+    # Any failure of the setup (e.g. importing the API) must still stop the fake callbox
+    try:
+        if args.transport == "ws":
+            fake = start_fake_amari(args, ports)
+        FakeAmari(latency=args.latency, jitter=args.jitter, cells=args.cells, ues=args.ues, log_entries=args.log_entries).write_ws_js(amari_path)
+
+        # In memory only, the config.json file is not modified. The users are kept in memory too, so the benchmark
+        # user is never written to the user database
+        ConfigManager.refresh_parameters()
+        ConfigManager.parameters.update({"AMARI_WS_HOST": "127.0.0.1", "AMARI_WS_PORTS": ports, "AMARI_TRANSPORT": args.transport,
+                                         "AMARI_PATH": amari_path, "STATS_STORE_ENABLED": False, "USERS_BACKEND": "memory"})
+
+        from rest import endpoints
+        from auth.auth import users, create_access_token, get_password_hash
+        from utils.remote_api import RemoteApiClient
+        utils.utils.logger.set_level("WARNING")
+
+        users.upsert({"username": BENCH_USER, "full_name": "Benchmark", "email": None, "hashed_password": get_password_hash(BENCH_USER),
+                      "disabled": False, "admin": True})
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': BENCH_USER})}"}
+
+        print(f"Transport: {args.transport}, upstream latency {args.latency * 1000:.1f} ms, {args.ues} UEs, {args.cells} cells, {args.duration}s per step")
+        print(f"{'endpoint':<24}{'conc':>6}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        transport = httpx.ASGITransport(app=endpoints.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in names:
+                for concurrency in levels:
+                    result = await load(client, headers, ENDPOINTS[name], concurrency, args.duration)
+                    results.append({"endpoint": name, "concurrency": concurrency, **result})
+                    print(f"{name:<24}{concurrency:>6}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10.1f}"
+                          f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+        await RemoteApiClient.close()
+    finally:
+        if fake is not None:
+            fake.terminate()
+            fake.wait()
+        shutil.rmtree(amari_path, ignore_errors=True)
+
+    if args.output:
+        report = {"timestamp": time.time(), "commit": get_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                  "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}, "results": results}
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Throughput and latency benchmark of the API endpoints against a fake Remote API.')
+    parser.add_argument('--endpoints', type=str, help=f'Comma separated endpoints (default all): {", ".join(ENDPOINTS)}', default=None)
+    parser.add_argument('--concurrency', type=str, help='Comma separated numbers of concurrent clients', default="1,4,16,64")
+    parser.add_argument('--duration', type=float, help='Seconds measured per endpoint and concurrency', default=3)
+    parser.add_argument('--transport', type=str, choices=["ws", "wsjs"], help='Remote API transport of the API', default="ws")
+    parser.add_argument('--latency', type=float, help='Seconds before each reply of the fake Remote API', default=0.005)
+    parser.add_argument('--jitter', type=float, help='Maximum random seconds added to the latency', default=0.0)
+    parser.add_argument('--ues', type=int, help='Number of UEs of the fake Remote API', default=16)
+    parser.add_argument('--cells', type=int, help='Number of cells of the fake Remote API', default=2)
+    parser.add_argument('--log-entries', type=int, help='Number of PHY log entries of the fake Remote API', default=1000)
+    parser.add_argument('--output', type=str, help='Write the results to this JSON file', default=None)
+    parser.add_argument('--compare', type=str, help='Compare the results with a previous JSON file', default=None)
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
@@ -0,0 +1,95 @@
+"""
+Benchmark of the JSON codec (utils.codec) on large Remote API replies: config_get, log_get and ue_get with many UEs.
+
+Decoding: the json module against the codec, on the text received from the callbox (Parser.parse_response and the
+Remote API reader). Encoding: the default FastAPI path (jsonable_encoder over the whole output, then the json module, as
+JSONResponse did) against the pass-through path of the endpoints (FastJSONResponse, no jsonable_encoder), with the json
+module and with orjson. Every path is checked to give the same document. orjson is only measured when it is installed.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_codec --log-entries 4096 --ues 512 --repeat 20
+"""
+
+import argparse
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from rest.middleware import FastJSONResponse
+from utils.codec import codec, orjson
+from benchmarks.corpus import generate_log_get
+from benchmarks.fake_amari import FakeAmari
+
+
+def measure(function, payload, repeat: int) -> float:
+    '''Return the best time (seconds) of repeat runs of function(payload)'''
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def default_response(output: dict) -> bytes:
+    '''Encode an endpoint output as FastAPI did before: jsonable_encoder, then JSONResponse (json module)'''
+
+    return JSONResponse(jsonable_encoder(output)).body
+
+
+def passthrough_response(output: dict) -> bytes:
+    '''Encode an endpoint output as a pass-through endpoint does: FastJSONResponse with the selected codec'''
+
+    return FastJSONResponse(output).body
+
+
+def build_payloads(args) -> dict:
+    '''Return the Remote API replies benchmarked, keyed by name'''
+
+    amari = FakeAmari(cells=args.cells, ues=args.ues)
+    payloads = {"config_get": {"message": "config_get", "message_id": 1, **amari.build_config_get("enb", {})},
+                "log_get": generate_log_get(args.log_entries, cells=args.cells, ues=args.ues),
+                "ue_get_enb": {"message": "ue_get", "message_id": 1, **amari.build_ue_get("enb", {})},
+                "ue_get_mme": {"message": "ue_get", "message_id": 1, **amari.build_ue_get("mme", {})}}
+    return payloads
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the JSON codec on large Remote API replies.')
+    parser.add_argument('--log-entries', type=int, help='Number of log entries of the log_get reply', default=4096)
+    parser.add_argument('--ues', type=int, help='Number of UEs of the ue_get replies', default=512)
+    parser.add_argument('--cells', type=int, help='Number of cells', default=4)
+    parser.add_argument('--repeat', type=int, help='Number of runs of each path (the best is kept)', default=20)
+    args = parser.parse_args()
+
+    codecs = ["json"] + (["orjson"] if orjson is not None else [])
+    if orjson is None:
+        print("orjson is not installed, only the json module is measured")
+
+    print(f"{'payload':<12}{'size KiB':>10}  {'path':<26}{'ms':>10}{'MB/s':>10}{'speedup':>9}")
+    for name, reply in build_payloads(args).items():
+        text = json.dumps(reply)
+        size = len(text.encode())
+        output = {"status": True, "response": reply}
+
+        rows = []
+        for codec_name in codecs:
+            codec.set_codec(codec_name)
+            assert codec.loads(text) == reply
+            rows.append((f"decode {codec_name}", measure(codec.loads, text, args.repeat)))
+
+        baseline = default_response(output)
+        rows.append(("encode jsonable+json", measure(default_response, output, args.repeat)))
+        for codec_name in codecs:
+            codec.set_codec(codec_name)
+            assert json.loads(passthrough_response(output)) == json.loads(baseline)
+            rows.append((f"encode passthrough {codec_name}", measure(passthrough_response, output, args.repeat)))
+
+        # Speedups against the first path of each direction (json decode, jsonable_encoder + json encode)
+        references = {"decode": rows[0][1], "encode": rows[len(codecs)][1]}
+        for index, (path, seconds) in enumerate(rows):
+            label = f"{name:<12}{size / 1024:>10.1f}" if index == 0 else " " * 22
+            print(f"{label}  {path:<26}{seconds * 1000:>10.3f}{size / seconds / 1e6:>10.1f}{references[path.split()[0]] / seconds:>8.1f}x")
+
+    codec.set_codec("auto")
@@ -0,0 +1,114 @@
+"""
+Load test of the /token endpoint: latency of an in-memory stats endpoint while a storm of logins is running.
+
+The API runs in-process (httpx ASGI transport, one event loop), so any CPU work done on the event loop shows up
+directly in the latency of the other requests. The users are kept in memory (USERS_BACKEND "memory"), so the
+temporary user with a known password added for the test is never written to the user database.
+With --inline, the password is verified on the event loop as before, for comparison.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_login --duration 5 --concurrency 16
+    python -m benchmarks.bench_login --duration 5 --concurrency 16 --inline
+"""
+
+import argparse
+import asyncio
+import time
+import numpy as np
+import httpx
+import utils.utils  # Loads the configuration first, same import order as api.py
+from config.configurator import ConfigManager
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+async def probe(client: httpx.AsyncClient, headers: dict, duration: float, interval: float) -> list:
+    '''
+    Request the stats endpoint on a fixed schedule (every interval seconds) during duration seconds and return the
+    latencies (seconds). A latency is measured from the scheduled time, so a stalled event loop is not hidden by
+    requests that were never sent
+    '''
+
+    latencies = []
+    scheduled = time.perf_counter()
+    end = scheduled + duration
+    while scheduled < end:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        response = await client.get("/collector/window", params={"source": "enb"}, headers=headers)
+        response.raise_for_status()
+        now = time.perf_counter()
+        # Requests that should have been sent while this one was blocked count with their own delay
+        while scheduled <= now and scheduled < end:
+            latencies.append(now - scheduled)
+            scheduled += interval
+    return latencies
+
+
+async def login_storm(client: httpx.AsyncClient, stop: asyncio.Event, counters: dict):
+    '''Log in repeatedly until stop is set'''
+
+    while not stop.is_set():
+        response = await client.post("/token", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+        counters[response.status_code] = counters.get(response.status_code, 0) + 1
+
+
+def summary(name: str, latencies: list) -> str:
+    values = np.array(latencies) * 1000
+    return (f"{name:<16}{len(values):>8}{np.percentile(values, 50):>10.2f}{np.percentile(values, 99):>10.2f}"
+            f"{values.max():>10.2f}")
+
+
+async def main(args):
+    # In memory only, the config.json file and the user database are not modified. The backend must be selected
+    # before the API (and its user repository) is imported
+    ConfigManager.refresh_parameters()
+    ConfigManager.parameters.update({"USERS_BACKEND": "memory"})
+
+    from rest import endpoints
+    from auth.auth import users, get_password_hash, authenticate_user
+
+    try:
+        users.upsert({"username": BENCH_USER, "full_name": "Benchmark", "email": None,
+                      "hashed_password": get_password_hash(BENCH_PASSWORD), "disabled": False})
+
+        if args.inline:
+            async def authenticate_inline(fake_db, username, password, client=None):
+                return authenticate_user(fake_db, username, password)
+            endpoints.authenticate_user_throttled = authenticate_inline
+
+        transport = httpx.ASGITransport(app=endpoints.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            response = await client.post("/token", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            idle = await probe(client, headers, args.duration, args.interval)
+
+            stop = asyncio.Event()
+            counters = {}
+            storm = [asyncio.create_task(login_storm(client, stop, counters)) for _ in range(args.concurrency)]
+            start = time.perf_counter()
+            loaded = await probe(client, headers, args.duration, args.interval)
+            stop.set()
+            await asyncio.gather(*storm)
+            elapsed = time.perf_counter() - start
+    finally:
+        users.delete(BENCH_USER)
+
+    print(f"Password verification: {'on the event loop' if args.inline else 'executor'}, {args.concurrency} concurrent logins")
+    print(f"Logins: {sum(counters.values())} in {elapsed:.1f}s ({sum(counters.values()) / elapsed:.1f}/s), status codes {counters}")
+    print(f"{'stats latency':<16}{'samples':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print(summary("idle", idle))
+    print(summary("login storm", loaded))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test of the /token endpoint.')
+    parser.add_argument('--duration', type=float, help='Seconds measured without and with the login storm', default=5)
+    parser.add_argument('--concurrency', type=int, help='Number of concurrent login loops', default=16)
+    parser.add_argument('--interval', type=float, help='Seconds between two stats requests', default=0.01)
+    parser.add_argument('--inline', action='store_true', help='Verify the passwords on the event loop (previous behaviour)')
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
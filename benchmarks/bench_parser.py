@@ -0,0 +1,156 @@
+"""
+Benchmark of the PHY log parser (Parser.parse_response, Parser.extract_channel_log_messages, Parser.build_channel_log_store
+and Parser.parse_log_data) on the synthetic corpus of benchmarks.corpus.
+
+It compares the current extraction against the previous implementation on the PDSCH/PUSCH entries, checks that both
+give the same output and reports the lines/sec of each one. Then it measures each stage on the whole corpus
+(PDSCH/PUSCH/PUCCH/PRACH): the best time of the runs, the entries/sec, and, in a separate run traced by tracemalloc,
+the peak memory and the memory blocks still allocated by the output (per entry).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_parser --entries 100000 --repeat 5
+    python -m benchmarks.bench_parser --entries 500000 --cells 4 --ues 512 --repeat 3
+"""
+
+import argparse
+import gc
+import re
+import time
+import tracemalloc
+from utils.parser import Parser
+from benchmarks.corpus import generate_log_data, to_ws_js_output, CHANNEL_WEIGHTS
+
+
+# ************************************************************************************************************************************************
+# Previous implementation (reference for the comparison)
+# ************************************************************************************************************************************************
+
+def legacy_parse_log_data(line):
+    parsed_dict = {}
+    matches = re.findall(r'(\w+)=([\w:.]+)', line)
+
+    for key, value in matches:
+        if ':' in value:
+            start, end = map(int, value.split(':'))
+            parsed_dict[f"{key}_start"] = start
+            parsed_dict[f"{key}_end"] = end
+        elif value.isdigit():
+            parsed_dict[key] = int(value)
+        elif re.match(r'^\d+\.\d+$', value):
+            parsed_dict[key] = float(value)
+        else:
+            parsed_dict[key] = value
+
+    return parsed_dict
+
+
+def legacy_extract_channel_log_messages(log_data, discard_si=False, channel=['PDSCH']):
+    pdsch_messages = {}
+
+    if log_data.get("status") and "response" in log_data and "logs" in log_data["response"]:
+        logs = log_data["response"]["logs"]
+
+        for log in logs:
+            if log.get("channel") in channel:
+                if discard_si:
+                    if "si" not in log.get("data")[0]:
+                        pdsch_messages[log.get("timestamp")] = legacy_parse_log_data(log.get("data")[0])
+                    else:
+                        continue
+                else:
+                    pdsch_messages[log.get("timestamp")] = legacy_parse_log_data(log.get("data")[0])
+
+                pdsch_messages[log.get("timestamp")]["channel"] = log.get("channel")
+
+    return pdsch_messages
+
+
+# ************************************************************************************************************************************************
+# Benchmark
+# ************************************************************************************************************************************************
+
+def measure(function, log_data, repeat: int, **kwargs) -> float:
+    '''Return the best time (seconds) of repeat runs of function(log_data)'''
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(log_data, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_memory(function, log_data, **kwargs) -> tuple:
+    '''
+    Run function(log_data) once under tracemalloc
+
+    Returns:
+    - The peak memory (bytes) allocated during the run and the memory blocks still allocated by its output: tuple[int, int]
+    '''
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    output = function(log_data, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del output
+    return peak, blocks
+
+
+def parse_lines(log_data):
+    '''Parse the data line of every entry (Parser.parse_log_data)'''
+
+    parse = Parser.parse_log_data
+    return [parse(log["data"][0], channel=log["channel"]) for log in log_data["response"]["logs"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the PHY log parser.')
+    parser.add_argument('--entries', type=int, help='Number of log entries in the corpus', default=100000)
+    parser.add_argument('--cells', type=int, help='Number of cells in the corpus', default=2)
+    parser.add_argument('--ues', type=int, help='Number of UEs (RNTIs) in the corpus', default=64)
+    parser.add_argument('--repeat', type=int, help='Number of runs (the best one is reported)', default=5)
+    args = parser.parse_args()
+
+    log_data = generate_log_data(args.entries, cells=args.cells, ues=args.ues)
+    channels = ["PDSCH", "PUSCH"]
+    lines = sum(log["channel"] in channels for log in log_data["response"]["logs"])
+
+    for discard_si in (False, True):
+        assert Parser.extract_channel_log_messages(log_data, discard_si=discard_si, channel=channels) == \
+            legacy_extract_channel_log_messages(log_data, discard_si=discard_si, channel=channels), "Outputs differ"
+
+    legacy = measure(legacy_extract_channel_log_messages, log_data, args.repeat, discard_si=True, channel=channels)
+    current = measure(Parser.extract_channel_log_messages, log_data, args.repeat, discard_si=True, channel=channels)
+
+    print(f"Corpus: {args.entries} entries ({args.cells} cells, {args.ues} UEs), best of {args.repeat} runs")
+    print(f"\nExtraction of the {lines} PDSCH/PUSCH entries")
+    print(f"{'implementation':<16}{'seconds':>10}{'lines/sec':>14}")
+    print(f"{'legacy':<16}{legacy:>10.4f}{lines / legacy:>14,.0f}")
+    print(f"{'current':<16}{current:>10.4f}{lines / current:>14,.0f}")
+    print(f"Speed-up: {legacy / current:.2f}x")
+
+    # Stages, on every channel of the corpus
+    all_channels = list(CHANNEL_WEIGHTS)
+    stdout = to_ws_js_output(log_data["response"])
+
+    # Log lines printed before the reply, with braces that do not start a valid object, must be skipped
+    noisy = '[ws.js] {"connecting": ...}\n{ "warning" }\n' + stdout
+    assert Parser.parse_response(noisy) == Parser.parse_response(stdout), "Noisy prefix not skipped"
+    assert not Parser.parse_response('{"message": "log_get", "logs": [')[1], "Truncated reply accepted"
+    stages = [
+        ("parse_response", Parser.parse_response, stdout, {}),
+        ("parse_log_data", parse_lines, log_data, {}),
+        ("extract_messages", Parser.extract_channel_log_messages, log_data, {"discard_si": True, "channel": all_channels}),
+        ("build_store", Parser.build_channel_log_store, log_data, {"discard_si": True, "channel": all_channels}),
+    ]
+
+    print(f"\nStages on the {args.entries} entries (ws.js output: {len(stdout) / 2 ** 20:.1f} MiB)")
+    print(f"{'stage':<20}{'seconds':>10}{'entries/sec':>14}{'peak MiB':>10}{'blocks':>12}{'blocks/entry':>14}")
+    for name, function, data, kwargs in stages:
+        seconds = measure(function, data, args.repeat, **kwargs)
+        peak, blocks = measure_memory(function, data, **kwargs)
+        print(f"{name:<20}{seconds:>10.4f}{args.entries / seconds:>14,.0f}{peak / 2 ** 20:>10.1f}{blocks:>12,}{blocks / args.entries:>14.2f}")
@@ -0,0 +1,163 @@
+"""
+Synthetic PHY log corpus in the shape of the Amarisoft log_get replies, used by the benchmarks.
+
+Each entry has a timestamp (ms), the PHY layer, a direction, a cell, an RNTI, a channel and one data line of key=value
+pairs, as the callbox logs them. The channels are PDSCH, PUSCH, PUCCH and PRACH. SI entries (PDSCH of the SI-RNTI,
+harq=si) and PRACH entries (RA-RNTI) are mixed with the traffic of the UEs, which are spread over the cells.
+
+The module only uses the standard library, so it is cheap to import (e.g. from the fake ws.js of benchmarks.fake_amari).
+
+Usage (from the repository root):
+    python -m benchmarks.corpus --entries 200000 --cells 4 --ues 256 --output corpus.json
+"""
+
+import argparse
+import json
+import random
+
+# Share of each channel in the corpus
+CHANNEL_WEIGHTS = {"PDSCH": 0.45, "PUSCH": 0.35, "PUCCH": 0.15, "PRACH": 0.05}
+
+SI_RNTI = 0xffff
+FIRST_RNTI = 0x4601
+
+
+def generate_line(rng: random.Random, channel: str, si: bool = False) -> str:
+    '''
+    Generate the data line of a log entry
+
+    Parameters:
+    - rng: random.Random. The random generator
+    - channel: str. The channel (PDSCH, PUSCH, PUCCH or PRACH)
+    - si: bool, default=False. If True, a PDSCH line carrying system information
+
+    Returns:
+    - The key=value line: str
+    '''
+
+    if channel == "PDSCH":
+        if si:
+            start = rng.randint(0, 4)
+            return f"harq=si prb={start}:{start + 4} symb=1:13 nl=1 mod=2 mcs={rng.randint(0, 9)} tbs={rng.choice([392, 848, 1160])} rv_idx=0 cw=0"
+        start = rng.randint(0, 80)
+        return (f"harq={rng.randint(0, 15)} prb={start}:{start + rng.randint(1, 25)} symb=1:13 k1={rng.randint(1, 8)} nl={rng.randint(1, 2)} "
+                f"mod={rng.choice([2, 4, 6, 8])} mcs={rng.randint(0, 28)} tbs={rng.randint(100, 60000)} rv_idx={rng.choice([0, 2, 3, 1])} "
+                f"cw=0 retx={rng.randint(0, 3)}")
+    if channel == "PUSCH":
+        start = rng.randint(0, 80)
+        return (f"harq={rng.randint(0, 15)} prb={start}:{start + rng.randint(1, 25)} symb=0:14 mod={rng.choice([2, 4, 6])} "
+                f"mcs={rng.randint(0, 28)} tbs={rng.randint(100, 30000)} rv_idx=0 cw=0 retx={rng.randint(0, 3)} "
+                f"crc={rng.choice(['OK', 'OK', 'OK', 'KO'])} snr={rng.uniform(0, 30):.1f} epre=-{rng.uniform(60, 100):.1f} "
+                f"ta={rng.uniform(0, 2):.2f}")
+    if channel == "PUCCH":
+        fmt = rng.choice([0, 1, 2])
+        line = f"format={fmt} prb={rng.randint(0, 105)} symb={rng.choice(['0:2', '12:2', '0:14'])} cs={rng.randint(0, 11)}"
+        if fmt == 2:
+            line += f" csi={rng.randint(0, 15)}"
+        else:
+            line += f" ack={rng.randint(0, 1)} sr={rng.randint(0, 1)}"
+        return line + f" snr={rng.uniform(0, 30):.1f} epre=-{rng.uniform(60, 100):.1f}"
+    return (f"prach_config={rng.choice([16, 159])} seq={rng.randint(0, 63)} ta={rng.randint(0, 30)} "
+            f"snr={rng.uniform(0, 30):.1f} epre=-{rng.uniform(60, 100):.1f}")
+
+
+def generate_logs(entries: int, seed: int = 0, cells: int = 2, ues: int = 64, si_ratio: float = 0.05, channels: dict = None,
+                  start_timestamp: int = 1710000000000) -> list:
+    '''
+    Generate the log entries of a log_get reply
+
+    Parameters:
+    - entries: int. The number of log entries
+    - seed: int, default=0. The seed of the random generator
+    - cells: int, default=2. The number of cells
+    - ues: int, default=64. The number of UEs (RNTIs), spread over the cells
+    - si_ratio: float, default=0.05. The share of the PDSCH entries carrying system information
+    - channels: dict, default=None. The share of each channel. If None, CHANNEL_WEIGHTS
+    - start_timestamp: int, default=1710000000000. The timestamp (ms) of the first entry
+
+    Returns:
+    - The log entries: list[dict]
+    '''
+
+    rng = random.Random(seed)
+    weights = channels or CHANNEL_WEIGHTS
+    names, shares = list(weights), list(weights.values())
+    timestamp = start_timestamp
+    logs = []
+    for channel in rng.choices(names, shares, k=entries):
+        # Several entries share a slot, as in a busy cell
+        timestamp += rng.choice((0, 0, 1, 1, 2))
+        ue = rng.randrange(ues)
+        cell = ue % cells + 1
+        rnti = FIRST_RNTI + ue
+        si = False
+        if channel == "PDSCH" and rng.random() < si_ratio:
+            si, rnti, cell = True, SI_RNTI, rng.randint(1, cells)
+        elif channel == "PRACH":
+            rnti = rng.randint(1, 0x3c)
+        logs.append({"timestamp": timestamp, "layer": "PHY", "level": "debug", "dir": "DL" if channel == "PDSCH" else "UL",
+                     "cell": cell, "rnti": rnti, "channel": channel, "data": [generate_line(rng, channel, si)]})
+    return logs
+
+
+def generate_log_get(entries: int, message_id: int = 1, **kwargs) -> dict:
+    '''
+    Generate a log_get reply of the Remote API
+
+    Parameters:
+    - entries: int. The number of log entries
+    - message_id: int, default=1. The message_id of the reply
+    - kwargs: The other parameters of generate_logs
+
+    Returns:
+    - The reply: dict
+    '''
+
+    return {"message": "log_get", "message_id": message_id, "logs": generate_logs(entries, **kwargs)}
+
+
+def generate_log_data(entries: int, **kwargs) -> dict:
+    '''
+    Generate a log_get output, as returned by Cli.execute_command (the input of Parser.extract_channel_log_messages)
+
+    Parameters:
+    - entries: int. The number of log entries
+    - kwargs: The other parameters of generate_logs
+
+    Returns:
+    - The output: dict
+    '''
+
+    return {"status": True, "response": generate_log_get(entries, **kwargs)}
+
+
+def to_ws_js_output(reply: dict) -> str:
+    '''
+    Return the stdout of ws.js for a reply (the input of Parser.parse_response)
+
+    Parameters:
+    - reply: dict. The Remote API reply (e.g. generate_log_get)
+
+    Returns:
+    - The stdout: str
+    '''
+
+    return "Connected to ws://127.0.0.1:9001\n" + json.dumps(reply) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Synthetic PHY log corpus in the shape of the Amarisoft log_get replies.')
+    parser.add_argument('--entries', type=int, help='Number of log entries', default=100000)
+    parser.add_argument('--cells', type=int, help='Number of cells', default=2)
+    parser.add_argument('--ues', type=int, help='Number of UEs (RNTIs)', default=64)
+    parser.add_argument('--si-ratio', type=float, help='Share of the PDSCH entries carrying system information', default=0.05)
+    parser.add_argument('--seed', type=int, help='Seed of the random generator', default=0)
+    parser.add_argument('--output', type=str, help='Write the log_get reply to this JSON file (default: stdout)', default=None)
+    args = parser.parse_args()
+
+    reply = generate_log_get(args.entries, seed=args.seed, cells=args.cells, ues=args.ues, si_ratio=args.si_ratio)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reply, f)
+    else:
+        print(json.dumps(reply))
@@ -0,0 +1,236 @@
+"""
+Local stand-in for the Amarisoft Remote API, used by the benchmarks.
+
+It serves the enb and mme Remote APIs over WebSocket, like the callbox does: a "ready" message on connection, then one
+reply per request, matched by message_id. Every reply is sent after a configurable latency (plus a random jitter) and
+carries synthetic stats, ue_get, config_get, ng_ran and log_get payloads sized by the number of cells, UEs and log
+entries. Any other message (config_set, log_reset, ...) is acknowledged. Requests are answered concurrently, so the
+latency does not serialize the requests pipelined on one connection.
+
+It can also write a fake ws.js, to benchmark the subprocess transport (AMARI_TRANSPORT "wsjs") with the same payloads.
+
+Usage (from the repository root):
+    python -m benchmarks.fake_amari --enb-port 9001 --mme-port 9000 --latency 0.005 --ues 32
+    python -m benchmarks.fake_amari --write-ws-js /tmp/amari --latency 0.005
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import stat
+import sys
+import time
+import websockets
+from benchmarks.corpus import generate_logs
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WS_JS = """#!{python}
+# Fake ws.js written by benchmarks.fake_amari: ./ws.js <entity> <message>
+import asyncio, json, sys
+sys.path.insert(0, {repository!r})
+from benchmarks.fake_amari import FakeAmari
+amari = FakeAmari(**{options!r})
+print(json.dumps(asyncio.run(amari.reply(sys.argv[1], json.loads(sys.argv[2])))))
+"""
+
+
+class FakeAmari:
+    '''
+    This class builds the synthetic Remote API replies of the enb and mme entities
+    '''
+
+    def __init__(self, latency: float = 0.005, jitter: float = 0.0, cells: int = 2, ues: int = 16, log_entries: int = 1000, seed: int = 0):
+        '''
+        Parameters:
+        - latency: float, default=0.005. The time (seconds) before each reply
+        - jitter: float, default=0. The maximum random time (seconds) added to the latency
+        - cells: int, default=2. The number of cells of the gNB
+        - ues: int, default=16. The number of UEs connected
+        - log_entries: int, default=1000. The number of PHY log entries available to log_get
+        - seed: int, default=0. The seed of the random generator
+        '''
+
+        self.latency = latency
+        self.jitter = jitter
+        self.cells = cells
+        self.ues = ues
+        self.options = {"latency": latency, "jitter": jitter, "cells": cells, "ues": ues, "log_entries": log_entries, "seed": seed}
+        self.rng = random.Random(seed)
+        self.log_entries = log_entries
+        self.seed = seed
+        # Generated on the first log_get (the fake ws.js builds a new instance per message)
+        self.logs = None
+        self.requests = 0
+
+
+    async def reply(self, entity: str, message: dict) -> dict:
+        '''
+        Wait for the latency and return the reply to a message
+
+        Parameters:
+        - entity: str. The entity receiving the message (enb or mme)
+        - message: dict. The Remote API message
+
+        Returns:
+        - The reply: dict
+        '''
+
+        self.requests += 1
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        name = message.get("message")
+        reply = {"message": name, "message_id": message.get("message_id"), "time": time.time()}
+        builder = getattr(self, f"build_{name}", None)
+        if builder is not None:
+            reply.update(builder(entity, message))
+        return reply
+
+
+    def build_stats(self, entity: str, message: dict) -> dict:
+        rng = self.rng
+        stats = {"instance_id": f"{entity}-fake", "cpu": {"global": rng.uniform(5, 60)},
+                 "counters": {"messages": {"ng_setup_request": 1, "initial_ue_message": self.ues}, "errors": {}}}
+        if entity == "enb":
+            stats["cells"] = {str(cell_id): {"dl_bitrate": rng.uniform(1e6, 1e8), "ul_bitrate": rng.uniform(1e5, 5e7),
+                                             "dl_tx": rng.randint(0, 10000), "ul_tx": rng.randint(0, 10000),
+                                             "dl_retx": rng.randint(0, 100), "ul_retx": rng.randint(0, 100),
+                                             "dl_use_avg": rng.random(), "ul_use_avg": rng.random(),
+                                             "ue_count_min": 0, "ue_count_max": self.ues, "ue_count_avg": self.ues / self.cells,
+                                             "erab_count_avg": self.ues / self.cells}
+                              for cell_id in range(1, self.cells + 1)}
+            stats["rf"] = {"rxtx_delay_min": 0.5, "rxtx_delay_max": 1.5, "rxtx_delay_avg": 1.0}
+        else:
+            stats["ue_count"] = self.ues
+        return stats
+
+
+    def build_ue_get(self, entity: str, message: dict) -> dict:
+        rng = self.rng
+        ue_list = []
+        for index in range(self.ues):
+            imsi = f"00101{index:010d}"
+            if entity == "enb":
+                ue = {"enb_ue_id": index + 1, "ran_ue_id": index + 1, "amf_ue_id": 1000 + index, "rnti": 0x4601 + index,
+                      "cells": [{"cell_id": index % self.cells + 1, "dl_bitrate": rng.uniform(1e5, 5e7), "ul_bitrate": rng.uniform(1e4, 1e7),
+                                 "dl_tx": rng.randint(0, 5000), "ul_tx": rng.randint(0, 5000), "dl_retx": rng.randint(0, 50),
+                                 "ul_retx": rng.randint(0, 50), "dl_mcs": rng.randint(0, 28), "ul_mcs": rng.randint(0, 28),
+                                 "cqi": rng.randint(1, 15), "ri": rng.randint(1, 2), "pusch_snr": rng.uniform(0, 30),
+                                 "epre": rng.uniform(-100, -60), "turbo_decoder_avg": rng.uniform(1, 3)}]}
+                if "ue_id" in message and message["ue_id"] != ue["enb_ue_id"]:
+                    continue
+            else:
+                ue = {"amf_ue_id": 1000 + index, "ran_ue_id": index + 1, "imsi": imsi, "imei": f"86688704{index:07d}",
+                      "registered": True, "tac": 1, "ip_address": f"192.168.3.{index % 250 + 2}",
+                      "pdu_session_list": [{"pdu_session_id": 1, "apn": "internet", "sst": 1}]}
+                if message.get("imsi") not in (None, imsi):
+                    continue
+            ue_list.append(ue)
+        return {"ue_list": ue_list}
+
+
+    def build_config_get(self, entity: str, message: dict) -> dict:
+        if entity == "enb":
+            return {"type": "ENB", "version": "fake", "cells": {str(cell_id): {"dl_earfcn": 3350 + cell_id, "n_rb_dl": 106, "n_antenna_dl": 2,
+                                                                              "n_antenna_ul": 1, "gain": -10, "pdsch_mcs": 28, "pusch_mcs": 28,
+                                                                              "inactivity_timer": 10000}
+                                                             for cell_id in range(1, self.cells + 1)},
+                    "logs": {"layers": {"PHY": {"level": "debug", "max_size": 1}}}}
+        return {"type": "MME", "version": "fake", "plmn": "00101", "tac": 1, "ue_count": self.ues}
+
+
+    def build_ng_ran(self, entity: str, message: dict) -> dict:
+        return {"ng_ran": [{"gnb_id": 1, "plmn": "00101", "cells": [{"cell_id": cell_id} for cell_id in range(1, self.cells + 1)]}]}
+
+
+    def build_log_get(self, entity: str, message: dict) -> dict:
+        if self.logs is None:
+            self.logs = generate_logs(self.log_entries, seed=self.seed, cells=self.cells, ues=self.ues)
+        count = min(int(message.get("max") or 100), len(self.logs))
+        start = self.rng.randint(0, len(self.logs) - count) if count < len(self.logs) else 0
+        return {"logs": self.logs[start:start + count]}
+
+
+    async def serve_entity(self, websocket, entity: str):
+        '''Answer the messages of one WebSocket connection'''
+
+        await websocket.send(json.dumps({"message": "ready", "type": entity.upper()}))
+        tasks = set()
+
+        async def answer(raw):
+            await websocket.send(json.dumps(await self.reply(entity, json.loads(raw))))
+
+        async for raw in websocket:
+            task = asyncio.create_task(answer(raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+
+    async def serve(self, host: str = "127.0.0.1", ports: dict = None):
+        '''
+        Serve the Remote API of each entity until cancelled
+
+        Parameters:
+        - host: str, default="127.0.0.1". The address to listen on
+        - ports: dict, default=None. The port of each entity. If None, {"enb": 9001, "mme": 9000}
+
+        Returns:
+        - None
+        '''
+
+        ports = ports or {"enb": 9001, "mme": 9000}
+        servers = [await websockets.serve(lambda websocket, entity=entity: self.serve_entity(websocket, entity), host, port, max_size=None)
+                   for entity, port in ports.items()]
+        try:
+            await asyncio.Future()
+        finally:
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+
+
+    def write_ws_js(self, path: str) -> str:
+        '''
+        Write a fake ws.js answering with the same payloads, to be used as AMARI_PATH
+
+        Parameters:
+        - path: str. The directory of the script. It is created if it does not exist
+
+        Returns:
+        - The path to the script: str
+        '''
+
+        os.makedirs(path, exist_ok=True)
+        script = os.path.join(path, "ws.js")
+        with open(script, "w") as f:
+            f.write(WS_JS.format(python=sys.executable, repository=REPOSITORY_PATH, options=self.options))
+        os.chmod(script, os.stat(script).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        return script
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local stand-in for the Amarisoft Remote API.')
+    parser.add_argument('--host', type=str, help='Address to listen on', default="127.0.0.1")
+    parser.add_argument('--enb-port', type=int, help='Port of the enb Remote API', default=9001)
+    parser.add_argument('--mme-port', type=int, help='Port of the mme Remote API', default=9000)
+    parser.add_argument('--latency', type=float, help='Seconds before each reply', default=0.005)
+    parser.add_argument('--jitter', type=float, help='Maximum random seconds added to the latency', default=0.0)
+    parser.add_argument('--cells', type=int, help='Number of cells of the gNB', default=2)
+    parser.add_argument('--ues', type=int, help='Number of UEs connected', default=16)
+    parser.add_argument('--log-entries', type=int, help='Number of PHY log entries available to log_get', default=1000)
+    parser.add_argument('--write-ws-js', type=str, help='Write a fake ws.js in this directory and exit', default=None)
+    args = parser.parse_args()
+
+    amari = FakeAmari(latency=args.latency, jitter=args.jitter, cells=args.cells, ues=args.ues, log_entries=args.log_entries)
+    if args.write_ws_js:
+        print(amari.write_ws_js(args.write_ws_js))
+    else:
+        print(f"Fake Remote API: enb on {args.host}:{args.enb_port}, mme on {args.host}:{args.mme_port}", flush=True)
+        try:
+            asyncio.run(amari.serve(args.host, {"enb": args.enb_port, "mme": args.mme_port}))
+        except KeyboardInterrupt:
+            pass
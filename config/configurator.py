@@ -1,10 +1,45 @@
 import pandas as pd
 import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from utils.utils import *
 from config.defaultParams import *
 
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, only the in-process lock is used
+    fcntl = None
+
 config_path = './config/config.json'
 
+
+def write_json_atomic(path, content):
+    '''
+    Write a json content to a file atomically. The content is written to a temporary file in the same directory, which then replaces the file.
+    Readers see either the previous or the new file, never a half-written one
+
+    Parameters:
+    path: str. The path to the file
+    content: dict. The content to be written
+
+    Returns:
+    - None
+    '''
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.config-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(content, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 def check_config_file():
     '''
     Define the default parameters of the config.json file. If the file does not exist, create it with the default parameters
@@ -24,7 +59,38 @@ def check_config_file():
         "API_RELOAD": API_RELOAD,
         "API_DATA_PATH": API_DATA_PATH,
         "AMARI_HOST": AMARI_HOST,
-        "AMARI_PORT": AMARI_PORT
+        "AMARI_PORT": AMARI_PORT,
+        "AMARI_WS_HOST": AMARI_WS_HOST,
+        "AMARI_WS_PORTS": AMARI_WS_PORTS,
+        "AMARI_TRANSPORT": AMARI_TRANSPORT,
+        "AMARI_TIMEOUT": AMARI_TIMEOUT,
+        "CLI_MAX_CONCURRENCY": CLI_MAX_CONCURRENCY,
+        "CLI_TIMEOUT": CLI_TIMEOUT,
+        "CONFIG_CACHE_TTL": CONFIG_CACHE_TTL,
+        "CONFIG_CACHE_SIZE": CONFIG_CACHE_SIZE,
+        "STREAM_QUEUE_SIZE": STREAM_QUEUE_SIZE,
+        "STATS_STORE_ENABLED": STATS_STORE_ENABLED,
+        "STATS_SEGMENT_SIZE": STATS_SEGMENT_SIZE,
+        "STATS_SEGMENT_SECONDS": STATS_SEGMENT_SECONDS,
+        "STATS_QUEUE_SIZE": STATS_QUEUE_SIZE,
+        "N_SAMPLES": N_SAMPLES,
+        "COLLECTOR_ENABLED": COLLECTOR_ENABLED,
+        "COLLECTOR_INTERVAL": COLLECTOR_INTERVAL,
+        "METRICS_PUBLIC": METRICS_PUBLIC,
+        "UE_INDEX_INTERVAL": UE_INDEX_INTERVAL,
+        "USERS_BACKEND": USERS_BACKEND,
+        "USERS_DB_PATH": USERS_DB_PATH,
+        "USERS_CHECK_INTERVAL": USERS_CHECK_INTERVAL,
+        "LOG_LEVEL": LOG_LEVEL,
+        "LOG_LEVELS": LOG_LEVELS,
+        "LOG_MAX_LENGTH": LOG_MAX_LENGTH,
+        "LOG_SAMPLING": LOG_SAMPLING,
+        "LOG_QUEUE_SIZE": LOG_QUEUE_SIZE,
+        "LOG_FILE_SIZE": LOG_FILE_SIZE,
+        "LOG_FILE_COUNT": LOG_FILE_COUNT,
+        "TIMING_ENABLED": TIMING_ENABLED,
+        "JSON_CODEC": JSON_CODEC,
+        "PARSER_MAX_BYTES": PARSER_MAX_BYTES
         #TODO: Add the rest of the parameters
     }
 
@@ -33,8 +99,7 @@ def check_config_file():
         with open(config_path, 'r') as f:
             params = json.load(f)
     except FileNotFoundError:
-        with open(config_path, 'w') as f:
-            json.dump(params, f, indent=4)
+        write_json_atomic(config_path, params)
 
     # Return the parameters
     return params
@@ -43,6 +108,9 @@ def check_config_file():
 class ConfigManager:
     '''
     This class provides global variables that are visible by webui, main and callbacks python files
+
+    The parameters are held in memory. The config.json file is only read again when its mtime, inode or size change
+    (e.g. another uvicorn worker updated it) or when reload_parameters is called
     '''
 
     # Initialize parameters
@@ -51,12 +119,21 @@ class ConfigManager:
     # Check if the config.json file exists, else create it
     parameters = check_config_file()
 
+    # Identity (mtime, inode, size) of the config.json file the parameters were read from
+    file_stamp = None
+
+    # Serializes the updates within the process. Other processes are excluded through a lock file
+    lock = threading.RLock()
+    lock_depth = 0
+
 
     @classmethod
     def update_parameters(cls, key, value):
         '''
         Update the parameters of the config.json file. It does not require object instantiation but uses class attributes
 
+        The file is re-read under the lock before the update, so changes written by other processes are not lost
+
         Parameters:
         key: str. The key of the parameter to be updated
         value: any. The value of the parameter to be updated
@@ -65,40 +142,119 @@ class ConfigManager:
         - None
         '''
         
-        if key == "datVR":
-            # Convert the dataframe to a dict
-            cls.parameters[key] = value.to_dict(orient='index')
-        else:
-            cls.parameters[key] = value
+        with cls.locked(config_path):
+            cls.refresh_parameters()
+
+            if key == "datVR":
+                # Convert the dataframe to a dict
+                cls.parameters[key] = value.to_dict(orient='index')
+            else:
+                cls.parameters[key] = value
 
-        cls.write_parameters_json("./config/config.json")
+            cls.write_parameters_json(config_path)
 
 
     @classmethod
-    def get_parameters(cls, key):
+    def get_parameters(cls, key, default=None):
         '''
         Get the parameter defined by the key in the config.json file. It does not require object instantiation but uses class attributes
 
         Parameters:
         key: str. The key of the parameter to be retrieved
+        default: any, default=None. The value returned when the key is not defined in the config.json file
 
         Returns:
         - The value of the parameter
         '''
         
-        cls.read_parameters_json(config_path)
+        cls.refresh_parameters()
 
         if key == "datVR":
             # Return a dataframe
             return pd.DataFrame.from_dict(cls.parameters[key], orient='index')
         else:
-            return cls.parameters.get(key, None)
+            return cls.parameters.get(key, default)
+
+
+    @classmethod
+    def refresh_parameters(cls):
+        '''
+        Read the config.json file again only if it changed since it was last read. It does not require object instantiation but uses class attributes
+
+        Returns:
+        - True if the parameters were reloaded, False otherwise
+        '''
+
+        try:
+            stamp = cls.get_file_stamp(config_path)
+        except FileNotFoundError:
+            return False
+
+        if stamp == cls.file_stamp:
+            return False
+
+        cls.read_parameters_json(config_path)
+        return True
+
+
+    @classmethod
+    def reload_parameters(cls):
+        '''
+        Read the config.json file unconditionally. It does not require object instantiation but uses class attributes
+
+        Returns:
+        - None
+        '''
+
+        cls.read_parameters_json(config_path)
+
+
+    @staticmethod
+    def get_file_stamp(path):
+        '''
+        Return the identity of a file, which changes whenever the file is rewritten or replaced
+
+        Parameters:
+        path: str. The path to the file
+
+        Returns:
+        - A tuple with the mtime (ns), inode and size of the file
+        '''
+
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
+    @classmethod
+    @contextmanager
+    def locked(cls, path):
+        '''
+        Context manager that holds the in-process lock and, where fcntl is available, an exclusive lock on the path + '.lock' file.
+        It is reentrant, the lock file is only taken by the outermost holder
+
+        Parameters:
+        path: str. The path to the file to be protected
+        '''
+
+        with cls.lock:
+            lock_file = None
+            if fcntl is not None and cls.lock_depth == 0:
+                lock_file = open(path + '.lock', 'w')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            cls.lock_depth += 1
+            try:
+                yield
+            finally:
+                cls.lock_depth -= 1
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
 
 
     @classmethod
     def write_parameters_json(cls, path):
         '''
-        Write the config.json file. It does not require object instantiation but uses class attributes
+        Write the config.json file atomically (temporary file and rename). It does not require object instantiation but uses class attributes
 
         Parameters:
         path: str. The path to the config.json file
@@ -107,8 +263,10 @@ class ConfigManager:
         - None
         '''
         
-        with open(path, 'w') as f:
-            json.dump(cls.parameters, f, indent=4)
+        with cls.locked(path):
+            write_json_atomic(path, cls.parameters)
+            if path == config_path:
+                cls.file_stamp = cls.get_file_stamp(path)
 
 
     @classmethod
@@ -123,5 +281,9 @@ class ConfigManager:
         - None
         '''
         
+        # Take the identity before reading, so a change written meanwhile is detected on the next lookup
+        stamp = cls.get_file_stamp(path)
         with open(path, 'r') as f:
-            cls.parameters = json.load(f)
\ No newline at end of file
+            cls.parameters = json.load(f)
+        if path == config_path:
+            cls.file_stamp = stamp
@@ -7,13 +7,41 @@ The parameters are:
 - reload: if the API should reload on changes
 - data_path: the path where the data is stored
 - local_data_path: the path where the local data is stored
+- amari_ws_host: the host of the AMARI Remote API (WebSocket)
+- amari_ws_ports: the Remote API port of each entity (enb, mme, ...)
+- amari_transport: how messages reach the Remote API ("ws" native client or "wsjs" subprocess)
+- amari_timeout: the timeout (seconds) of a Remote API request
+- cli_max_concurrency: the maximum number of CLI/ws.js processes running at the same time
+- cli_timeout: the timeout (seconds) of a CLI/ws.js process before it is killed
+- config_cache_ttl: the time (seconds) a config_get response is cached (0 disables the cache)
+- config_cache_size: the maximum number of cached config_get responses
+- stream_queue_size: the maximum number of stats frames pending per streaming subscriber before the oldest are dropped
+- stats_store_enabled: if the sampled enb/ue/mme stats are appended to the on-disk store under the data path
+- stats_segment_size: the compressed size (bytes) after which a stats segment file is closed
+- stats_segment_seconds: the age (seconds) after which a stats segment file is closed
+- stats_queue_size: the maximum number of stats snapshots waiting to be written before new ones are dropped
+- n_samples: the number of samples of each source kept in memory by the background stats collector
+- collector_enabled: if the background stats collector is started with the API
+- collector_interval: the sampling interval (seconds) of the background stats collector
+- metrics_public: if the Prometheus /metrics endpoint can be scraped without an access token
+- ue_index_interval: the periodic refresh interval (seconds) of the indexed UE snapshot (0 refreshes it only on demand)
+- users_backend: where the API users are stored ("sqlite" database file or "memory", lost on restart)
+- users_db_path: the path to the SQLite user database
+- users_check_interval: the minimum time (seconds) between two checks for user changes made by other processes
+- log_level: the minimum level of the logged messages (DEBUG, INFO, WARNING or ERROR)
+- log_levels: the minimum level of specific entities (e.g. {"CLI": "WARNING"}), overriding log_level
+- log_max_length: the number of characters after which a logged message is truncated
+- log_sampling: keep one of every N messages below WARNING of an entity (e.g. {"CLI": 10})
+- log_queue_size: the maximum number of messages waiting to be written before new ones are dropped
+- log_file_size: the size (bytes) after which the log file (data path/logs/api.jsonl) is rotated
+- log_file_count: the number of rotated log files kept
+- timing_enabled: if the per-endpoint and per-stage latency histograms and the Server-Timing headers are recorded
+- json_codec: the JSON codec of the Remote API replies and the HTTP responses ("auto" uses orjson if installed, "orjson" or "json")
+- parser_max_bytes: the largest ws.js output (bytes) read, ws.js is killed as soon as its output exceeds it
 TODO:
 - date: the current date
 - time: the current time
 - datetime: the current datetime
-- log_path: the path where the logs are stored
-- log_file: the log file
-- log_level: the log level
 - log_format: the log format
 '''
 
@@ -26,4 +54,34 @@ N_SAMPLES = 20
 HOST_NAME = "amari-api"
 AMARI_HOST = "192.168.159.160"
 AMARI_PORT = 5000
-AMARI_PATH = "/root/enb"
\ No newline at end of file
+AMARI_PATH = "/root/enb"
+AMARI_WS_HOST = "127.0.0.1"
+AMARI_WS_PORTS = {"mme": 9000, "enb": 9001, "ue": 9002, "ims": 9003}
+AMARI_TRANSPORT = "ws"
+AMARI_TIMEOUT = 60
+CLI_MAX_CONCURRENCY = 8
+CLI_TIMEOUT = 60
+CONFIG_CACHE_TTL = 30
+CONFIG_CACHE_SIZE = 16
+STREAM_QUEUE_SIZE = 8
+STATS_STORE_ENABLED = True
+STATS_SEGMENT_SIZE = 16 * 1024 * 1024
+STATS_SEGMENT_SECONDS = 3600
+STATS_QUEUE_SIZE = 1024
+COLLECTOR_ENABLED = False
+COLLECTOR_INTERVAL = 1.0
+METRICS_PUBLIC = False
+UE_INDEX_INTERVAL = 0
+USERS_BACKEND = "sqlite"
+USERS_DB_PATH = "./config/users.db"
+USERS_CHECK_INTERVAL = 1.0
+LOG_LEVEL = "INFO"
+LOG_LEVELS = {}
+LOG_MAX_LENGTH = 1000
+LOG_SAMPLING = {}
+LOG_QUEUE_SIZE = 4096
+LOG_FILE_SIZE = 10 * 1024 * 1024
+LOG_FILE_COUNT = 5
+TIMING_ENABLED = False
+JSON_CODEC = "auto"
+PARSER_MAX_BYTES = 256 * 1024 * 1024
@@ -1,20 +1,37 @@
 # DEPENDENCIES
 # ------------------------------------------------------------------------------
-from fastapi import FastAPI, Query, Path, Body, HTTPException, Depends, status
+from fastapi import FastAPI, Query, Path, Body, Header, HTTPException, Depends, status, Request, WebSocket, WebSocketDisconnect
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse, Response
-from typing import Union, Annotated
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Union, Annotated, Literal
 from starlette.responses import RedirectResponse
 from utils.network import NetworkTools as net
 from utils.cli import Cli as cli
-from auth.auth import fake_users_db, User, UserInDB, get_current_active_user, authenticate_user, create_access_token, Token, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.remote_api import RemoteApiClient
+from utils.streaming import StatsBroadcaster
+from utils.collector import StatsCollector
+from utils.ue_index import UeIndex
+from utils.utils import logger
+from utils.timing import timings
+from utils.codec import codec
+from utils import metrics
+from utils import aggregate
+from config.configurator import ConfigManager
+from config.defaultParams import STREAM_QUEUE_SIZE, N_SAMPLES, COLLECTOR_ENABLED, COLLECTOR_INTERVAL, METRICS_PUBLIC, UE_INDEX_INTERVAL, TIMING_ENABLED, JSON_CODEC
+from auth.auth import users, User, UserInDB, UserCreate, UserUpdate, UserImport, get_current_active_user, get_current_admin_user, get_user_from_token, authenticate_user, authenticate_user_throttled, login_throttle, hash_passwords, is_password_hash, create_access_token, Token, ACCESS_TOKEN_EXPIRE_MINUTES, token_cache
 from datetime import timedelta
+from contextlib import asynccontextmanager
 import os
+import json
+import asyncio
+import time
 import pandas as pd
 import subprocess
 
 from utils.parser import Parser
+from utils import columnar
 from .models import * 
+from .middleware import CancelOnDisconnectMiddleware, TimingMiddleware, FastJSONResponse
 
 #from Stats import Stats
 #from utils import *
@@ -59,7 +76,62 @@ You will be able to:
 * **Services** (_not implemented_).
 * **Core** (_not implemented_).
 """
-app = FastAPI(title="Network-in-a-box API", version="1.0.0", summary="MobileNet API for Network-in-a-box service management", description=description)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown of the API. The stats collector and the UE index refresh are started if enabled. The Remote API connections are closed and the stats store is flushed on shutdown."""
+    if ConfigManager.get_parameters('COLLECTOR_ENABLED', COLLECTOR_ENABLED):
+        collector.start()
+    ue_index.start()
+    yield
+    await collector.stop()
+    await ue_index.stop()
+    await RemoteApiClient.close()
+    await asyncio.to_thread(cli.stats_store.close)
+    await asyncio.to_thread(logger.close)
+
+
+app = FastAPI(title="Network-in-a-box API", version="1.0.0", summary="MobileNet API for Network-in-a-box service management", description=description, lifespan=lifespan,
+              default_response_class=FastJSONResponse)
+app.add_middleware(CancelOnDisconnectMiddleware)
+app.add_middleware(TimingMiddleware)
+
+# Per-endpoint and per-stage latency histograms (Server-Timing header and /debug/timings)
+timings.enabled = ConfigManager.get_parameters('TIMING_ENABLED', TIMING_ENABLED)
+
+# JSON codec of the Remote API replies and of the responses (orjson when installed)
+codec.set_codec(ConfigManager.get_parameters('JSON_CODEC', JSON_CODEC))
+
+# Shares one sampling loop between the subscribers of the same stats stream
+broadcaster = StatsBroadcaster()
+
+# Keeps the last samples of the enb/ue/mme stats in memory (cached=true on the stats endpoints)
+collector = StatsCollector(interval=ConfigManager.get_parameters('COLLECTOR_INTERVAL', COLLECTOR_INTERVAL),
+                           n_samples=ConfigManager.get_parameters('N_SAMPLES', N_SAMPLES))
+
+# Renders the collector samples as Prometheus metrics
+metrics_exporter = metrics.MetricsExporter(collector)
+
+# Joined snapshot of the enb and mme UE lists, indexed by ue_id, RNTI, IMSI and IMEI
+ue_index = UeIndex(interval=ConfigManager.get_parameters('UE_INDEX_INTERVAL', UE_INDEX_INTERVAL))
+
+
+async def get_ue_snapshot(max_age: float):
+    '''Return the UE snapshot, refreshed if older than max_age. Raises a 502 error if it could never be fetched'''
+
+    snapshot = await ue_index.get_snapshot(max_age=max_age)
+    if snapshot is None:
+        raise HTTPException(status_code=502, detail="The UE lists could not be fetched")
+    return snapshot
+
+
+def get_collected_output(source: str):
+    '''Return the last successful collector sample of a source as a Remote API output, or None if there is none'''
+
+    sample = collector.latest(source)
+    if sample is None:
+        return None
+    return {"status": True, "response": sample["response"], "timestamp": sample["timestamp"], "cached": True}
 
 
 #*************************************************************************************************************************************
@@ -67,7 +139,7 @@ app = FastAPI(title="Network-in-a-box API", version="1.0.0", summary="MobileNet
 #*************************************************************************************************************************************
 
 @app.post("/token")
-async def login_for_access_token(
+async def login_for_access_token(request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()]) -> Token:
     """Login for access token.
     Parameters:
@@ -76,10 +148,12 @@ async def login_for_access_token(
     Returns:
     - Token: The access token and token type.
     Raises:
-    - HTTPException: If the username or password is incorrect.
+    - HTTPException: If the username or password is incorrect (401), after too many failed attempts of the username or the client (429, with
+    Retry-After) or if too many logins are in progress (503).
     """
 
-    user = authenticate_user(fake_users_db, form_data.username, form_data.password)
+    client = request.client.host if request.client else None
+    user = await authenticate_user_throttled(users, form_data.username, form_data.password, client=client)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -106,6 +180,107 @@ async def read_own_items(
 ):
     return [{"item_id": "Foo", "owner": current_user.username}]
 
+
+@app.get("/users", tags=["Users"])
+async def list_users(current_user: Annotated[User, Depends(get_current_admin_user)]) -> list[User]:
+    """**List** the users of the API (administrators only)."""
+
+    return [User(**user) for user in users.list()]
+
+
+@app.post("/users", tags=["Users"], status_code=status.HTTP_201_CREATED)
+async def create_user(current_user: Annotated[User, Depends(get_current_admin_user)],
+                      user: Annotated[UserCreate, Body()]) -> User:
+    """**Create** a user (administrators only). The change applies immediately, without restarting the API.
+
+    Raises:
+    - HTTPException: 409 if the username already exists.
+    """
+
+    if users.get(user.username) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"User {user.username} already exists")
+
+    (hashed_password,) = await hash_passwords([user.password])
+    record = user.model_dump(exclude={"password"})
+    record["hashed_password"] = hashed_password
+    await asyncio.to_thread(users.upsert, record)
+    return User(**record)
+
+
+@app.patch("/users/{username}", tags=["Users"])
+async def update_user(current_user: Annotated[User, Depends(get_current_admin_user)],
+                      username: Annotated[str, Path()],
+                      changes: Annotated[UserUpdate, Body()]) -> User:
+    """**Update** a user (administrators only). Only the fields set are changed. The tokens of the user are resolved again on the next request,
+    so disabling a user applies immediately.
+
+    Raises:
+    - HTTPException: 404 if the user does not exist.
+    """
+
+    record = users.get(username)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {username} not found")
+
+    updates = changes.model_dump(exclude_unset=True)
+    password = updates.pop("password", None)
+    if password is not None:
+        (record["hashed_password"],) = await hash_passwords([password])
+    record.update(updates)
+    await asyncio.to_thread(users.upsert, record)
+    return User(**record)
+
+
+@app.delete("/users/{username}", tags=["Users"])
+async def delete_user(current_user: Annotated[User, Depends(get_current_admin_user)],
+                      username: Annotated[str, Path()]):
+    """**Delete** a user (administrators only). Administrators cannot delete themselves.
+
+    Raises:
+    - HTTPException: 400 if the user is the current one, 404 if the user does not exist.
+    """
+
+    if username == current_user.username:
+        raise HTTPException(status_code=400, detail="You cannot delete your own user")
+    if not await asyncio.to_thread(users.delete, username):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {username} not found")
+    return {"status": True, "message": "delete_user", "username": username}
+
+
+@app.post("/users/import", tags=["Users"])
+async def import_users(current_user: Annotated[User, Depends(get_current_admin_user)],
+                       imported: Annotated[list[UserImport], Body()]):
+    """**Import** several users at once (administrators only). Existing users with the same username are replaced.
+
+    Each user has either its plain **password** (hashed on import) or its bcrypt **hashed_password**. The import is atomic: either every user is
+    stored or none.
+
+    Raises:
+    - HTTPException: 400 if a user has no password, a hashed_password is not a bcrypt hash or the same username appears twice.
+    """
+
+    usernames = [user.username for user in imported]
+    if len(set(usernames)) != len(usernames):
+        raise HTTPException(status_code=400, detail="Duplicated usernames")
+    missing = [user.username for user in imported if user.password is None and user.hashed_password is None]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Users without password: {', '.join(missing)}")
+    # A hash passlib cannot identify would fail every login of the user with an error
+    invalid = [user.username for user in imported if user.password is None and not is_password_hash(user.hashed_password)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Users whose hashed_password is not a bcrypt hash: {', '.join(invalid)}")
+
+    plain = [user for user in imported if user.password is not None]
+    hashed = dict(zip((user.username for user in plain), await hash_passwords([user.password for user in plain])))
+
+    records = []
+    for user in imported:
+        record = user.model_dump(exclude={"password", "hashed_password"})
+        record["hashed_password"] = hashed.get(user.username, user.hashed_password)
+        records.append(record)
+    await asyncio.to_thread(users.upsert_many, records)
+    return {"status": True, "message": "import_users", "length": len(records), "users": usernames}
+
 #*************************************************************************************************************************************
 #******************************************** Internal ENDPOINTS (non-visible) *******************************************************
 #*************************************************************************************************************************************
@@ -138,7 +313,7 @@ async def get_help(current_user: Annotated[User, Depends(get_current_active_user
     '''
     try:
         output = await cli.execute_command(entity="enb", message={"message": "help"})
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
@@ -159,9 +334,12 @@ async def generic_request(  current_user: Annotated[User, Depends(get_current_ac
     
 
     '''
+    if not isinstance(message, dict) or "message" not in message:
+        raise HTTPException(status_code=400, detail='The body must be a Remote API message (e.g. {"message": "config_get"})')
+
     try:
         output = await cli.execute_command(entity=entity, message=message)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
@@ -176,6 +354,7 @@ async def reset_service(current_user: Annotated[User, Depends(get_current_active
 
     try:
         output = await cli.execute_cli_command(command=["service", "lte", "restart"])
+        cli.response_cache.invalidate()
         if output["status"] == 200:
             return {"status": True, "message": "Service reset successfully"}
         else:
@@ -204,6 +383,7 @@ async def stop_service(current_user: Annotated[User, Depends(get_current_active_
 
     try:
         output = await cli.execute_cli_command(command=["service", "lte", "stop"])
+        cli.response_cache.invalidate()
         if output["status"] == 200:
             return {"status": True, "message": "Service stopped successfully"}
         else:
@@ -218,6 +398,7 @@ async def start_service(current_user: Annotated[User, Depends(get_current_active
 
     try:
         output = await cli.execute_cli_command(command=["service", "lte", "start"])
+        cli.response_cache.invalidate()
         if output["status"] == 200:
             return {"status": True, "message": "Service started successfully"}
         else:
@@ -231,12 +412,15 @@ async def start_service(current_user: Annotated[User, Depends(get_current_active
 #*************************************************************************************************************************************
 
 @app.get("/enb/get_config", tags=["gNB"])
-async def get_eNB_config(current_user: Annotated[User, Depends(get_current_active_user)]):
-    '''Sends a **gNB configuration** get message to the Websocket AMARI API'''
+async def get_eNB_config(current_user: Annotated[User, Depends(get_current_active_user)],
+                         use_cache: Annotated[bool, Query()] = True):
+    '''Sends a **gNB configuration** get message to the Websocket AMARI API
+    
+    The response is cached for `CONFIG_CACHE_TTL` seconds and invalidated by any configuration change. Set **use_cache** to `false` to bypass (and refresh) the cache.'''
 
     try:
-        output = await cli.execute_command(entity="enb", message={"message": "config_get"})
-        return output
+        output = await cli.execute_command(entity="enb", message={"message": "config_get"}, use_cache=use_cache)
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
 
@@ -257,7 +441,7 @@ async def set_cell_gain(current_user: Annotated[User, Depends(get_current_active
     
     try:
         output = await cli.execute_command(entity="enb", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
@@ -278,7 +462,7 @@ async def set_noise_level(current_user: Annotated[User, Depends(get_current_acti
 
     try:
         output = await cli.execute_command(entity="enb", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:  
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
 
@@ -300,7 +484,7 @@ async def set_inactivity_timer(current_user: Annotated[User, Depends(get_current
     configuration["message"] = "config_set"
     try:
         output = await cli.execute_command(entity="enb", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
@@ -328,7 +512,7 @@ async def set_prb_allocation(current_user: Annotated[User, Depends(get_current_a
 
     try:
         output = await cli.execute_command(entity="enb", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
 
@@ -350,14 +534,65 @@ async def set_mcs(current_user: Annotated[User, Depends(get_current_active_user)
 
     try:
         output = await cli.execute_command(entity="enb", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
 
+@app.post("/enb/set_batch", tags=["gNB"])
+async def set_batch(current_user: Annotated[User, Depends(get_current_active_user)],
+                    batch: Annotated[ConfigBatch, Body()]):
+    '''Apply several **cell configuration changes** in one request. Every field is optional and uses the same model as its single endpoint:
+    * **gain**: A list of cell gain changes (as in `/enb/set_gain`).
+    * **noise**: A list of noise level changes (as in `/enb/set_noise_level`).
+    * **mcs**: The MCS per cell (as in `/enb/set_mcs`).
+    * **prb_alloc**: The PRB allocation per cell (as in `/enb/set_prb_alloc`).
+    * **inactivity_timer**: The inactivity timer per cell (as in `/enb/set_inactivity_timer`).
+
+    The MCS, PRB allocation and inactivity timer changes of every cell are merged into a **single** `config_set` message. Gain and noise changes are sent as
+    their own messages, pipelined with the `config_set` over the same connection.
+
+    The response contains the **status** (`True` if every item succeeded), the total **latency** in seconds and one entry per message in **items**.
+    '''
+
+    messages = []
+
+    # Merge the per-cell configurations into one config_set message
+    cells = {}
+    for configuration in (batch.mcs, batch.prb_alloc, batch.inactivity_timer):
+        if configuration is None:
+            continue
+        for cell_id, values in configuration.model_dump(by_alias=True)["cells"].items():
+            cells.setdefault(cell_id, {}).update(values)
+    if cells:
+        messages.append({"message": "config_set", "cells": cells})
+
+    for gain in batch.gain:
+        messages.append({**gain.model_dump(), "message": "cell_gain"})
+    for noise in batch.noise:
+        messages.append({**noise.model_dump(), "message": "noise_level"})
+
+    if not messages:
+        raise HTTPException(status_code=400, detail="The batch does not contain any change")
+
+    start = time.perf_counter()
+    results = await cli.execute_batch(entity="enb", messages=messages)
+    latency = time.perf_counter() - start
+
+    items = []
+    for message, (output, item_latency) in zip(messages, results):
+        item = {"request": message, "status": output["status"] is True, "latency": item_latency, "response": output["response"]}
+        if "error" in output:
+            item["error"] = output["error"]
+        items.append(item)
+
+    return {"status": all(item["status"] for item in items), "message": "batch", "latency": latency, "items": items}
+
+
 @app.post("/enb/get_stats", tags=["gNB"])
 async def get_stats(current_user: Annotated[User, Depends(get_current_active_user)],
-                    stats: Annotated[ConfigStats, Body()]):
+                    stats: Annotated[ConfigStats, Body()],
+                    cached: Annotated[bool, Query()] = False):
     '''Get the **stats** of the **gNB**. 
     
     The value of the key should be a dictionary containing the following fields:
@@ -366,14 +601,22 @@ async def get_stats(current_user: Annotated[User, Depends(get_current_active_use
     * **Initial_delay**: The initial delay in seconds before collecting the stats, by default 0.4 seconds.
 
     If the configuration is set, the **status** field of the response will be `True` and the **message** field will be `stats`.
+
+    Set **cached** to `true` to get the last sample of the background collector instead (no wait, the body is ignored). The response then has the
+    **timestamp** of the sample. If the collector has no sample, the stats are requested as usual.
     '''
 
+    if cached:
+        output = get_collected_output("enb")
+        if output is not None:
+            return FastJSONResponse(output)
+
     configuration = stats.model_dump(by_alias=True)
     configuration["message"] = "stats"
 
     try:
         output = await cli.execute_command(entity="enb", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
@@ -400,6 +643,21 @@ async def get_channel_stats(current_user: Annotated[User, Depends(get_current_ac
     * **end_timestamp**: The end timestamp for collecting the stats.
     * **ue_id**: The ID of the UE (e.g., `1`, `2`). If UE not found, it will return an empty list.
     * **rnti**: The RNTI (Radio Network Temporary Identifier) of the UE (e.g., `1`, `2`). If UE not found, it will return an empty list.
+
+    Incremental tail mode:
+    * **tail**: A boolean indicating whether to return a **cursor** with the response.
+    * **cursor**: The cursor returned by a previous call. Only the entries after it are returned (implies **tail**).
+    * **wait**: Long-poll. The seconds (up to `60`) to wait for new entries before returning an empty result.
+
+    Filters applied on the API side (several values are OR-ed, several filters are AND-ed):
+    * **filter_rnti**: Keep only the entries of these RNTIs (e.g. `[17921]`).
+    * **filter_cell**: Keep only the entries of these cells (e.g. `[2]`).
+
+    Response format (**format**):
+    * `default`: A dictionary keyed by timestamp with one dictionary per entry. Entries sharing a timestamp overwrite each other.
+    * `records`: A list with every entry, including its `timestamp`, `cell`, `rnti` and `channel`. Nothing is overwritten.
+    * `columnar`: One array per field (`timestamp`, `cell`, `rnti`, `channel`, `prb_start`, `mcs`, ...). Missing fields are `null`.
+    * `arrow` / `parquet`: The same columns as Arrow IPC stream or Parquet bytes (requires `pyarrow`). The cursor is returned in the `X-Log-Cursor` header.
     
     If the configuration is set, the **status** field of the response will be `True` and the **message** field will be `log_get`.
     '''
@@ -407,23 +665,68 @@ async def get_channel_stats(current_user: Annotated[User, Depends(get_current_ac
     configuration = log_stats.model_dump(by_alias=True, exclude_unset=True)
     configuration["message"] = "log_get"
 
-    if configuration["discard_si"]:
-        configuration.pop("discard_si")
-        discard_si = True
-    else:
-        discard_si = False
-
-    if configuration["channels"]:
-        channels = configuration["channels"]
-        configuration.pop("channels")
-
+    discard_si = bool(configuration.pop("discard_si", False))
+    channels = configuration.pop("channels", None) or ["PDSCH"]
+    response_format = configuration.pop("format", "default")
+    filter_rnti = configuration.pop("filter_rnti", None)
+    filter_cell = configuration.pop("filter_cell", None)
+    if response_format in ("arrow", "parquet") and columnar.pa is None:
+        raise HTTPException(status_code=501, detail=f"The {response_format} format requires pyarrow, which is not installed")
+
+    # Tail mode: resume from the cursor and return the cursor of the last entry delivered
+    cursor = configuration.pop("cursor", None)
+    tail = configuration.pop("tail", False) or cursor is not None
+    wait = configuration.pop("wait", None)
+    cursor_timestamp, cursor_skip = None, 0
+    if cursor is not None:
+        try:
+            cursor_timestamp, cursor_skip = Parser.decode_log_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        configuration["start_timestamp"] = cursor_timestamp
+
+    deadline = time.monotonic() + (wait or 0)
     try:
-        output = await cli.execute_command(entity="enb", message=configuration)
-
-        if output:
-            pdsch_messages = Parser.extract_channel_log_messages(log_data=output, discard_si=discard_si, channel=channels)
-            return {"status": True, "message": "log_get", "response": pdsch_messages}
-        return {"status": False, "message": "log_get", "response": "No logs found"}
+        while True:
+            if wait:
+                # Long-poll: let the callbox hold the request until an entry arrives or the remaining time passes
+                configuration.update({"min": 1, "allow_empty": True, "timeout": max(1, int(deadline - time.monotonic()))})
+
+            output = await cli.execute_command(entity="enb", message=configuration)
+            if output["status"] is not True:
+                return {"status": False, "message": "log_get", "response": "No logs found", "error": output.get("error", output["response"])}
+
+            logs = output["response"].get("logs", [])
+            if tail:
+                logs, cursor_timestamp, cursor_skip = Parser.filter_new_logs(logs, cursor_timestamp, cursor_skip)
+            if logs or not wait or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(min(0.2, max(0.0, deadline - time.monotonic())))
+
+        # The upstream output may be shared with other callers, it is not modified
+        log_data = {"status": output["status"], "response": {"logs": logs}}
+        store = Parser.build_channel_log_store(log_data=log_data, discard_si=discard_si, channel=channels)
+        positions = store.select(rntis=filter_rnti, cells=filter_cell)
+        next_cursor = Parser.encode_log_cursor(cursor_timestamp, cursor_skip) if cursor_timestamp is not None else None
+
+        if response_format == "default":
+            result = {"status": True, "message": "log_get", "response": store.to_timestamp_dict(positions)}
+        elif response_format == "records":
+            result = {"status": True, "message": "log_get", "format": "records", "length": len(positions), "response": store.to_records(positions)}
+        else:
+            columns = columnar.to_columns(store.to_records(positions))
+            if response_format == "columnar":
+                result = {"status": True, "message": "log_get", "format": "columnar", "length": len(positions), "response": columnar.columns_to_json(columns)}
+            else:
+                # Binary formats: the cursor travels in a header
+                headers = {"X-Log-Cursor": next_cursor} if tail and next_cursor is not None else None
+                if response_format == "arrow":
+                    return Response(content=columnar.columns_to_ipc(columns), media_type=columnar.ARROW_MEDIA_TYPE, headers=headers)
+                return Response(content=columnar.columns_to_parquet(columns), media_type=columnar.PARQUET_MEDIA_TYPE, headers=headers)
+
+        if tail:
+            result["cursor"] = next_cursor
+        return FastJSONResponse(result)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
@@ -434,14 +737,16 @@ async def reset_log_amari(current_user: Annotated[User, Depends(get_current_acti
 
     try:
         output = await cli.execute_command(entity="enb", message={"message": "log_reset"})
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
 
 @app.post("/ue/get_stats", tags=["UE"])
 async def get_ue_stats(current_user: Annotated[User, Depends(get_current_active_user)],
-                       stats: Annotated[UeStats, Body()]):
+                       stats: Annotated[UeStats, Body()],
+                       cached: Annotated[bool, Query()] = False,
+                       max_age: Annotated[float | None, Query(ge=0)] = None):
     '''**Get** the **stats** of an **UE** connected to a eNB/gNB
     The value of the key may be a dictionary containing the following fields:
     * **ue_id**: The ID of the UE (e.g., `1`, `2`).
@@ -449,40 +754,87 @@ async def get_ue_stats(current_user: Annotated[User, Depends(get_current_active_
     
     If the configuration is set, the **status** field of the response will be `True` and the **message** field will be `ue_get`.
     
-    Note: The field `ue_id` is optional. If not specified, the stats of all UEs will be collected.'''
+    Note: The field `ue_id` is optional. If not specified, the stats of all UEs will be collected.
+
+    Set **cached** to `true` to get the last sample of the background collector instead (stats of all UEs, only when `ue_id` is not set).
+
+    Set **max_age** (seconds) to look the `ue_id` up in the indexed UE snapshot, which is refreshed first if it is older (the entry includes the stats).
+    The response then has the **timestamp** of the snapshot.'''
 
     configuration = stats.model_dump(by_alias=True, exclude_unset=True)
     configuration["message"] = "ue_get"
 
+    if max_age is not None and "ue_id" in configuration:
+        snapshot = await get_ue_snapshot(max_age)
+        ue_list = [ue["enb"] for ue in snapshot.lookup(ue_id=configuration["ue_id"]) if ue["enb"] is not None]
+        return {"status": True, "response": {"message": "ue_get", "ue_list": ue_list}, "timestamp": snapshot.timestamp}
+
+    if cached and "ue_id" not in configuration:
+        output = get_collected_output("ue")
+        if output is not None:
+            return FastJSONResponse(output)
+
     try:
         output = await cli.execute_command(entity="enb", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
 
+@app.get("/ue/lookup", tags=["UE"])
+async def lookup_ue(current_user: Annotated[User, Depends(get_current_active_user)],
+                    ue_id: Annotated[int | None, Query()] = None,
+                    rnti: Annotated[int | None, Query()] = None,
+                    imsi: Annotated[str | None, Query()] = None,
+                    imei: Annotated[str | None, Query()] = None,
+                    max_age: Annotated[float, Query(ge=0)] = 5.0):
+    '''**Look up** a UE in the indexed snapshot of the gNB and core UE lists.
+
+    * **ue_id**: The `enb_ue_id` / `ran_ue_id` of the UE.
+    * **rnti**: The RNTI of the UE.
+    * **imsi** / **imei**: The IMSI / IMEI of the UE.
+    * **max_age**: The maximum age of the snapshot in seconds (`0` forces a refresh), by default 5 seconds.
+
+    Every given identifier must match. Without identifiers, every UE is returned. Each UE has its gNB (**enb**) and core (**mme**) entry, joined on the
+    `amf_ue_id` / `mme_ue_id` (or the IMSI). An entry is `null` if the UE is only known by one side.
+    '''
+
+    snapshot = await get_ue_snapshot(max_age)
+    ues = snapshot.lookup(ue_id=ue_id, rnti=rnti, imsi=imsi, imei=imei)
+    return {"status": True, "message": "lookup", "timestamp": snapshot.timestamp, "length": len(ues), "response": ues}
+
+
 # **************************************************************************************************************************************
 # ************************************************** NETWORK CORE ENDPOINTS ************************************************************
 # ************************************************************************************************************************************** 
 
 @app.get("/core/get_config", tags=["Network core"])
-async def get_core_config(current_user: Annotated[User, Depends(get_current_active_user)]):
-    '''Get the configuration of the core network (MME)'''
+async def get_core_config(current_user: Annotated[User, Depends(get_current_active_user)],
+                          use_cache: Annotated[bool, Query()] = True):
+    '''Get the configuration of the core network (MME)
+    
+    The response is cached for `CONFIG_CACHE_TTL` seconds and invalidated by any configuration change. Set **use_cache** to `false` to bypass (and refresh) the cache.'''
 
     try:
-        output = await cli.execute_command(entity="mme", message={"message": "config_get"})
-        return output
+        output = await cli.execute_command(entity="mme", message={"message": "config_get"}, use_cache=use_cache)
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
 
 
 @app.get("/core/get_stats", tags=["Network core"])
-async def get_core_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
-    '''Get the stats of the core network (MME)'''
+async def get_core_stats(current_user: Annotated[User, Depends(get_current_active_user)],
+                         cached: Annotated[bool, Query()] = False):
+    '''Get the stats of the core network (MME). Set **cached** to `true` to get the last sample of the background collector instead.'''
+
+    if cached:
+        output = get_collected_output("mme")
+        if output is not None:
+            return FastJSONResponse(output)
 
     try:
         output = await cli.execute_command(entity="mme", message={"message": "stats"})
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
 
@@ -493,23 +845,33 @@ async def get_attached_gnb(current_user: Annotated[User, Depends(get_current_act
 
     try:
         output = await cli.execute_command(entity="mme", message={"message": "ng_ran"})
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
     
 @app.post("/core/get_ue", tags=["Network core"])
 async def get_ue(current_user: Annotated[User, Depends(get_current_active_user)],
-                 ue: Annotated[UeCore, Body()]):
+                 ue: Annotated[UeCore, Body()],
+                 max_age: Annotated[float | None, Query(ge=0)] = None):
     '''Get the stats of the UEs connected to the network core (MME). It is possible to filter by **IMSI (field "imsi")** or **IMEI (i.e., "imei")**. 
-    If UE not found, it will return an empty list.'''
+    If UE not found, it will return an empty list.
+
+    Set **max_age** (seconds) to look the UEs up in the indexed UE snapshot, which is refreshed first if it is older. The response then has the
+    **timestamp** of the snapshot.'''
 
     configuration = ue.model_dump(by_alias=True, exclude_unset=True)
     configuration["message"] = "ue_get"
 
+    if max_age is not None:
+        snapshot = await get_ue_snapshot(max_age)
+        ues = snapshot.lookup(imsi=configuration.get("imsi"), imei=configuration.get("imei"))
+        ue_list = [ue["mme"] for ue in ues if ue["mme"] is not None]
+        return {"status": True, "response": {"message": "ue_get", "ue_list": ue_list}, "timestamp": snapshot.timestamp}
+
     try:
         output = await cli.execute_command(entity="mme", message=configuration)
-        return output
+        return FastJSONResponse(output)
     except subprocess.CalledProcessError as e:
         raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
     
@@ -517,3 +879,321 @@ async def get_ue(current_user: Annotated[User, Depends(get_current_active_user)]
 
     
 
+
+# **************************************************************************************************************************************
+# ************************************************** COLLECTOR ENDPOINTS ***************************************************************
+# **************************************************************************************************************************************
+
+@app.get("/collector/latest", tags=["Collector"])
+async def get_collector_latest(current_user: Annotated[User, Depends(get_current_active_user)],
+                               source: Annotated[Literal["enb", "ue", "mme"], Query()] = "enb"):
+    '''Get the **last successful sample** of the background collector for the **gNB** (`enb`), the **UEs** (`ue`) or the **core** (`mme`).
+
+    The sample has the **source**, **timestamp**, **status** and **response**. Returns 404 if the collector has no sample yet.
+    '''
+
+    sample = collector.latest(source)
+    if sample is None:
+        raise HTTPException(status_code=404, detail=f"No {source} sample collected")
+    return sample
+
+
+@app.get("/collector/window", tags=["Collector"])
+async def get_collector_window(current_user: Annotated[User, Depends(get_current_active_user)],
+                               source: Annotated[Literal["enb", "ue", "mme"], Query()] = "enb",
+                               seconds: Annotated[float | None, Query(gt=0)] = None,
+                               count: Annotated[int | None, Query(ge=1)] = None):
+    '''Get the **samples** kept by the background collector, oldest first. At most `N_SAMPLES` samples are kept per source.
+
+    * **source**: The stats (`enb`, `ue` or `mme`).
+    * **seconds**: Only the samples of the last seconds. By default, every sample kept.
+    * **count**: Only the last samples. By default, every sample kept.
+    '''
+
+    samples = collector.window(source, seconds=seconds, count=count)
+    return {"status": True, "message": "window", "source": source, "length": len(samples), "response": samples}
+
+
+@app.get("/collector/status", tags=["Collector"])
+async def get_collector_status(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the **state** of the background collector (running, interval, samples kept, errors and age of the last sample of each source).'''
+
+    return collector.get_stats()
+
+
+@app.post("/collector/start", tags=["Collector"])
+async def start_collector(current_user: Annotated[User, Depends(get_current_admin_user)]):
+    '''**Start** the background collector. It is started with the API when `COLLECTOR_ENABLED` is `true`. Admin only.'''
+
+    collector.start()
+    return collector.get_stats()
+
+
+@app.post("/collector/stop", tags=["Collector"])
+async def stop_collector(current_user: Annotated[User, Depends(get_current_admin_user)]):
+    '''**Stop** the background collector. The samples already kept are still served. Admin only.'''
+
+    await collector.stop()
+    return collector.get_stats()
+
+
+@app.get("/metrics", tags=["Collector"])
+async def get_metrics(authorization: Annotated[str | None, Header()] = None):
+    '''Get the cell, UE and core KPIs in the **Prometheus** text format.
+
+    The metrics are built from the last samples of the background collector (`COLLECTOR_ENABLED`), a scrape never reaches the callbox:
+    * **amari_cell_*{entity, cell}**: every numeric field of each cell in the gNB stats (e.g. `dl_bitrate`, `ul_bitrate`, `dl_use_avg`, `ue_count_avg`).
+    * **amari_ue_*{enb_ue_id, ran_ue_id, rnti, imsi}**: every numeric field of each UE in ue_get.
+    * **amari_ue_cell_*{enb_ue_id, ran_ue_id, rnti, imsi, cell}**: every numeric field of each cell of a UE in ue_get (e.g. `dl_mcs`, `ul_mcs`, `cqi`, `dl_bitrate`).
+    * **amari_enb_*_total / amari_mme_*_total{name}**: the counters of the gNB and core stats (e.g. `messages`, `errors`).
+    * **amari_enb_cpu_load / amari_mme_cpu_load{cpu}**, **amari_ue_count**, **amari_collector_up** and **amari_sample_age_seconds{source}**.
+    * Boolean fields are exported as `1`/`0`.
+
+    A bearer token is required unless `METRICS_PUBLIC` is `true`.
+    '''
+
+    if not ConfigManager.get_parameters('METRICS_PUBLIC', METRICS_PUBLIC):
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        user = get_user_from_token(token)
+        if user.disabled:
+            raise HTTPException(status_code=400, detail="Inactive user")
+
+    return Response(content=metrics_exporter.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# **************************************************************************************************************************************
+# ************************************************** STATS HISTORY ENDPOINTS ***********************************************************
+# **************************************************************************************************************************************
+
+@app.get("/stats/history", tags=["Stats history"])
+async def get_stats_history(current_user: Annotated[User, Depends(get_current_active_user)],
+                            source: Annotated[Literal["enb", "ue", "mme"], Query()] = "enb",
+                            start: Annotated[float | None, Query()] = None,
+                            end: Annotated[float | None, Query()] = None,
+                            limit: Annotated[int, Query(ge=1, le=100000)] = 1000):
+    '''Get the **stored stats** of the **gNB** (`enb`), the **UEs** (`ue`) or the **core** (`mme`) between two timestamps.
+
+    Every successful `stats` (gNB, core) and `ue_get` with `stats` of every UE (gNB) response, whether requested through the API, streamed or
+    sampled, is appended to compressed daily files under `API_DATA_PATH` (set `STATS_STORE_ENABLED` to `false` to disable it).
+
+    * **source**: The stats to be read (`enb`, `ue` or `mme`).
+    * **start**: The start of the range in seconds since epoch (e.g. `1710000000`). By default, the range is open.
+    * **end**: The end of the range in seconds since epoch. By default, the range is open.
+    * **limit**: The maximum number of snapshots returned (the first ones of the range).
+
+    Each snapshot has its **timestamp**, **source** and **response**.
+    '''
+
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must not be greater than end")
+
+    snapshots = await asyncio.to_thread(cli.stats_store.read, source, start, end, limit)
+    return {"status": True, "message": "history", "source": source, "length": len(snapshots), "response": snapshots}
+
+
+@app.post("/stats/aggregate", tags=["Stats history"])
+async def aggregate_stats_history(current_user: Annotated[User, Depends(get_current_active_user)],
+                                  query: Annotated[StatsAggregate, Body()]):
+    '''**Aggregate** the stored stats per time bucket on the server, returning only the reduced series.
+
+    * **source**: The stored stats (`enb`, `ue` or `mme`).
+    * **start** / **end**: The range in seconds since epoch. By default, the range is open.
+    * **bucket**: The bucket size in seconds (e.g. `60`).
+    * **metrics**: Dotted paths inside the response. `*` matches every key (e.g. `cells.*.dl_bitrate`, `cpu.global`). The items of a list are named
+    by their `enb_ue_id`/`ran_ue_id`/`cell_id` (e.g. `ue_list.*.cells.*.cqi` gives `ue_list.1.cells.1.cqi`, ...).
+    * **functions**: `mean`, `min`, `max`, `sum`, `count`, `std`, `median` or a percentile `pNN` (e.g. `p95`, `p99.9`).
+
+    The **response** has, for each matching metric, the start of every non-empty bucket (**timestamp**) and one list per function.
+    '''
+
+    if query.start is not None and query.end is not None and query.start > query.end:
+        raise HTTPException(status_code=400, detail="start must not be greater than end")
+
+    def run():
+        snapshots = cli.stats_store.iterate(query.source, start=query.start, end=query.end)
+        return aggregate.aggregate(snapshots, metrics=query.metrics, bucket=query.bucket, functions=query.functions, start=query.start)
+
+    result = await asyncio.to_thread(run)
+    return {"status": True, "message": "aggregate", "source": query.source, "origin": result["origin"], "bucket": result["bucket"],
+            "snapshots": result["snapshots"], "response": result["series"]}
+
+
+# **************************************************************************************************************************************
+# ************************************************** STREAMING ENDPOINTS ***************************************************************
+# **************************************************************************************************************************************
+
+@app.get("/stream/stats", tags=["Streaming"])
+async def stream_stats(current_user: Annotated[User, Depends(get_current_active_user)],
+                       source: Annotated[Literal["enb", "ue", "mme"], Query()] = "enb",
+                       interval: Annotated[float, Query(ge=0.1, le=60)] = 1.0,
+                       fields: Annotated[list[str] | None, Query()] = None):
+    '''**Stream** the stats of the **gNB** (`enb`), the **UEs** (`ue`) or the **core** (`mme`) as **Server-Sent Events**.
+
+    * **source**: The stats to be streamed (`enb`, `ue` or `mme`).
+    * **interval**: The sampling interval in seconds (`0.1` to `60`).
+    * **fields**: The top-level fields of the response to be kept (e.g. `cells`, `cpu`). By default, the whole response is sent.
+
+    Each event is a `stats` frame with the **source**, **timestamp**, **status** and **response**. Subscribers of the same source and interval share the same
+    upstream sampling. If the client does not keep up, the oldest frames are dropped.
+    '''
+
+    maxsize = ConfigManager.get_parameters('STREAM_QUEUE_SIZE', STREAM_QUEUE_SIZE)
+
+    async def events():
+        # Subscribed once the response is streamed, so a client gone before the first frame leaves no subscription behind
+        subscription = broadcaster.subscribe(source=source, interval=interval, fields=fields, maxsize=maxsize)
+        try:
+            while True:
+                frame = await subscription.get()
+                yield f"event: stats\ndata: {codec.dumps_str(frame)}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/stream/stats/ws")
+async def stream_stats_ws(websocket: WebSocket,
+                          token: Annotated[str, Query()],
+                          source: Annotated[Literal["enb", "ue", "mme"], Query()] = "enb",
+                          interval: Annotated[float, Query(ge=0.1, le=60)] = 1.0,
+                          fields: Annotated[list[str] | None, Query()] = None):
+    '''Stream the stats over a **WebSocket**. Same parameters and frames as `/stream/stats`. The access token is passed in the **token** query parameter.'''
+
+    try:
+        user = get_user_from_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if user.disabled:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = broadcaster.subscribe(source=source, interval=interval, fields=fields,
+                                         maxsize=ConfigManager.get_parameters('STREAM_QUEUE_SIZE', STREAM_QUEUE_SIZE))
+    try:
+        while True:
+            frame = await subscription.get()
+            await websocket.send_text(codec.dumps_str(frame))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+# **************************************************************************************************************************************
+# ************************************************** DEBUG ENDPOINTS *******************************************************************
+# **************************************************************************************************************************************
+
+@app.get("/debug/coalescing", tags=["Debug"])
+async def get_coalescing_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the counters of the **single-flight coalescing** of read-only Remote API messages.
+
+    * **requests**: The read-only messages received.
+    * **upstream**: The messages actually sent to the Remote API.
+    * **coalesced**: The upstream calls saved by joining an identical message in flight.
+    * **in_flight**: The upstream calls currently in flight.
+    '''
+
+    return cli.single_flight.get_stats()
+
+
+@app.get("/debug/cache", tags=["Debug"])
+async def get_cache_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the counters of the **config_get response cache** (size, hits, misses and invalidations).'''
+
+    return cli.response_cache.get_stats()
+
+
+@app.get("/debug/streams", tags=["Debug"])
+async def get_stream_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the active **stats streams** (source, interval, subscribers, samples taken and frames dropped).'''
+
+    return broadcaster.get_stats()
+
+
+@app.get("/debug/store", tags=["Debug"])
+async def get_store_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the counters of the **stats store** (snapshots written, dropped and queued, segments created and open).'''
+
+    return cli.stats_store.get_stats()
+
+
+@app.get("/debug/ue_index", tags=["Debug"])
+async def get_ue_index_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the state of the **indexed UE snapshot** (UEs indexed, age, refresh interval, refreshes, lookups and errors).'''
+
+    return ue_index.get_stats()
+
+
+@app.get("/debug/auth_cache", tags=["Debug"])
+async def get_auth_cache_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the counters of the **validated token cache**: size, hits, misses, hit rate, mean time to resolve a token on a hit and on a miss, and time saved.'''
+
+    return token_cache.get_stats()
+
+
+@app.get("/debug/login_throttle", tags=["Debug"])
+async def get_login_throttle_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the counters of the **login throttling** (usernames/addresses with recent failures, locked out, logins rejected).'''
+
+    return login_throttle.get_stats()
+
+
+@app.get("/debug/logs", tags=["Debug"])
+async def get_log_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the **log levels** (default and per entity) and the counters of the logger (records queued, written, dropped, filtered, sampled out and truncated).'''
+
+    return logger.get_stats()
+
+
+@app.put("/debug/logs/level", tags=["Debug"])
+async def set_log_level(log_level: LogLevel, current_user: Annotated[User, Depends(get_current_admin_user)]):
+    '''Change the minimum **log level** at runtime, of an entity (e.g. CLI, Remote API, Collector) or the default one. Admin only.
+
+    The change is not saved, set `LOG_LEVEL` / `LOG_LEVELS` in the config file to keep it after a restart.
+    '''
+
+    if log_level.entity is None and log_level.level is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The default level cannot be removed")
+
+    logger.set_level(level=log_level.level, entity=log_level.entity)
+    return {"status": True, "message": "Log level changed", "response": logger.get_levels()}
+
+
+@app.get("/debug/timings", tags=["Debug"])
+async def get_timings(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the **latency histograms** of each endpoint and each stage, and the hot-path counters.
+
+    * **endpoints**: Total time of the requests of each endpoint (count, mean, p50, p90, p99, max and buckets).
+    * **stages**: Time spent in *auth*, *spawn* / *subprocess* (ws.js and CLI commands), *upstream* (Remote API reply),
+      *upstream_decode*, *parse* (Parser.parse_response), *extract* (channel log extraction) and *encode* (JSON response).
+    * **counters**: *subprocess_spawns*, *subprocess_bytes*, *upstream_messages* and *upstream_bytes*.
+
+    The same stages of each request are returned in its `Server-Timing` header. Nothing is recorded unless `TIMING_ENABLED` is `true`
+    or the instrumentation is enabled with `PUT /debug/timings`.
+    '''
+
+    return timings.get_stats()
+
+
+@app.put("/debug/timings", tags=["Debug"])
+async def set_timings(current_user: Annotated[User, Depends(get_current_admin_user)],
+                      enabled: bool = Query(default=True, description="Enable or disable the timing instrumentation"),
+                      reset: bool = Query(default=False, description="Clear the histograms and the counters")):
+    '''Enable or disable the **timing instrumentation** at runtime, and optionally clear the histograms and counters. Admin only.'''
+
+    timings.enabled = enabled
+    if reset:
+        timings.reset()
+    return {"status": True, "message": f"Timing instrumentation {'enabled' if enabled else 'disabled'}", "response": timings.get_stats()}
+
+
+@app.get("/debug/codec", tags=["Debug"])
+async def get_codec_stats(current_user: Annotated[User, Depends(get_current_active_user)]):
+    '''Get the **JSON codec** in use (orjson or json), whether orjson is installed and the documents handed over to json because orjson rejected them (e.g. NaN).'''
+
+    return codec.get_stats()
@@ -0,0 +1,108 @@
+"""
+This module contains the ASGI middlewares and the response classes of the REST Server.
+"""
+
+import asyncio
+from contextlib import suppress
+from fastapi.responses import JSONResponse
+from utils.utils import log_message
+from utils.timing import timings
+from utils.codec import codec
+
+
+class CancelOnDisconnectMiddleware:
+    '''
+    This middleware cancels the endpoint when the HTTP client disconnects before the response is sent. The cancellation
+    propagates to the awaited work, so pending Remote API requests are dropped and child processes are killed.
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages = asyncio.Queue()
+        response_complete = False
+
+        async def watch_receive():
+            # Forward every message to the app and stop once the client is gone
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def tracked_send(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        app_task = asyncio.create_task(self.app(scope, messages.get, tracked_send))
+        watcher = asyncio.create_task(watch_receive())
+
+        try:
+            await asyncio.wait({app_task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+
+            # Once the response is out the app may still be running background tasks, those must not be cancelled
+            if not app_task.done() and not response_complete:
+                log_message(entity="REST Server", message=f"Client disconnected, cancelling {scope['method']} {scope['path']}", type="WARNING")
+                app_task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await app_task
+                return
+
+            await app_task
+        finally:
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
+            if not app_task.done():
+                app_task.cancel()
+
+
+class TimingMiddleware:
+    '''
+    This middleware records the total time of each request in the histogram of its endpoint and returns the time of
+    each stage in the Server-Timing header. It does nothing while the instrumentation is disabled.
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not timings.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request = timings.begin_request()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", request.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            # The router stores the matched route in the scope, unmatched paths are grouped together
+            route = scope.get("route")
+            timings.end_request(request, f"{scope['method']} {route.path if route is not None else '<unmatched>'}")
+
+
+class FastJSONResponse(JSONResponse):
+    '''
+    JSON response encoded with the codec of the API (orjson when installed). The encoding is timed as the "encode" stage.
+
+    Endpoints passing a Remote API reply through unchanged return it wrapped in this class, so FastAPI does not walk it
+    with jsonable_encoder before it is encoded.
+    '''
+
+    def render(self, content) -> bytes:
+        with timings.stage("encode"):
+            return codec.dumps(content)
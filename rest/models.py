@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Annotated, Optional
+from typing import Dict, Annotated, Optional, Literal
 
 class ConfigDLPRB(BaseModel):
     rb_l_crb: int = Field(default=20, ge=1, le=106, alias="pdsch_fixed_l_crb") 
@@ -83,6 +83,12 @@ class ConfigLogParser(BaseModel):
     ue_id: int | None = Field(default=None)
     rnti: int | None = Field(default=None)
     discard_si: bool | None = Field(default=False)
+    tail: bool = Field(default=False, description="Return a cursor to fetch only newer entries in the next call")
+    cursor: str | None = Field(default=None, description="Cursor returned by a previous call. Only entries after it are returned")
+    wait: float | None = Field(default=None, ge=0, le=60, description="Long-poll: seconds to wait for new entries before returning an empty result")
+    format: Literal["default", "records", "columnar", "arrow", "parquet"] = Field(default="default", description="Response format: entries keyed by timestamp, list of entries, one array per field, Arrow IPC or Parquet")
+    filter_rnti: list[int] | None = Field(default=None, description="Keep only the entries of these RNTIs (applied on the API side)")
+    filter_cell: list[int] | None = Field(default=None, description="Keep only the entries of these cells (applied on the API side)")
 
     model_config = {
         "json_schema_extra":{
@@ -128,6 +134,32 @@ examples_log_parser = {
                         "short":True,
                         "discard_si":True
                     }},
+                "Tail": {
+                    "summary": "Incremental tail",
+                    "description": "Fetch only the entries after the cursor of the previous call, waiting up to 5 seconds for new ones",
+                    "value": {
+                        "channels": ["PDSCH"],
+                        "layers":"PHY",
+                        "max":100,
+                        "min":1, 
+                        "short":True,
+                        "discard_si":True,
+                        "tail":True,
+                        "cursor":"eyJ0IjoxNzEwMDAwMDAwMDAwLCJuIjoxfQ==",
+                        "wait":5
+                    }},
+                "Columnar": {
+                    "summary": "Columnar format",
+                    "description": "Fetch PDSCH and PUSCH entries as one array per field",
+                    "value": {
+                        "channels": ["PDSCH", "PUSCH"],
+                        "layers":"PHY",
+                        "max":4096,
+                        "min":1, 
+                        "short":True,
+                        "discard_si":True,
+                        "format":"columnar"
+                    }},
                 "Multiple channels": {
                     "summary": "Multiple channels info",
                     "description": "Fetch multiple channels information",
@@ -252,6 +284,58 @@ class ConfigCellDLMCS(BaseModel):
     }
 
 
+class ConfigBatch(BaseModel):
+    gain: list[ConfigGain] = Field(default_factory=list, description="Cell gain changes, one cell_gain message each")
+    noise: list[ConfigNoise] = Field(default_factory=list, description="Noise level changes, one noise_level message each")
+    mcs: ConfigCellMCS | None = Field(default=None, description="MCS changes, merged into the config_set message")
+    prb_alloc: ConfigCellAlloc | None = Field(default=None, description="PRB allocation changes, merged into the config_set message")
+    inactivity_timer: ConfigCellTimer | None = Field(default=None, description="Inactivity timer changes, merged into the config_set message")
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "gain": [{"gain": -10, "cell_id": 1}, {"gain": -20, "cell_id": 2}],
+                    "noise": [{"noise_level": -30.0, "channel": 0}],
+                    "mcs": {"cells": {"1": {"pdsch_mcs": 28}, "2": {"pusch_mcs": 20}}},
+                    "prb_alloc": {"cells": {"1": {"pdsch_fixed_l_crb": 20, "pdsch_fixed_rb_alloc": True, "pdsch_fixed_rb_start": 0}}},
+                    "inactivity_timer": {"cells": {"1": {"inactivity_timer": 2560}}}
+                }
+            ]
+        }
+    }
+
+
+class StatsAggregate(BaseModel):
+    source: Literal["enb", "ue", "mme"] = Field(default="enb", description="The stored stats to be aggregated")
+    start: float | None = Field(default=None, description="Start of the range (seconds since epoch). By default, the range is open")
+    end: float | None = Field(default=None, description="End of the range (seconds since epoch). By default, the range is open")
+    bucket: float = Field(default=60.0, gt=0, description="Bucket size in seconds")
+    metrics: list[str] = Field(min_length=1, max_length=64, description="Dotted paths of the metrics, '*' matches every cell/UE (e.g. cells.*.dl_bitrate)")
+    functions: list[Annotated[str, Field(pattern=r'^(mean|min|max|sum|count|std|median|p(\d{1,2}(\.\d+)?|100))$')]] = Field(default=["mean", "min", "max", "p95"], min_length=1, description="Aggregate functions: mean, min, max, sum, count, std, median or pNN (e.g. p95)")
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "source": "enb",
+                    "start": 1710000000,
+                    "end": 1710003600,
+                    "bucket": 60,
+                    "metrics": ["cells.*.dl_bitrate", "cells.*.ul_bitrate", "cpu.global"],
+                    "functions": ["mean", "min", "max", "p95"]
+                },
+                {
+                    "source": "ue",
+                    "bucket": 10,
+                    "metrics": ["ue_list.*.cells.*.cqi", "ue_list.*.cells.*.dl_mcs"],
+                    "functions": ["mean", "p50", "p99", "count"]
+                }
+            ]
+        }
+    }
+
+
 class UeStats(BaseModel):
     ue_id: int = Field(default=0, ge=0)
     stats: bool | None = Field(default=False)
@@ -287,4 +371,23 @@ class UeCore(BaseModel):
                 }
             ]
         }
-    }
\ No newline at end of file
+    }
+
+# *********************************************** LOGGING MODELS ***********************************************
+class LogLevel(BaseModel):
+    level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] | None = Field(default="INFO", description="Minimum level of the logged messages. null removes the level of the entity")
+    entity: str | None = Field(default=None, description="Entity whose level is changed (e.g. CLI, Remote API). If null, the default level is changed")
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "level": "DEBUG",
+                    "entity": "CLI"
+                },
+                {
+                    "level": "WARNING"
+                }
+            ]
+        }
+    }
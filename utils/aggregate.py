@@ -0,0 +1,172 @@
+"""
+This module contains the windowed aggregation of the stored stats.
+
+The values of the requested metrics are extracted from the snapshots while they are read, then reduced per time bucket
+with NumPy: the values are sorted once by bucket and value, then each function is computed for every bucket at once.
+"""
+
+import numpy as np
+
+# Fields that identify the items of a list (UEs of ue_list, LTE or NR, cells of a UE). A wildcard over a list names each item by
+# the first of these fields it has, or by its position
+LIST_ITEM_KEYS = ("enb_ue_id", "ran_ue_id", "ue_id", "cell_id")
+
+
+def get_item_key(item, index: int) -> str:
+    '''Return the name of a list item: its first LIST_ITEM_KEYS field or its position'''
+
+    if isinstance(item, dict):
+        for key in LIST_ITEM_KEYS:
+            if key in item:
+                return str(item[key])
+    return str(index)
+
+
+def extract_metric(value, path: list, name: tuple = ()):
+    '''
+    Yield the numeric values found at a dotted metric path. A "*" segment matches every key of a dictionary or every
+    item of a list, a list item can also be selected by its LIST_ITEM_KEYS field or its position
+
+    Parameters:
+    - value: any. The (part of the) response being walked
+    - path: list. The remaining segments of the path (e.g. ["cells", "*", "dl_bitrate"])
+    - name: tuple, default=(). The resolved segments so far
+
+    Yields:
+    - The resolved name (e.g. cells.1.dl_bitrate) and the value of each match: tuple[str, float]
+    '''
+
+    if not path:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield ".".join(name), float(value)
+        return
+
+    segment, rest = path[0], path[1:]
+    if isinstance(value, dict):
+        if segment == "*":
+            for key, child in value.items():
+                yield from extract_metric(child, rest, name + (str(key),))
+        elif segment in value:
+            yield from extract_metric(value[segment], rest, name + (segment,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            key = get_item_key(item, index)
+            if segment == "*" or segment == key:
+                yield from extract_metric(item, rest, name + (key,))
+
+
+def collect_series(snapshots, metrics: list) -> dict:
+    '''
+    Extract the values of the metrics from the snapshots
+
+    Parameters:
+    - snapshots: iterable. The snapshots (with timestamp and response), in time order
+    - metrics: list. The dotted metric paths, wildcards allowed (e.g. cells.*.dl_bitrate)
+
+    Returns:
+    - The timestamps and values of each resolved metric: dict[str, tuple[list, list]]
+    '''
+
+    paths = [metric.split(".") for metric in metrics]
+    series = {}
+    for snapshot in snapshots:
+        response = snapshot.get("response")
+        timestamp = snapshot["timestamp"]
+        for path in paths:
+            for name, value in extract_metric(response, path):
+                timestamps, values = series.setdefault(name, ([], []))
+                timestamps.append(timestamp)
+                values.append(value)
+    return series
+
+
+def aggregate_series(timestamps, values, bucket: float, functions: list, origin: float) -> dict:
+    '''
+    Reduce a series per time bucket
+
+    Parameters:
+    - timestamps: list. The timestamps of the values (seconds since epoch)
+    - values: list. The values
+    - bucket: float. The bucket size in seconds
+    - functions: list. The aggregate functions: mean, min, max, sum, count, std, median or pNN (percentile, e.g. p95)
+    - origin: float. The start of the first bucket
+
+    Returns:
+    - The start of each non-empty bucket (timestamp) and one list per function: dict[str, list]
+    '''
+
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    timestamps, values = timestamps[finite], values[finite]
+    if values.size == 0:
+        return {"timestamp": [], **{function: [] for function in functions}}
+
+    # Sort by bucket, then by value within each bucket (needed by the percentiles)
+    buckets = np.floor((timestamps - origin) / bucket).astype(np.int64)
+    order = np.lexsort((values, buckets))
+    buckets, values = buckets[order], values[order]
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, values.size])
+
+    result = {"timestamp": (origin + buckets[starts] * bucket).tolist()}
+    sums = None
+    for function in functions:
+        if function == "count":
+            column = counts
+        elif function in ("sum", "mean", "std"):
+            if sums is None:
+                sums = np.add.reduceat(values, starts)
+            if function == "sum":
+                column = sums
+            elif function == "mean":
+                column = sums / counts
+            else:
+                means = np.repeat(sums / counts, counts)
+                column = np.sqrt(np.add.reduceat((values - means) ** 2, starts) / counts)
+        elif function == "min":
+            column = values[starts]
+        elif function == "max":
+            column = values[starts + counts - 1]
+        else:
+            # Linear interpolation between the closest ranks, as numpy.percentile
+            q = 50.0 if function == "median" else float(function[1:])
+            position = starts + (counts - 1) * (q / 100)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            column = values[lower] + (values[upper] - values[lower]) * (position - lower)
+        result[function] = column.tolist()
+    return result
+
+
+def aggregate(snapshots, metrics: list, bucket: float, functions: list, start: float = None) -> dict:
+    '''
+    Aggregate the metrics of the snapshots per time bucket
+
+    Parameters:
+    - snapshots: iterable. The snapshots (with timestamp and response), in time order
+    - metrics: list. The dotted metric paths, wildcards allowed (e.g. cells.*.dl_bitrate)
+    - bucket: float. The bucket size in seconds
+    - functions: list. The aggregate functions: mean, min, max, sum, count, std, median or pNN (percentile, e.g. p95)
+    - start: float, default=None. The start of the first bucket. If None, the first timestamp rounded down to the bucket
+
+    Returns:
+    - The origin of the buckets, the number of snapshots read and the aggregated series of each resolved metric: dict
+    '''
+
+    read = 0
+
+    def counted(snapshots):
+        nonlocal read
+        for snapshot in snapshots:
+            read += 1
+            yield snapshot
+
+    series = collect_series(counted(snapshots), metrics)
+
+    if start is None:
+        first = min((timestamps[0] for timestamps, _ in series.values()), default=0.0)
+        start = np.floor(first / bucket) * bucket
+
+    return {"origin": float(start), "bucket": bucket, "snapshots": read,
+            "series": {name: aggregate_series(timestamps, values, bucket, functions, start) for name, (timestamps, values) in series.items()}}
@@ -0,0 +1,106 @@
+"""
+This module contains the in-memory response cache of the Amari API.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    '''
+    This class is a size-bounded cache whose entries expire after a time-to-live. When it is full, the least recently
+    used entry is evicted.
+
+    Every invalidation bumps the generation of the cache. A value fetched before an invalidation can be discarded by
+    passing the generation read before the fetch to set().
+    '''
+
+    def __init__(self, ttl: float, maxsize: int):
+        '''
+        Parameters:
+        - ttl: float. The time (seconds) an entry is valid. If 0, nothing is cached
+        - maxsize: int. The maximum number of entries
+        '''
+
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+
+    def get(self, key):
+        '''
+        Return the value of a key if it is cached and not expired
+
+        Parameters:
+        - key: hashable. The key of the entry
+
+        Returns:
+        - The cached value or None
+        '''
+
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+
+    def set(self, key, value, generation: int = None):
+        '''
+        Cache a value
+
+        Parameters:
+        - key: hashable. The key of the entry
+        - value: any. The value to be cached
+        - generation: int, default=None. The generation read before the value was fetched. If the cache has been
+          invalidated since, the value is stale and it is not cached
+
+        Returns:
+        - None
+        '''
+
+        if self.ttl <= 0 or (generation is not None and generation != self.generation):
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+    def invalidate(self, predicate=None):
+        '''
+        Remove the entries whose key matches the predicate, or every entry if no predicate is given
+
+        Parameters:
+        - predicate: callable, default=None. A function that receives a key and returns True if it must be removed
+
+        Returns:
+        - None
+        '''
+
+        self.generation += 1
+        if predicate is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the counters of the cache
+
+        Returns:
+        - A dictionary with the size, hits, misses and generation of the cache
+        '''
+
+        return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits, "misses": self.misses, "generation": self.generation}
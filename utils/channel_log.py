@@ -0,0 +1,147 @@
+"""
+This module contains the indexed store of the parsed channel log entries.
+"""
+
+from collections import defaultdict
+
+
+class ChannelLogStore:
+    '''
+    This class holds every parsed channel log entry, including those sharing a timestamp, in arrival order.
+
+    The entries are kept in parallel lists (one per envelope field plus the parsed fields) with secondary indexes by
+    RNTI, cell and channel and a primary index by (timestamp, cell, rnti, channel). Filters are answered from the
+    indexes without scanning the entries.
+    '''
+
+    def __init__(self):
+        self.timestamps = []
+        self.cells = []
+        self.rntis = []
+        self.channels = []
+        self.fields = []
+        self.by_key = defaultdict(list)
+        self.by_rnti = defaultdict(list)
+        self.by_cell = defaultdict(list)
+        self.by_channel = defaultdict(list)
+
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+    def add(self, timestamp, cell, rnti, channel, fields: dict):
+        '''
+        Append an entry and index it
+
+        Parameters:
+        - timestamp: int | float. The timestamp of the entry
+        - cell: int. The cell of the entry
+        - rnti: int. The RNTI of the entry
+        - channel: str. The channel of the entry (e.g. PDSCH)
+        - fields: dict. The parsed data of the entry
+
+        Returns:
+        - The position of the entry: int
+        '''
+
+        index = len(self.timestamps)
+        self.timestamps.append(timestamp)
+        self.cells.append(cell)
+        self.rntis.append(rnti)
+        self.channels.append(channel)
+        self.fields.append(fields)
+
+        self.by_key[(timestamp, cell, rnti, channel)].append(index)
+        self.by_rnti[rnti].append(index)
+        self.by_cell[cell].append(index)
+        self.by_channel[channel].append(index)
+        return index
+
+
+    def get(self, timestamp, cell, rnti, channel) -> list:
+        '''
+        Return the entries with the given (timestamp, cell, rnti, channel)
+
+        Returns:
+        - The matching records: list
+        '''
+
+        return self.to_records(self.by_key.get((timestamp, cell, rnti, channel), []))
+
+
+    def select(self, rntis: list = None, cells: list = None, channels: list = None) -> list:
+        '''
+        Return the positions of the entries matching every given filter. A filter set to None is not applied
+
+        Parameters:
+        - rntis: list, default=None. The RNTIs to keep
+        - cells: list, default=None. The cells to keep
+        - channels: list, default=None. The channels to keep
+
+        Returns:
+        - The positions of the matching entries in arrival order: list
+        '''
+
+        selected = None
+        for index, values in ((self.by_rnti, rntis), (self.by_cell, cells), (self.by_channel, channels)):
+            if values is None:
+                continue
+            positions = set()
+            for value in values:
+                positions.update(index.get(value, ()))
+            selected = positions if selected is None else selected & positions
+            if not selected:
+                return []
+
+        if selected is None:
+            return list(range(len(self)))
+        return sorted(selected)
+
+
+    def to_records(self, positions: list = None) -> list:
+        '''
+        Return the entries as flat records: the envelope fields followed by the parsed fields
+
+        Parameters:
+        - positions: list, default=None. The positions of the entries. If None, every entry is returned
+
+        Returns:
+        - The records: list[dict]
+        '''
+
+        if positions is None:
+            positions = range(len(self))
+
+        records = []
+        for i in positions:
+            envelope = {"timestamp": self.timestamps[i], "cell": self.cells[i], "rnti": self.rntis[i], "channel": self.channels[i]}
+            record = dict(envelope)
+            record.update(self.fields[i])
+            # The envelope wins over a parsed field with the same name, without moving it
+            record.update(envelope)
+            records.append(record)
+        return records
+
+
+    def to_timestamp_dict(self, positions: list = None) -> dict:
+        '''
+        Return the entries keyed by timestamp, as Parser.extract_channel_log_messages does. Entries sharing a timestamp
+        overwrite each other (the last one is kept)
+
+        Parameters:
+        - positions: list, default=None. The positions of the entries. If None, every entry is returned
+
+        Returns:
+        - The entries keyed by timestamp: dict
+        '''
+
+        if positions is None:
+            positions = range(len(self))
+
+        messages = {}
+        for i in positions:
+            message = dict(self.fields[i])
+            message["channel"] = self.channels[i]
+            messages[self.timestamps[i]] = message
+        return messages
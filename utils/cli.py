@@ -1,30 +1,267 @@
 """
 This module contains the CLI utilities for the Amari API.
 """
+import asyncio
 import subprocess
 import json
+import time
 from utils.parser import Parser
+from utils.remote_api import RemoteApiClient, RemoteApiError
+from utils.singleflight import SingleFlight
+from utils.cache import TTLCache
+from utils.stats_store import StatsStore, get_stored_source
 from config.configurator import ConfigManager
-from utils.utils import log_message, get_abs_path
+from config.defaultParams import (AMARI_TRANSPORT, CLI_MAX_CONCURRENCY, CLI_TIMEOUT, CONFIG_CACHE_TTL, CONFIG_CACHE_SIZE, API_DATA_PATH,
+                                  STATS_STORE_ENABLED, STATS_SEGMENT_SIZE, STATS_SEGMENT_SECONDS, STATS_QUEUE_SIZE, PARSER_MAX_BYTES)
+from utils.utils import log_message, logger, get_abs_path
+from utils.timing import timings
+
+# Remote API messages that do not modify the state of the callbox. Identical ones in flight are coalesced
+READ_ONLY_MESSAGES = {"config_get", "stats", "ue_get", "ng_ran", "help", "log_get"}
+
+# Remote API messages whose responses are cached. Any other message sent to an entity invalidates its cached responses
+CACHEABLE_MESSAGES = {"config_get"}
+
+# Size of the chunks read from the output of a child process with an output limit
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class OutputLimitExceeded(subprocess.SubprocessError):
+    '''
+    Raised when a child process writes more than its output limit. The process is killed at once
+    '''
+
+    def __init__(self, cmd: list, limit: int):
+        self.cmd = cmd
+        self.limit = limit
+
+    def __str__(self):
+        return f"Command '{self.cmd[0]}' wrote more than {self.limit} bytes (PARSER_MAX_BYTES), it was killed"
+
 
 class Cli:
 
+    # Coalesces identical read-only messages in flight
+    single_flight = SingleFlight()
+
+    # Caches the responses of CACHEABLE_MESSAGES per entity
+    response_cache = TTLCache(ttl=ConfigManager.get_parameters('CONFIG_CACHE_TTL', CONFIG_CACHE_TTL),
+                              maxsize=ConfigManager.get_parameters('CONFIG_CACHE_SIZE', CONFIG_CACHE_SIZE))
+
+    # Appends the sampled enb/ue/mme stats to disk (STORED_MESSAGES)
+    stats_store = StatsStore(path=ConfigManager.get_parameters('API_DATA_PATH', API_DATA_PATH),
+                             segment_size=ConfigManager.get_parameters('STATS_SEGMENT_SIZE', STATS_SEGMENT_SIZE),
+                             segment_seconds=ConfigManager.get_parameters('STATS_SEGMENT_SECONDS', STATS_SEGMENT_SECONDS),
+                             queue_size=ConfigManager.get_parameters('STATS_QUEUE_SIZE', STATS_QUEUE_SIZE))
+
+    # Bounds the number of child processes running at the same time (created on first use)
+    _slots = None
+
+
+    @staticmethod
+    async def run_process(command: list, cwd: str, timeout: float = None, check: bool = True, max_bytes: int = None) -> subprocess.CompletedProcess:
+        """Runs a child process without blocking the event loop.
+
+        At most CLI_MAX_CONCURRENCY processes run at the same time, the rest wait for a free slot. The process is
+        killed if it exceeds the timeout, if it writes more than max_bytes to its stdout or if the awaiting task is
+        cancelled (e.g. the HTTP client disconnected).
+
+        Parameters:
+        - command: list. The command and its arguments
+        - cwd: str. The working directory of the process
+        - timeout: float, default=None. The time (seconds) the process may run. If None, CLI_TIMEOUT is used
+        - check: bool, default=True. If True, a non-zero return code raises subprocess.CalledProcessError
+        - max_bytes: int, default=None. The largest stdout (bytes) read. If None, there is no limit
+
+        Returns:
+        - The finished process with decoded stdout and stderr: subprocess.CompletedProcess
+
+        Raises:
+        - subprocess.TimeoutExpired: If the process exceeded the timeout.
+        - OutputLimitExceeded: If the stdout of the process exceeded max_bytes.
+        - subprocess.CalledProcessError: If check is True and the process returned a non-zero code.
+        """
+
+        if Cli._slots is None:
+            Cli._slots = asyncio.Semaphore(ConfigManager.get_parameters('CLI_MAX_CONCURRENCY', CLI_MAX_CONCURRENCY))
+        if timeout is None:
+            timeout = ConfigManager.get_parameters('CLI_TIMEOUT', CLI_TIMEOUT)
+
+        async with Cli._slots:
+            with timings.stage("spawn"):
+                process = await asyncio.create_subprocess_exec(*command, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            timings.count("subprocess_spawns")
+            try:
+                with timings.stage("subprocess"):
+                    output = process.communicate() if max_bytes is None else Cli._communicate(process, command, max_bytes)
+                    stdout, stderr = await asyncio.wait_for(output, timeout)
+            except asyncio.TimeoutError:
+                await Cli._kill(process)
+                raise subprocess.TimeoutExpired(command, timeout)
+            except OutputLimitExceeded:
+                await process.wait()
+                raise
+            except asyncio.CancelledError:
+                await Cli._kill(process)
+                raise
+        timings.count("subprocess_bytes", len(stdout))
+
+        result = subprocess.CompletedProcess(command, process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace"))
+        if check:
+            result.check_returncode()
+        return result
+
+
+    @staticmethod
+    async def _communicate(process: asyncio.subprocess.Process, command: list, max_bytes: int) -> tuple:
+        """Reads the stdout of a child process in chunks, and its stderr, until it exits.
+
+        Raises OutputLimitExceeded as soon as the stdout exceeds max_bytes, so a huge output is never held in memory."""
+
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            chunks = []
+            size = 0
+            while True:
+                chunk = await process.stdout.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    # The pipes must reach their end (discarding what is left) for the killed process to be reaped
+                    log_message(entity="CLI", message=f"Killing process {process.pid}, its output exceeds {max_bytes} bytes", type="WARNING")
+                    process.kill()
+                    while await process.stdout.read(READ_CHUNK_SIZE):
+                        pass
+                    await stderr_task
+                    raise OutputLimitExceeded(command, max_bytes)
+                chunks.append(chunk)
+            stderr = await stderr_task
+        finally:
+            if not stderr_task.done():
+                stderr_task.cancel()
+        await process.wait()
+        return b"".join(chunks), stderr
+
+
+    @staticmethod
+    async def _kill(process: asyncio.subprocess.Process):
+        """Kills a child process and reaps it so it does not become an orphan."""
+
+        if process.returncode is None:
+            log_message(entity="CLI", message=f"Killing process {process.pid}", type="WARNING")
+            process.kill()
+        await process.wait()
+
+
+    @staticmethod
+    async def execute_command(entity: str, message: dict, use_cache: bool = True):
+        """Sends a message to the Remote API of the entity.
+
+        Identical read-only messages (same entity and same canonical JSON body) that are in flight at the same time
+        share a single upstream call. Responses of CACHEABLE_MESSAGES are cached per entity until they expire or a
+        mutating message is sent to the same entity. If use_cache is False, the cached response is ignored and refreshed.
+        Successful responses of STORED_MESSAGES are appended to the stats store, once per upstream call.
+        """
+
+        if not isinstance(message, dict) or message.get("message") not in READ_ONLY_MESSAGES:
+            # Invalidate before and after, so a read racing with the change cannot cache the old state
+            Cli.response_cache.invalidate(lambda key: key[0] == entity)
+            try:
+                return await Cli.send_message(entity=entity, message=message)
+            finally:
+                Cli.response_cache.invalidate(lambda key: key[0] == entity)
+
+        key = (entity, json.dumps(message, sort_keys=True))
+        cacheable = message["message"] in CACHEABLE_MESSAGES
+        if cacheable and use_cache:
+            cached = Cli.response_cache.get(key)
+            if cached is not None:
+                return dict(cached)
+
+        generation = Cli.response_cache.generation
+        output = await Cli.single_flight.do(key, lambda: Cli.fetch_message(entity=entity, message=message))
+        if cacheable and output["status"] is True:
+            Cli.response_cache.set(key, output, generation=generation)
+        return dict(output)
+
+
+    @staticmethod
+    async def fetch_message(entity: str, message: dict):
+        """Sends a read-only message and appends its response to the stats store if it is one of STORED_MESSAGES."""
+
+        output = await Cli.send_message(entity=entity, message=message)
+        source = get_stored_source(entity, message)
+        if source is not None and output["status"] is True and ConfigManager.get_parameters('STATS_STORE_ENABLED', STATS_STORE_ENABLED):
+            Cli.stats_store.append(source=source, response=output["response"])
+        return output
+
+
+    @staticmethod
+    async def execute_batch(entity: str, messages: list) -> list:
+        """Sends several messages to the Remote API of the entity at the same time.
+
+        With the native client the messages are pipelined over the entity's connection and matched back by message_id.
+
+        Parameters:
+        - entity: str. The network element (e.g. enb)
+        - messages: list. The messages to be sent
+
+        Returns:
+        - A list with the output and the latency (seconds) of each message, in the same order as messages
+        """
+
+        async def timed(message):
+            start = time.perf_counter()
+            output = await Cli.execute_command(entity=entity, message=message)
+            return output, time.perf_counter() - start
+
+        return await asyncio.gather(*(timed(message) for message in messages))
+
+
     @staticmethod
-    async def execute_command(entity: str, message: dict):
+    async def send_message(entity: str, message: dict):
+        """Sends a message to the Remote API of the entity. Uses the native WebSocket client unless AMARI_TRANSPORT is "wsjs"."""
+
+        if ConfigManager.get_parameters('AMARI_TRANSPORT', AMARI_TRANSPORT) == "wsjs":
+            return await Cli.execute_ws_js(entity=entity, message=message)
+
+        # The full message (e.g. a large config_set) is only built when the CLI logs DEBUG records
+        if logger.is_enabled("DEBUG", "CLI"):
+            log_message(entity="CLI", message=f"Sending message to {entity}: {message}", type="DEBUG")
+        else:
+            log_message(entity="CLI", message=f"Sending {message.get('message') if isinstance(message, dict) else message} to {entity}", type="INFO")
+
+        try:
+            with timings.stage("upstream"):
+                response = await RemoteApiClient.request(entity=entity, message=message)
+            return {"status": Parser.check_response(response), "response": response}
+        except RemoteApiError as e:
+            return {"status": 500, "response" : None, "error": str(e)}
+
+
+    @staticmethod
+    async def execute_ws_js(entity: str, message: dict):
         """Runs the CLI command with a dynamic message."""
 
         # Convert dictionary to a valid JSON string
         message_str = json.dumps(message)  
         command = ["./ws.js", entity, message_str]
-        log_message(entity="CLI", message=f"Executing command: {' '.join(command)}", type="INFO")
+        if logger.is_enabled("DEBUG", "CLI"):
+            log_message(entity="CLI", message=f"Executing command: {' '.join(command)}", type="DEBUG")
+        else:
+            log_message(entity="CLI", message=f"Executing ws.js: {message.get('message') if isinstance(message, dict) else message} to {entity}", type="INFO")
         working_directory = ConfigManager.get_parameters('AMARI_PATH')
         
         try:
-            result = subprocess.run(command, cwd=working_directory, capture_output=True, text=True, check=True)
+            result = await Cli.run_process(command, cwd=working_directory, max_bytes=ConfigManager.get_parameters('PARSER_MAX_BYTES', PARSER_MAX_BYTES))
             response, status = Parser.parse_response(data=result.stdout)
             return {"status": status, "response": response}
         except subprocess.CalledProcessError as e:
             return {"status": 500, "response" : None, "error": e.stderr or str(e)}
+        except (subprocess.TimeoutExpired, OutputLimitExceeded) as e:
+            log_message(entity="CLI", message=str(e), type="ERROR")
+            return {"status": 500, "response" : None, "error": str(e)}
         
     
     @staticmethod
@@ -34,13 +271,17 @@ class Cli:
         working_directory = get_abs_path(cwd)
         
         try:
-            result = subprocess.run(command, cwd=working_directory, capture_output=True, text=True, check=True)
-            log_message(entity="CLI", message=result.stdout, type="INFO")
-            log_message(entity="CLI", message=result.stderr, type="ERROR")
+            result = await Cli.run_process(command, cwd=working_directory)
+            if result.stdout and logger.is_enabled("DEBUG", "CLI"):
+                log_message(entity="CLI", message=result.stdout, type="DEBUG")
+            if result.stderr:
+                log_message(entity="CLI", message=result.stderr, type="ERROR")
             log_message(entity="CLI", message=f"Return code: {result.returncode}", type="INFO")
             
             if not Parser.check_cli_error(result.returncode):
                 return {"status": 200, "response": result.stdout, "error": result.stderr or str(result.returncode)}
             return {"status": 500, "response": result.stdout, "error": result.stderr or str(result.returncode)}
         except subprocess.CalledProcessError as e:
-            return {"status": 500, "response" : None, "error": e.stderr or str(e)}
\ No newline at end of file
+            return {"status": 500, "response" : None, "error": e.stderr or str(e)}
+        except subprocess.TimeoutExpired as e:
+            return {"status": 500, "response" : None, "error": str(e)}
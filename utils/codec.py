@@ -0,0 +1,128 @@
+"""
+This module contains the JSON codec of the API.
+
+The Remote API replies, the HTTP responses, the streamed frames and the stats store lines are decoded and encoded with
+orjson when it is installed, else with the standard json module. The codec is selected by JSON_CODEC: "auto" (orjson
+if installed), "orjson" or "json".
+
+orjson is used with non-string keys (converted to strings, as json does) and NumPy support. Documents orjson cannot
+decode (e.g. NaN in a Remote API reply) or objects it cannot encode (e.g. integers above 64 bits) are handed over to
+json, so both codecs accept the same input.
+"""
+
+import json
+from utils.utils import log_message
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the standard json module is used instead
+    orjson = None
+
+CODECS = ("auto", "orjson", "json")
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class JsonCodec:
+    '''
+    This class decodes and encodes JSON with the selected codec
+    '''
+
+    def __init__(self, codec: str = "auto"):
+        '''
+        Parameters:
+        - codec: str, default="auto". The codec: "auto" (orjson if installed), "orjson" or "json"
+        '''
+
+        self.fallbacks = 0
+        self.set_codec(codec)
+
+
+    def set_codec(self, codec: str):
+        '''
+        Select the codec. If orjson is requested but not installed, json is used
+
+        Parameters:
+        - codec: str. The codec: "auto", "orjson" or "json"
+
+        Returns:
+        - None
+        '''
+
+        if codec not in CODECS:
+            raise ValueError(f"Unknown JSON codec {codec!r}, expected one of {', '.join(CODECS)}")
+        if codec == "orjson" and orjson is None:
+            log_message(entity="Codec", message="orjson is not installed, using the json module", type="WARNING")
+        self.name = "orjson" if codec != "json" and orjson is not None else "json"
+
+
+    def loads(self, data):
+        '''
+        Decode a JSON document
+
+        Parameters:
+        - data: str | bytes. The document
+
+        Returns:
+        - The decoded object
+
+        Raises:
+        - json.JSONDecodeError: if the document is not valid JSON
+        '''
+
+        if self.name == "orjson":
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # json also accepts NaN and Infinity, and raises the error of invalid documents
+                self.fallbacks += 1
+        return json.loads(data)
+
+
+    def dumps(self, content) -> bytes:
+        '''
+        Encode an object as compact UTF-8 JSON
+
+        Parameters:
+        - content: The object
+
+        Returns:
+        - The document: bytes
+        '''
+
+        if self.name == "orjson":
+            try:
+                return orjson.dumps(content, option=ORJSON_OPTIONS)
+            except orjson.JSONEncodeError:
+                self.fallbacks += 1
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+    def dumps_str(self, content) -> str:
+        '''
+        Encode an object as compact JSON text (e.g. for text WebSocket and SSE frames)
+
+        Parameters:
+        - content: The object
+
+        Returns:
+        - The document: str
+        '''
+
+        return self.dumps(content).decode("utf-8")
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the codec in use and the number of documents handed over to json
+
+        Returns:
+        - A dictionary with the codec, whether orjson is installed and the fallbacks to json
+        '''
+
+        return {"codec": self.name, "orjson_installed": orjson is not None, "fallbacks": self.fallbacks}
+
+
+# Shared by the whole API, selected from the config (JSON_CODEC)
+codec = JsonCodec()
@@ -0,0 +1,153 @@
+"""
+This module contains the background stats collector of the Amari API.
+
+The collector samples the enb stats, enb ue_get and mme stats at a fixed interval and keeps the last N samples of each
+source in a ring buffer, so the stats endpoints can answer from memory instead of waiting for the callbox.
+"""
+
+import asyncio
+import time
+from collections import deque
+from utils.cli import Cli
+from utils.streaming import STREAM_SOURCES
+from utils.utils import log_message
+
+
+class StatsCollector:
+    '''
+    This class runs one sampling loop per source and keeps the last samples of each one
+    '''
+
+    def __init__(self, interval: float = 1.0, n_samples: int = 20, sources: tuple = ("enb", "ue", "mme")):
+        '''
+        Parameters:
+        - interval: float, default=1.0. The sampling interval in seconds
+        - n_samples: int, default=20. The number of samples kept per source
+        - sources: tuple, default=("enb", "ue", "mme"). The sources to be sampled (keys of STREAM_SOURCES)
+        '''
+
+        self.interval = interval
+        self.n_samples = n_samples
+        self.sources = sources
+        self.samples = {source: deque(maxlen=n_samples) for source in sources}
+        self.errors = {source: 0 for source in sources}
+        self._tasks = {}
+
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+
+    def start(self):
+        '''
+        Start the sampling loops, if they are not running
+
+        Returns:
+        - None
+        '''
+
+        if self._tasks:
+            return
+        for source in self.sources:
+            self._tasks[source] = asyncio.create_task(self._sample_loop(source))
+        log_message(entity="Collector", message=f"Sampling {', '.join(self.sources)} every {self.interval}s ({self.n_samples} samples kept)", type="INFO")
+
+
+    async def stop(self):
+        '''
+        Stop the sampling loops. The samples are kept
+
+        Returns:
+        - None
+        '''
+
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+    async def _sample_loop(self, source: str):
+        '''Sample the source at the interval and append the samples to its ring buffer'''
+
+        entity, message = STREAM_SOURCES[source]
+        while True:
+            start = time.monotonic()
+            try:
+                output = await Cli.execute_command(entity=entity, message=message)
+            except Exception as e:
+                log_message(entity="Collector", message=f"Error sampling {source}: {e}", type="ERROR")
+                output = {"status": 500, "response": None, "error": str(e)}
+
+            if output["status"] is not True:
+                self.errors[source] += 1
+
+            sample = {"source": source, "timestamp": time.time(), "status": output["status"], "response": output["response"]}
+            if "error" in output:
+                sample["error"] = output["error"]
+            self.samples[source].append(sample)
+
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+
+
+    def latest(self, source: str, max_age: float = None):
+        '''
+        Return the last successful sample of a source
+
+        Parameters:
+        - source: str. The source of the sample
+        - max_age: float, default=None. The maximum age (seconds) of the sample. If None, any age is accepted
+
+        Returns:
+        - The sample, or None if there is no (recent enough) successful sample: dict
+        '''
+
+        samples = self.samples.get(source)
+        if not samples:
+            return None
+
+        for sample in reversed(samples):
+            if sample["status"] is True:
+                if max_age is not None and time.time() - sample["timestamp"] > max_age:
+                    return None
+                return sample
+        return None
+
+
+    def window(self, source: str, seconds: float = None, count: int = None) -> list:
+        '''
+        Return the samples of a source, oldest first
+
+        Parameters:
+        - source: str. The source of the samples
+        - seconds: float, default=None. Only the samples of the last seconds are returned. If None, no time limit
+        - count: int, default=None. Only the last count samples are returned. If None, no count limit
+
+        Returns:
+        - The samples: list[dict]
+        '''
+
+        samples = list(self.samples.get(source, ()))
+        if seconds is not None:
+            since = time.time() - seconds
+            samples = [sample for sample in samples if sample["timestamp"] >= since]
+        if count is not None:
+            samples = samples[-count:] if count > 0 else []
+        return samples
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the state of the collector
+
+        Returns:
+        - A dictionary with the interval, the buffer size and, per source, the samples kept, the errors and the age of the last sample
+        '''
+
+        now = time.time()
+        return {"running": self.running, "interval": self.interval, "n_samples": self.n_samples,
+                "sources": {source: {"samples": len(samples), "errors": self.errors[source],
+                                     "age": now - samples[-1]["timestamp"] if samples else None}
+                            for source, samples in self.samples.items()}}
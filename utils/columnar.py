@@ -0,0 +1,138 @@
+"""
+This module contains the columnar (dict-of-arrays) encoding of the parsed channel logs.
+
+The arrays are built with NumPy. Arrow IPC and Parquet encodings are available when pyarrow is installed.
+"""
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency, only needed for the arrow and parquet formats
+    pa = None
+    pq = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+
+def to_column_array(values: list) -> np.ndarray:
+    '''
+    Build the array of a column. Integers give an int64 array, numbers with gaps or floats a float64 array (gaps are NaN)
+    and anything else an object array (gaps are None)
+
+    Parameters:
+    - values: list. The values of the column, None where the entry does not have the field
+
+    Returns:
+    - The column: np.ndarray
+    '''
+
+    types = {type(value) for value in values}
+    if types <= {int}:
+        return np.array(values, dtype=np.int64)
+    if types <= {int, float, type(None)}:
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return np.array(values, dtype=object)
+
+
+def to_columns(records: list) -> dict:
+    '''
+    Transpose a list of records into one array per field. The fields are ordered by first appearance
+
+    Parameters:
+    - records: list. The records (dicts) to be transposed
+
+    Returns:
+    - A dictionary with the array of each field: dict[str, np.ndarray]
+    '''
+
+    fields = {}
+    for record in records:
+        for field in record:
+            fields.setdefault(field, None)
+
+    return {field: to_column_array([record.get(field) for record in records]) for field in fields}
+
+
+def columns_to_json(columns: dict) -> dict:
+    '''
+    Convert the columns into JSON-serializable lists. NaN gaps of float columns become None
+
+    Parameters:
+    - columns: dict. The columns built by to_columns
+
+    Returns:
+    - A dictionary with the list of each field: dict[str, list]
+    '''
+
+    result = {}
+    for field, array in columns.items():
+        if array.dtype == np.float64:
+            missing = np.isnan(array)
+            if missing.any():
+                array = array.astype(object)
+                array[missing] = None
+        result[field] = array.tolist()
+    return result
+
+
+def columns_to_arrow(columns: dict):
+    '''
+    Build an Arrow table from the columns. Object columns mixing types (e.g. harq "si" and numbers) are stored as strings
+
+    Parameters:
+    - columns: dict. The columns built by to_columns
+
+    Returns:
+    - The table: pyarrow.Table
+
+    Raises:
+    - RuntimeError: If pyarrow is not installed.
+    '''
+
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+
+    arrays = {}
+    for field, array in columns.items():
+        if array.dtype == object and len({type(value) for value in array if value is not None}) > 1:
+            array = np.array([None if value is None else str(value) for value in array], dtype=object)
+        arrays[field] = pa.array(array, from_pandas=True)
+    return pa.table(arrays)
+
+
+def columns_to_ipc(columns: dict) -> bytes:
+    '''
+    Encode the columns as an Arrow IPC stream
+
+    Parameters:
+    - columns: dict. The columns built by to_columns
+
+    Returns:
+    - The encoded stream: bytes
+    '''
+
+    table = columns_to_arrow(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def columns_to_parquet(columns: dict) -> bytes:
+    '''
+    Encode the columns as a Parquet file
+
+    Parameters:
+    - columns: dict. The columns built by to_columns
+
+    Returns:
+    - The encoded file: bytes
+    '''
+
+    table = columns_to_arrow(columns)
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,259 @@
+"""
+This module contains the logging backend of the API.
+
+log_message only queues a record, it never waits for the terminal or the disk. A background thread prints the records
+to the console (colored as before) and appends them as JSON lines to a size rotated file: {API_DATA_PATH}/logs/api.jsonl.
+Records below the level of their entity are discarded before being queued, long messages are truncated and the
+records below WARNING of noisy entities can be sampled (one of every N kept).
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import atexit
+from datetime import datetime
+from termcolor import colored
+
+# Numeric level of each log_message type. SUCCESS and HIGHLIGHT are INFO records with another color
+LEVELS = {"DEBUG": 10, "INFO": 20, "SUCCESS": 20, "HIGHLIGHT": 20, "WARNING": 30, "ERROR": 40}
+
+COLORS = {"DEBUG": "blue", "INFO": "cyan", "SUCCESS": "green", "HIGHLIGHT": "magenta", "WARNING": "yellow", "ERROR": "red"}
+
+LOG_FILE = "api.jsonl"
+
+
+class LogWriter:
+    '''
+    This class filters, samples and truncates the log records and writes them from a background thread
+    '''
+
+    def __init__(self, path: str, level: str = "INFO", levels: dict = None, max_length: int = 1000, sampling: dict = None,
+                 queue_size: int = 4096, file_size: int = 10 * 1024 * 1024, file_count: int = 5):
+        '''
+        Parameters:
+        - path: str. The directory of the log file. If None, the records are only printed
+        - level: str, default="INFO". The minimum level of the records kept (DEBUG, INFO, WARNING or ERROR)
+        - levels: dict, default=None. The minimum level of specific entities (e.g. {"CLI": "WARNING"})
+        - max_length: int, default=1000. The number of characters after which a message is truncated
+        - sampling: dict, default=None. Keep one of every N records below WARNING of an entity (e.g. {"CLI": 10})
+        - queue_size: int, default=4096. The maximum number of records waiting to be written before new ones are dropped
+        - file_size: int, default=10 MiB. The size (bytes) after which the log file is rotated
+        - file_count: int, default=5. The number of rotated log files kept (api.jsonl.1 ... api.jsonl.N)
+        '''
+
+        self.path = path
+        self.level = LEVELS[level]
+        self.levels = {entity: LEVELS[entity_level] for entity, entity_level in (levels or {}).items()}
+        self.max_length = max_length
+        self.sampling = dict(sampling or {})
+        self.file_size = file_size
+        self.file_count = file_count
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.filtered = 0
+        self.sampled = 0
+        self.truncated = 0
+        self._seen = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file = None
+
+
+    def is_enabled(self, type: str, entity: str) -> bool:
+        '''
+        Check if the records of a type and entity are kept. Use it to skip building expensive messages
+
+        Parameters:
+        - type: str. The type of the record (DEBUG, INFO, SUCCESS, HIGHLIGHT, WARNING or ERROR)
+        - entity: str. The entity that logs the record
+
+        Returns:
+        - True if the records are kept, False otherwise
+        '''
+
+        return LEVELS.get(type, 20) >= self.levels.get(entity, self.level)
+
+
+    def set_level(self, level: str, entity: str = None):
+        '''
+        Change the minimum level of an entity, or the default one
+
+        Parameters:
+        - level: str. The minimum level (DEBUG, INFO, WARNING or ERROR). None removes the level of the entity
+        - entity: str, default=None. The entity. If None, the default level is changed
+
+        Returns:
+        - None
+        '''
+
+        if entity is None:
+            self.level = LEVELS[level]
+        elif level is None:
+            self.levels.pop(entity, None)
+        else:
+            self.levels[entity] = LEVELS[level]
+
+
+    def get_levels(self) -> dict:
+        '''
+        Return the default level and the level of each entity
+
+        Returns:
+        - A dictionary with the default level and the levels of the entities
+        '''
+
+        names = {value: name for name, value in LEVELS.items() if name in ("DEBUG", "INFO", "WARNING", "ERROR")}
+        return {"level": names[self.level], "levels": {entity: names[value] for entity, value in self.levels.items()}}
+
+
+    def log(self, message: str, type: str = "INFO", entity: str = "REST Server", limit: int = None, bold: bool = False) -> bool:
+        '''
+        Queue a record to be written. It never blocks, if the queue is full the record is dropped
+
+        Parameters:
+        - message: str. The message to be logged
+        - type: str, default='INFO'. The type of the message (DEBUG, INFO, SUCCESS, HIGHLIGHT, WARNING or ERROR)
+        - entity: str, default='REST Server'. The entity that logs the message
+        - limit: int, default=None. The number of characters after which the message is truncated. If None, max_length
+        - bold: bool, default=False. If True, the message is bold on the console
+
+        Returns:
+        - True if the record was queued, False if it was filtered, sampled out or dropped
+        '''
+
+        if not self.is_enabled(type, entity):
+            self.filtered += 1
+            return False
+
+        every = self.sampling.get(entity)
+        if every and every > 1 and LEVELS.get(type, 20) < LEVELS["WARNING"]:
+            seen = self._seen[entity] = self._seen.get(entity, 0) + 1
+            if seen % every != 1:
+                self.sampled += 1
+                return False
+
+        message = str(message)
+        limit = self.max_length if limit is None else limit
+        if len(message) > limit:
+            message = message[:limit] + '...'
+            self.truncated += 1
+
+        if self._thread is None:
+            self.start()
+
+        try:
+            self._queue.put_nowait((time.time(), type, entity, message, bold))
+            self.queued += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+
+    def start(self):
+        '''
+        Start the writer thread, if it is not running. The queued records are written when the interpreter exits
+
+        Returns:
+        - None
+        '''
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+
+    def close(self):
+        '''
+        Write the queued records, close the log file and stop the writer thread. Blocking, call it from a thread in
+        async code
+
+        Returns:
+        - None
+        '''
+
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            atexit.unregister(self.close)
+            self._queue.put(None)
+            thread.join()
+
+
+    def _write_loop(self):
+        '''Write the queued records in batches until close() queues None'''
+
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for item in batch:
+                if item is None:
+                    running = False
+                    continue
+                timestamp, type, entity, message, bold = item
+                record_time = datetime.fromtimestamp(timestamp)
+                print(f'{record_time.time()} ({entity}) --> {colored(message, COLORS.get(type, "white"), attrs=["bold"] if bold else [])}')
+                lines.append(json.dumps({"time": record_time.isoformat(), "level": type, "entity": entity, "message": message}))
+
+            sys.stdout.flush()
+            if lines and self.path is not None:
+                try:
+                    self._write(lines)
+                except OSError as e:
+                    print(f'{datetime.now().time()} (Logs) --> {colored(f"Error writing the log file: {e}", "red")}')
+            self.written += len(lines)
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+    def _write(self, lines: list):
+        '''Append the lines to the log file, rotating it if it exceeds file_size'''
+
+        if self._file is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._file = open(os.path.join(self.path, LOG_FILE), "a", encoding="utf-8")
+
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+        if self._file.tell() >= self.file_size:
+            self._file.close()
+            self._file = None
+            base = os.path.join(self.path, LOG_FILE)
+            for index in range(self.file_count - 1, 0, -1):
+                if os.path.exists(f"{base}.{index}"):
+                    os.replace(f"{base}.{index}", f"{base}.{index + 1}")
+            if self.file_count > 0:
+                os.replace(base, f"{base}.1")
+            else:
+                os.remove(base)
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the levels and the counters of the logger
+
+        Returns:
+        - A dictionary with the levels, the records queued, written, dropped, filtered, sampled out and truncated
+        '''
+
+        return {**self.get_levels(), "path": self.path, "sampling": self.sampling, "queued": self.queued,
+                "written": self.written, "dropped": self.dropped, "filtered": self.filtered, "sampled": self.sampled,
+                "truncated": self.truncated, "pending": self._queue.qsize()}
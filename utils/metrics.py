@@ -0,0 +1,269 @@
+"""
+This module contains the Prometheus exporter of the Amari API.
+
+The metrics are rendered in the Prometheus text format from the samples of the background stats collector, so a scrape
+never reaches the callbox. The text is rendered again only when a newer sample is available.
+"""
+
+import re
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+METRIC_PREFIX = "amari"
+
+# Remote API fields that identify a UE or a cell and are exported as labels instead of values
+UE_LABELS = ("enb_ue_id", "ran_ue_id", "rnti", "imsi")
+CELL_LABELS = ("cell_id",)
+
+
+def sanitize_name(name: str) -> str:
+    '''
+    Convert a Remote API field into a valid Prometheus metric name fragment
+
+    Parameters:
+    - name: str. The field name
+
+    Returns:
+    - The sanitized name: str
+    '''
+
+    return re.sub(r'[^a-zA-Z0-9_]', '_', str(name))
+
+
+def escape_label(value) -> str:
+    '''
+    Escape a label value (backslash, double quote and new line)
+
+    Parameters:
+    - value: any. The label value
+
+    Returns:
+    - The escaped value: str
+    '''
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_sample_value(value):
+    '''
+    Return the sample value of a Remote API field: numbers as they are, booleans as 1 or 0
+
+    Parameters:
+    - value: any. The field value
+
+    Returns:
+    - The value: int | float, or None if the field is not numeric (e.g. a string, a list)
+    '''
+
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+def format_value(value: float) -> str:
+    '''
+    Format a sample value as Prometheus expects it (NaN, +Inf and -Inf are spelled out)
+
+    Parameters:
+    - value: float. The value
+
+    Returns:
+    - The formatted value: str
+    '''
+
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class MetricFamilies:
+    '''
+    This class groups the samples of each metric, so every metric is written once with its HELP and TYPE lines
+    '''
+
+    def __init__(self):
+        self.families = {}
+
+
+    def add(self, name: str, value, labels: dict = None, type: str = "gauge", help: str = None):
+        '''
+        Add a sample to a metric
+
+        Parameters:
+        - name: str. The metric name (without prefix)
+        - value: int | float. The value of the sample
+        - labels: dict, default=None. The labels of the sample
+        - type: str, default="gauge". The metric type (gauge or counter)
+        - help: str, default=None. The description of the metric. If None, the name is used
+
+        Returns:
+        - None
+        '''
+
+        name = f"{METRIC_PREFIX}_{sanitize_name(name)}"
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = {"type": type, "help": help or name, "samples": []}
+        family["samples"].append((labels or {}, float(value)))
+
+
+    def render(self) -> str:
+        '''
+        Render the metrics in the Prometheus text format
+
+        Returns:
+        - The exposition text: str
+        '''
+
+        lines = []
+        for name, family in self.families.items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for labels, value in family["samples"]:
+                if labels:
+                    label_text = ",".join(f'{sanitize_name(key)}="{escape_label(label)}"' for key, label in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {format_value(value)}")
+                else:
+                    lines.append(f"{name} {format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def add_stats_metrics(families: MetricFamilies, entity: str, response: dict):
+    '''
+    Add the metrics of a stats response (enb or mme): the CPU load, every numeric field of each cell and the counters
+
+    Parameters:
+    - families: MetricFamilies. The metrics being built
+    - entity: str. The entity of the response (enb or mme)
+    - response: dict. The stats response
+
+    Returns:
+    - None
+    '''
+
+    for key, value in response.items():
+        value = to_sample_value(value)
+        if value is not None and key != "message_id":
+            families.add(f"{entity}_{key}", value, help=f"{entity} stats field {key}")
+
+    for core, value in (response.get("cpu") or {}).items():
+        value = to_sample_value(value)
+        if value is not None:
+            families.add(f"{entity}_cpu_load", value, labels={"cpu": core}, help=f"{entity} CPU load (%)")
+
+    for cell_id, cell in (response.get("cells") or {}).items():
+        if not isinstance(cell, dict):
+            continue
+        for key, value in cell.items():
+            value = to_sample_value(value)
+            if value is not None:
+                families.add(f"cell_{key}", value, labels={"entity": entity, "cell": cell_id}, help=f"Cell stats field {key}")
+
+    for group, counters in (response.get("counters") or {}).items():
+        if not isinstance(counters, dict):
+            continue
+        for counter, value in counters.items():
+            value = to_sample_value(value)
+            if value is not None:
+                families.add(f"{entity}_{group}_total", value, labels={"name": counter}, type="counter", help=f"{entity} {group} counters")
+
+
+def add_ue_metrics(families: MetricFamilies, entity: str, response: dict):
+    '''
+    Add the metrics of a ue_get response: the number of UEs and every numeric field of each UE (ue_* metrics, labelled
+    with UE_LABELS) and of each cell of the UE (ue_cell_* metrics, labelled with UE_LABELS and the cell). Every sample of
+    a metric has the same labels, a label the UE does not have is empty
+
+    Parameters:
+    - families: MetricFamilies. The metrics being built
+    - entity: str. The entity of the response (enb)
+    - response: dict. The ue_get response
+
+    Returns:
+    - None
+    '''
+
+    ue_list = response.get("ue_list") or []
+    families.add("ue_count", len(ue_list), labels={"entity": entity}, help="UEs listed by ue_get")
+
+    for ue in ue_list:
+        if not isinstance(ue, dict):
+            continue
+        labels = {key: ue.get(key, "") for key in UE_LABELS}
+        for key, value in ue.items():
+            value = to_sample_value(value)
+            if value is not None and key not in UE_LABELS:
+                families.add(f"ue_{key}", value, labels=labels, help=f"UE field {key}")
+
+        for cell in ue.get("cells") or []:
+            if not isinstance(cell, dict):
+                continue
+            cell_labels = dict(labels, cell=cell.get("cell_id", ""))
+            for key, value in cell.items():
+                value = to_sample_value(value)
+                if value is not None and key not in CELL_LABELS:
+                    families.add(f"ue_cell_{key}", value, labels=cell_labels, help=f"UE cell field {key}")
+
+
+class MetricsExporter:
+    '''
+    This class renders the collector samples as Prometheus metrics, caching the text until a newer sample is available
+    '''
+
+    # Renderer of each collector source: source -> (entity, function)
+    SOURCES = {
+        "enb": ("enb", add_stats_metrics),
+        "ue": ("enb", add_ue_metrics),
+        "mme": ("mme", add_stats_metrics),
+    }
+
+    def __init__(self, collector):
+        '''
+        Parameters:
+        - collector: StatsCollector. The collector whose samples are exported
+        '''
+
+        self.collector = collector
+        self.renders = 0
+        self.scrapes = 0
+        self._key = None
+        self._body = None
+
+
+    def render(self) -> str:
+        '''
+        Return the metrics of the last successful sample of each source
+
+        Returns:
+        - The exposition text: str
+        '''
+
+        self.scrapes += 1
+        samples = {source: self.collector.latest(source) for source in self.SOURCES}
+        key = tuple(sample["timestamp"] if sample else None for sample in samples.values())
+        if key == self._key:
+            body = self._body
+        else:
+            families = MetricFamilies()
+            for source, (entity, function) in self.SOURCES.items():
+                sample = samples[source]
+                if sample is not None and isinstance(sample["response"], dict):
+                    function(families, entity, sample["response"])
+            body = families.render()
+            self._key, self._body = key, body
+            self.renders += 1
+
+        # The ages change on every scrape, they are not cached
+        families = MetricFamilies()
+        families.add("collector_up", int(self.collector.running), help="1 if the background stats collector is running")
+        now = time.time()
+        for source, sample in samples.items():
+            if sample is not None:
+                families.add("sample_age_seconds", now - sample["timestamp"], labels={"source": source}, help="Age of the last successful sample")
+        return families.render() + body
@@ -2,12 +2,68 @@
 Description: This module contains the parser for the Amari API.
 """
 
+import base64
+import binascii
 import json
 import re
+from itertools import chain
 from utils.utils import log_message
+from utils.timing import timings
+from utils.channel_log import ChannelLogStore
+
+# Key=value pairs of a PHY log line (e.g. "prb=0:51 mcs=27 snr=24.5 crc=OK")
+LOG_PAIR_PATTERN = re.compile(r'(\w+)=([\w:.]+)')
+
+# Start of a JSON object in the output of ws.js: a brace followed by a key or by the closing brace. Other braces (e.g. in
+# log lines) are not decoded
+JSON_DOCUMENT_PATTERN = re.compile(r'\{\s*["}]')
+
+# Decodes the documents in place (raw_decode from an index), the output is never sliced
+JSON_DECODER = json.JSONDecoder()
+
+
+def coerce_log_value(parsed: dict, key: str, value: str):
+    """Stores a log value with its type: "a:b" ranges as key_start/key_end integers, digits as int, "d.d" as float, else str."""
+    if ':' in value:
+        start, end = map(int, value.split(':'))
+        parsed[key + "_start"] = start
+        parsed[key + "_end"] = end
+    elif value.isdigit():
+        parsed[key] = int(value)
+    else:
+        head, dot, tail = value.partition('.')
+        if dot and head.isdecimal() and tail.isdecimal():
+            parsed[key] = float(value)
+        else:
+            parsed[key] = value
+
+
+class LogTokenCache(dict):
+    '''
+    Maps each whitespace-separated token of a log line to the (key, value) pairs it yields, e.g. "prb=0:51" to
+    (("prb_start", 0), ("prb_end", 51)). A token is parsed and coerced the first time it is seen only. The cache is
+    cleared when it reaches maxsize, so high-cardinality values (e.g. tbs) cannot grow it without bound.
+    '''
+
+    def __init__(self, maxsize: int = 100000):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __missing__(self, token):
+        if len(self) >= self.maxsize:
+            self.clear()
+        parsed = {}
+        for key, value in LOG_PAIR_PATTERN.findall(token):
+            coerce_log_value(parsed, key, value)
+        pairs = self[token] = tuple(parsed.items())
+        return pairs
+
 
 class Parser:
 
+    # Token cache of each channel (e.g. {"PDSCH": LogTokenCache(...)}). None holds the lines parsed without a channel
+    log_token_caches = {}
+
     @staticmethod
     def check_cli_error(code: int) -> bool:
         """Checks if the CLI command returned an error."""
@@ -27,24 +83,70 @@ class Parser:
         
 
     @staticmethod
-    def parse_response(data: str) -> dict:
-        """Parses the response from the CLI command."""
-        start_idx = data.find("{")  # Find the start of the actual JSON content
-        end_idx = data.rfind("}") + 1  # Find the end of the actual JSON content
-        json_str = data[start_idx:end_idx]
+    def iter_json_documents(data: str):
+        """Yields the JSON objects of a text (e.g. the output of ws.js) in order, skipping the text around and between them.
 
-        # Try parsing the JSON
-        try:
-            parsed_data = json.loads(json_str)
-
-            # Check if the response is valid
-            if Parser.check_response(parsed_data):
-                return parsed_data, True
-            else:
-                return parsed_data, False
-        except json.JSONDecodeError as e:
-            log_message(entity='Parser', message=f"Error parsing JSON: {e}", type='ERROR')
-            return {"error": f"Error parsing JSON: {e}"}
+        Each object is decoded in place from its opening brace and the walk resumes after its end, so neither the text nor
+        the nested objects are copied or decoded twice. A brace that does not start a valid object (e.g. in a log line
+        printed before the reply) is skipped and the search goes on after it.
+
+        Parameters:
+        - data: str. The text
+
+        Yields:
+        - Each JSON object: dict
+
+        Raises:
+        - json.JSONDecodeError: If the text has candidate objects but none of them decodes (e.g. the output was cut)
+        """
+        position = 0
+        decoded = False
+        error = None
+        while True:
+            match = JSON_DOCUMENT_PATTERN.search(data, position)
+            if match is None:
+                break
+            try:
+                document, position = JSON_DECODER.raw_decode(data, match.start())
+            except json.JSONDecodeError as e:
+                error = e
+                position = match.end()
+                continue
+            decoded = True
+            yield document
+
+        if not decoded and error is not None:
+            raise error
+
+
+    @staticmethod
+    def parse_response(data: str) -> tuple:
+        """Parses the response from the CLI command.
+
+        ws.js may print log lines and several JSON messages (e.g. notifications): the reply is the last JSON object of the
+        output. The output is walked once with iter_json_documents, skipping the text that is not a valid object.
+
+        Parameters:
+        - data: str. The output of the command. Its size is limited while it is read (Cli.run_process, PARSER_MAX_BYTES)
+
+        Returns:
+        - The reply and whether it is valid: tuple(dict, bool). On error (no object decodes), ({"error": ...}, False)
+        """
+        with timings.stage("parse"):
+            parsed_data = None
+            try:
+                for parsed_data in Parser.iter_json_documents(data):
+                    pass
+            except json.JSONDecodeError as e:
+                log_message(entity='Parser', message=f"Error parsing JSON: {e}", type='ERROR')
+                return {"error": f"Error parsing JSON: {e}"}, False
+
+        if parsed_data is None:
+            log_message(entity='Parser', message="No JSON object in the output", type='ERROR')
+            return {"error": "No JSON object in the output"}, False
+
+        # Check if the response is valid
+        return parsed_data, Parser.check_response(parsed_data)
         
     
     @staticmethod
@@ -61,45 +163,135 @@ class Parser:
         """Extracts PDSCH messages from the log data"""
         pdsch_messages = {}
         
-        # Check if response and logs exist
-        if log_data.get("status") and "response" in log_data and "logs" in log_data["response"]:
-            logs = log_data["response"]["logs"]
+        with timings.stage("extract"):
+            # Check if response and logs exist
+            if log_data.get("status") and "response" in log_data and "logs" in log_data["response"]:
+                logs = log_data["response"]["logs"]
+                channels = channel if isinstance(channel, str) else set(channel)
             
-            # Iterate through logs and filter specific channel messages
-            for log in logs:
-                if log.get("channel") in channel:
-                    if discard_si:
-                        if "si" not in log.get("data")[0]:
-                            pdsch_messages[log.get("timestamp")] = Parser.parse_log_data(log.get("data")[0])
-                        else:
-                            continue
-                    else:
-                        pdsch_messages[log.get("timestamp")] = Parser.parse_log_data(log.get("data")[0])
-
-                    pdsch_messages[log.get("timestamp")]["channel"] = log.get("channel")
+                # Iterate through logs and filter specific channel messages, each entry is parsed once
+                for log in logs:
+                    log_channel = log.get("channel")
+                    if log_channel not in channels:
+                        continue
+
+                    line = log.get("data")[0]
+                    if discard_si and "si" in line:
+                        continue
+
+                    parsed = Parser.parse_log_data(line, channel=log_channel)
+                    parsed["channel"] = log_channel
+                    pdsch_messages[log.get("timestamp")] = parsed
 
         return pdsch_messages
     
 
     @staticmethod
-    def parse_log_data(line: list[str]) -> dict:
-        """Parses the data field from the log file"""
-
-        parsed_dict = {}
-        # Regular expression to match key-value pairs
-        matches = re.findall(r'(\w+)=([\w:.]+)', line)
-
-        for key, value in matches:
-            # If the value contains ":", split it into start and end
-            if ':' in value:
-                start, end = map(int, value.split(':'))
-                parsed_dict[f"{key}_start"] = start
-                parsed_dict[f"{key}_end"] = end
-            elif value.isdigit():
-                parsed_dict[key] = int(value)  # Convert to integer
-            elif re.match(r'^\d+\.\d+$', value):  
-                parsed_dict[key] = float(value)  # Convert to float
-            else:
-                parsed_dict[key] = value  # Keep as string if not numeric
-
-        return parsed_dict
+    def build_channel_log_store(log_data, discard_si: bool = False, channel: list = ['PDSCH']) -> ChannelLogStore:
+        """Extracts the channel messages from the log data into an indexed store. Unlike extract_channel_log_messages,
+        entries sharing a timestamp (several UEs, cells or channels in the same TTI) are all kept."""
+        store = ChannelLogStore()
+
+        with timings.stage("extract"):
+            if log_data.get("status") and "response" in log_data and "logs" in log_data["response"]:
+                channels = channel if isinstance(channel, str) else set(channel)
+
+                for log in log_data["response"]["logs"]:
+                    log_channel = log.get("channel")
+                    if log_channel not in channels:
+                        continue
+
+                    line = log.get("data")[0]
+                    if discard_si and "si" in line:
+                        continue
+
+                    store.add(log.get("timestamp"), log.get("cell"), log.get("rnti"), log_channel, Parser.parse_log_data(line, channel=log_channel))
+
+        return store
+
+
+    @staticmethod
+    def parse_log_data(line: list[str], channel: str = None) -> dict:
+        """Parses the data field from the log file
+
+        A key=value pair never spans whitespace, so the line is split once and each token is looked up in the token
+        cache of the channel. Tokens repeat a lot between lines (e.g. symb=1:13, cw=0, mcs=27), only new ones are parsed.
+        """
+
+        cache = Parser.log_token_caches.get(channel)
+        if cache is None:
+            cache = Parser.log_token_caches[channel] = LogTokenCache()
+
+        return dict(chain.from_iterable(map(cache.__getitem__, line.split())))
+
+
+    @staticmethod
+    def encode_log_cursor(timestamp: float, skip: int) -> str:
+        """Encodes the position in the log stream as an opaque cursor.
+
+        Parameters:
+        - timestamp: float. The timestamp of the last log entry delivered
+        - skip: int. The number of entries with that timestamp already delivered
+
+        Returns:
+        - The cursor: str
+        """
+        payload = json.dumps({"t": timestamp, "n": skip}, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+
+    @staticmethod
+    def decode_log_cursor(cursor: str) -> tuple:
+        """Decodes a cursor built by encode_log_cursor.
+
+        Parameters:
+        - cursor: str. The cursor
+
+        Returns:
+        - A tuple with the timestamp and the number of entries with that timestamp already delivered
+
+        Raises:
+        - ValueError: If the cursor is malformed.
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return float(payload["t"]), int(payload["n"])
+        except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+    @staticmethod
+    def filter_new_logs(logs: list, timestamp: float = None, skip: int = 0) -> tuple:
+        """Keeps the log entries after a cursor position and computes the position after them.
+
+        The logs are expected in timestamp order, as returned by log_get. Entries older than the timestamp are dropped,
+        as well as the first skip entries with exactly that timestamp.
+
+        Parameters:
+        - logs: list. The log entries returned by log_get
+        - timestamp: float, default=None. The timestamp of the cursor. If None, every entry is new
+        - skip: int, default=0. The number of entries with that timestamp already delivered
+
+        Returns:
+        - A tuple with the new entries, and the timestamp and skip of the position after them
+        """
+        new_logs = []
+        seen = 0
+        for log in logs:
+            log_timestamp = log.get("timestamp")
+            if timestamp is not None and log_timestamp is not None:
+                if log_timestamp < timestamp:
+                    continue
+                if log_timestamp == timestamp and seen < skip:
+                    seen += 1
+                    continue
+            new_logs.append(log)
+
+        if not new_logs:
+            return new_logs, timestamp, skip
+
+        last_timestamp = new_logs[-1].get("timestamp")
+        last_skip = sum(1 for log in new_logs if log.get("timestamp") == last_timestamp)
+        if last_timestamp == timestamp:
+            last_skip += skip
+        return new_logs, last_timestamp, last_skip
@@ -0,0 +1,252 @@
+"""
+This module contains the native asyncio client for the AMARI Remote API.
+
+Each entity (enb, mme, ...) is served through one long-lived WebSocket connection. Requests are tagged with a
+message_id and the replies are matched back to the awaiting caller, so several requests can share the connection.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+import websockets
+from websockets.exceptions import ConnectionClosed, WebSocketException
+from config.configurator import ConfigManager
+from config.defaultParams import AMARI_WS_HOST, AMARI_WS_PORTS, AMARI_TIMEOUT
+from utils.utils import log_message
+from utils.timing import timings
+from utils.codec import codec
+
+
+class RemoteApiError(Exception):
+    '''
+    Raised when a message cannot be delivered to the Remote API or its reply does not arrive in time
+    '''
+
+
+class RemoteApiConnection:
+    '''
+    This class holds a persistent WebSocket connection to the Remote API of one entity and reconnects on its own
+    '''
+
+    def __init__(self, entity: str, url: str, retries: int = 3, backoff: float = 0.5):
+        '''
+        Parameters:
+        - entity: str. The network element the connection belongs to (e.g. enb)
+        - url: str. The WebSocket url of the Remote API (e.g. ws://127.0.0.1:9001)
+        - retries: int, default=3. The number of connection attempts before giving up
+        - backoff: float, default=0.5. The initial delay (seconds) between connection attempts. It doubles on each attempt
+        '''
+
+        self.entity = entity
+        self.url = url
+        self.retries = retries
+        self.backoff = backoff
+        self._websocket = None
+        self._reader = None
+        self._pending = {}
+        self._message_ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+
+    @property
+    def connected(self) -> bool:
+        '''True if the WebSocket is open'''
+        return self._websocket is not None
+
+
+    async def connect(self):
+        '''
+        Open the WebSocket connection (if it is not already open) and start the reader task
+
+        Returns:
+        - The open WebSocket. The reader task may drop it at any time, callers use this one instead of re-reading it
+        '''
+
+        async with self._connect_lock:
+            if self.connected:
+                return self._websocket
+
+            delay = self.backoff
+            for attempt in range(1, self.retries + 1):
+                try:
+                    self._websocket = await websockets.connect(self.url, max_size=None, open_timeout=5)
+                    break
+                except (OSError, asyncio.TimeoutError, WebSocketException) as e:
+                    log_message(entity="Remote API", message=f"Connection attempt {attempt} to {self.url} failed: {e}", type="WARNING")
+                    if attempt == self.retries:
+                        raise RemoteApiError(f"Unable to connect to {self.entity} Remote API at {self.url}: {e}") from e
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+            log_message(entity="Remote API", message=f"Connected to {self.entity} Remote API at {self.url}", type="SUCCESS")
+            self._reader = asyncio.create_task(self._read_loop(self._websocket))
+            return self._websocket
+
+
+    async def request(self, message: dict, timeout: float = AMARI_TIMEOUT) -> dict:
+        '''
+        Send a message to the Remote API and wait for its reply
+
+        Parameters:
+        - message: dict. The message to be sent (e.g. {"message": "config_get"})
+        - timeout: float, default=AMARI_TIMEOUT. The time (seconds) to wait for the reply
+
+        Returns:
+        - The reply of the Remote API: dict
+        '''
+
+        websocket = await self.connect()
+
+        message_id = next(self._message_ids)
+        payload = dict(message, message_id=message_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+
+        try:
+            await websocket.send(codec.dumps_str(payload))
+            return await asyncio.wait_for(future, timeout)
+        except ConnectionClosed as e:
+            self._drop(websocket)
+            raise RemoteApiError(f"Connection to {self.entity} Remote API closed: {e}") from e
+        except asyncio.TimeoutError as e:
+            raise RemoteApiError(f"No reply from {self.entity} Remote API after {timeout}s") from e
+        finally:
+            self._pending.pop(message_id, None)
+
+
+    async def close(self):
+        '''
+        Close the WebSocket connection and fail the pending requests
+
+        Returns:
+        - None
+        '''
+
+        websocket = self._websocket
+        self._drop(websocket)
+        if websocket is not None:
+            await websocket.close()
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+
+
+    async def _read_loop(self, websocket):
+        '''Dispatch the incoming messages to the awaiting requests until the connection is closed'''
+
+        try:
+            async for raw in websocket:
+                timings.count("upstream_messages")
+                timings.count("upstream_bytes", len(raw))
+                start = time.perf_counter()
+                try:
+                    data = codec.loads(raw)
+                except json.JSONDecodeError as e:
+                    log_message(entity="Remote API", message=f"Discarding malformed message from {self.entity}: {e}", type="WARNING")
+                    continue
+                # The reader is shared by the requests of the entity, the decoding is not attributed to one of them
+                timings.observe("upstream_decode", time.perf_counter() - start)
+
+                # Messages without a known message_id are notifications (e.g. ready, events)
+                future = self._pending.get(data.get("message_id")) if isinstance(data, dict) else None
+                if future is not None and not future.done():
+                    future.set_result(data)
+        except ConnectionClosed as e:
+            log_message(entity="Remote API", message=f"Connection to {self.entity} Remote API closed: {e}", type="WARNING")
+        finally:
+            self._drop(websocket)
+
+
+    def _drop(self, websocket):
+        '''Forget the given WebSocket (if still current) and fail every request waiting on it'''
+
+        if websocket is None or websocket is not self._websocket:
+            return
+
+        self._websocket = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RemoteApiError(f"Connection to {self.entity} Remote API lost"))
+
+
+class RemoteApiClient:
+    '''
+    This class keeps one RemoteApiConnection per entity. It does not require object instantiation but uses class attributes
+    '''
+
+    connections = {}
+
+
+    @staticmethod
+    def resolve_url(entity: str) -> str:
+        '''
+        Return the WebSocket url of an entity. The entity can be a name (e.g. enb) or a host:port pair, like in ws.js
+
+        Parameters:
+        - entity: str. The network element or host:port pair
+
+        Returns:
+        - The WebSocket url: str
+        '''
+
+        if ":" in entity:
+            return f"ws://{entity}"
+
+        host = ConfigManager.get_parameters('AMARI_WS_HOST', AMARI_WS_HOST)
+        ports = ConfigManager.get_parameters('AMARI_WS_PORTS', AMARI_WS_PORTS)
+        if entity not in ports:
+            raise RemoteApiError(f"Unknown Remote API entity: {entity}")
+        return f"ws://{host}:{ports[entity]}"
+
+
+    @classmethod
+    def get_connection(cls, entity: str) -> RemoteApiConnection:
+        '''
+        Return the connection of an entity, creating it on first use
+
+        Parameters:
+        - entity: str. The network element (e.g. enb)
+
+        Returns:
+        - The connection: RemoteApiConnection
+        '''
+
+        connection = cls.connections.get(entity)
+        if connection is None:
+            connection = RemoteApiConnection(entity=entity, url=cls.resolve_url(entity))
+            cls.connections[entity] = connection
+        return connection
+
+
+    @classmethod
+    async def request(cls, entity: str, message: dict, timeout: float = None) -> dict:
+        '''
+        Send a message to the Remote API of an entity and wait for its reply
+
+        Parameters:
+        - entity: str. The network element (e.g. enb)
+        - message: dict. The message to be sent
+        - timeout: float, default=None. The time (seconds) to wait for the reply. If None, AMARI_TIMEOUT is used
+
+        Returns:
+        - The reply of the Remote API: dict
+        '''
+
+        if timeout is None:
+            timeout = ConfigManager.get_parameters('AMARI_TIMEOUT', AMARI_TIMEOUT)
+        return await cls.get_connection(entity).request(message, timeout=timeout)
+
+
+    @classmethod
+    async def close(cls):
+        '''
+        Close every open connection
+
+        Returns:
+        - None
+        '''
+
+        connections, cls.connections = list(cls.connections.values()), {}
+        for connection in connections:
+            await connection.close()
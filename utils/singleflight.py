@@ -0,0 +1,69 @@
+"""
+This module contains the single-flight coalescing of identical concurrent requests.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    '''
+    This class runs at most one call per key at a time. Callers that arrive while a call with the same key is in flight
+    wait for it and receive the same result instead of starting their own.
+    '''
+
+    def __init__(self):
+        self._calls = {}
+        self.requests = 0
+        self.upstream = 0
+
+
+    @property
+    def coalesced(self) -> int:
+        '''The number of calls saved by joining an in-flight call'''
+        return self.requests - self.upstream
+
+
+    async def do(self, key, function):
+        '''
+        Run function() unless a call with the same key is already in flight, in which case its result is awaited
+
+        The call runs in its own task, so a cancelled caller does not cancel it for the others. It is only cancelled
+        once every caller waiting on it is gone.
+
+        Parameters:
+        - key: hashable. The identity of the call
+        - function: callable. A function that returns the coroutine to be run
+
+        Returns:
+        - The result of the call
+        '''
+
+        self.requests += 1
+        call = self._calls.get(key)
+        if call is None:
+            self.upstream += 1
+            task = asyncio.create_task(function())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._calls.pop(key, None) if self._calls.get(key) is call else None)
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and call[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the counters of the coalescing
+
+        Returns:
+        - A dictionary with the total requests, the upstream calls, the coalesced calls and the calls in flight
+        '''
+
+        return {"requests": self.requests, "upstream": self.upstream, "coalesced": self.coalesced, "in_flight": len(self._calls)}
@@ -0,0 +1,319 @@
+"""
+This module contains the append-only on-disk store of the sampled stats.
+
+Every stats snapshot is appended as one JSON line to a gzip segment of its source, under the daily directory of the
+data path: {API_DATA_PATH}/{date}/{source}-{first_timestamp_ms}.jsonl.gz. A segment is closed when it exceeds a size
+or an age, or when the day changes. The files are written by a background thread fed by a bounded queue, so the event
+loop never waits for the disk and a slow disk drops snapshots instead of growing the memory.
+
+The compressor is flushed (Z_SYNC_FLUSH) after each batch, so the open segment can be read while it is being written.
+"""
+
+import gzip
+import os
+import queue
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from itertools import islice
+from utils.utils import log_message
+from utils.codec import codec
+
+# Remote API messages whose responses are stored: (entity, message) -> (source, fields the message must have). Only complete
+# snapshots are stored (e.g. not a ue_get of one UE or without stats), so the aggregates of a source are not skewed
+STORED_MESSAGES = {
+    ("enb", "stats"): ("enb", {}),
+    ("enb", "ue_get"): ("ue", {"stats": True}),
+    ("mme", "stats"): ("mme", {}),
+}
+
+# Fields of the stored messages that do not filter their response (e.g. the stats options sent by /enb/get_stats)
+STORED_OPTIONAL_FIELDS = {"message", "message_id", "samples", "rf", "Initial_delay"}
+
+
+def get_stored_source(entity: str, message: dict) -> str:
+    '''
+    Return the source a message's response is stored as, or None if it is not stored
+
+    Parameters:
+    - entity: str. The entity the message is sent to (e.g. enb)
+    - message: dict. The Remote API message
+
+    Returns:
+    - The source (enb, ue or mme), or None if the message is not stored or filters its response: str
+    '''
+
+    stored = STORED_MESSAGES.get((entity, message.get("message")))
+    if stored is None:
+        return None
+    source, required = stored
+    if any(message.get(field) != value for field, value in required.items()):
+        return None
+    if any(field not in STORED_OPTIONAL_FIELDS and field not in required for field in message):
+        return None
+    return source
+
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class StatsStore:
+    '''
+    This class appends stats snapshots to daily, size and time rotated gzip segments and reads them back by time range
+    '''
+
+    def __init__(self, path: str, segment_size: int = 16 * 1024 * 1024, segment_seconds: float = 3600, queue_size: int = 1024):
+        '''
+        Parameters:
+        - path: str. The data path. A directory per day is created inside it
+        - segment_size: int, default=16 MiB. The compressed size (bytes) after which a segment is closed
+        - segment_seconds: float, default=3600. The age (seconds) after which a segment is closed
+        - queue_size: int, default=1024. The maximum number of snapshots waiting to be written before new ones are dropped
+        '''
+
+        self.path = path
+        self.segment_size = segment_size
+        self.segment_seconds = segment_seconds
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        # Open segment of each source: source -> {"file", "raw", "day", "opened"}
+        self._open = {}
+
+
+    def append(self, source: str, response, timestamp: float = None) -> bool:
+        '''
+        Queue a snapshot to be written. It never blocks, if the queue is full the snapshot is dropped
+
+        Parameters:
+        - source: str. The source of the snapshot (e.g. enb, ue, mme)
+        - response: dict. The Remote API response
+        - timestamp: float, default=None. The time (seconds since epoch) of the snapshot. If None, the current time is used
+
+        Returns:
+        - True if the snapshot was queued, False if it was dropped
+        '''
+
+        if self._thread is None:
+            self.start()
+
+        try:
+            self._queue.put_nowait((source, time.time() if timestamp is None else timestamp, response))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+
+    def start(self):
+        '''
+        Start the writer thread, if it is not running
+
+        Returns:
+        - None
+        '''
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._write_loop, name="stats-store", daemon=True)
+                self._thread.start()
+
+
+    def close(self):
+        '''
+        Write the queued snapshots, close the open segments and stop the writer thread. Blocking, call it from a thread
+        in async code
+
+        Returns:
+        - None
+        '''
+
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+    def _write_loop(self):
+        '''Write the queued snapshots in batches until close() queues None'''
+
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            touched = set()
+            for item in batch:
+                if item is None:
+                    running = False
+                    continue
+                try:
+                    self._write(*item)
+                    touched.add(item[0])
+                except (OSError, TypeError, ValueError) as e:
+                    self.dropped += 1
+                    log_message(entity="Stats store", message=f"Error writing a {item[0]} snapshot: {e}", type="ERROR")
+
+            for source in touched:
+                segment = self._open.get(source)
+                if segment is not None:
+                    segment["file"].flush(zlib.Z_SYNC_FLUSH)
+
+        for source in list(self._open):
+            self._close_segment(source)
+
+
+    def _write(self, source: str, timestamp: float, response):
+        '''Append a snapshot to the open segment of the source, rotating it if needed'''
+
+        day = datetime.fromtimestamp(timestamp).date()
+        segment = self._open.get(source)
+        if segment is not None and (segment["day"] != day or segment["raw"].tell() >= self.segment_size
+                                    or timestamp - segment["opened"] >= self.segment_seconds):
+            self._close_segment(source)
+            segment = None
+
+        if segment is None:
+            directory = os.path.join(self.path, str(day))
+            os.makedirs(directory, exist_ok=True)
+            raw = open(os.path.join(directory, f"{source}-{int(timestamp * 1000)}{SEGMENT_SUFFIX}"), "ab")
+            segment = self._open[source] = {"file": gzip.GzipFile(fileobj=raw, mode="ab"), "raw": raw, "day": day, "opened": timestamp}
+            self.segments += 1
+
+        line = codec.dumps({"timestamp": timestamp, "source": source, "response": response})
+        segment["file"].write(line + b"\n")
+        self.written += 1
+
+
+    def _close_segment(self, source: str):
+        '''Close the open segment of the source'''
+
+        segment = self._open.pop(source)
+        try:
+            segment["file"].close()
+        finally:
+            segment["raw"].close()
+
+
+    def list_segments(self, source: str, start: float = None, end: float = None) -> list:
+        '''
+        Return the segments of a source that may hold snapshots between start and end, in time order
+
+        Parameters:
+        - source: str. The source of the snapshots
+        - start: float, default=None. The start of the range (seconds since epoch). If None, the range is open
+        - end: float, default=None. The end of the range (seconds since epoch). If None, the range is open
+
+        Returns:
+        - A list with the path and the first timestamp (ms) of each segment: list[tuple[str, int]]
+        '''
+
+        if not os.path.isdir(self.path):
+            return []
+
+        first_day = date.min if start is None else datetime.fromtimestamp(start).date()
+        last_day = date.max if end is None else datetime.fromtimestamp(end).date()
+
+        segments = []
+        prefix = source + "-"
+        for name in os.listdir(self.path):
+            try:
+                day = date.fromisoformat(name)
+            except ValueError:
+                continue
+            if not first_day <= day <= last_day:
+                continue
+            directory = os.path.join(self.path, name)
+            for file_name in os.listdir(directory):
+                if file_name.startswith(prefix) and file_name.endswith(SEGMENT_SUFFIX):
+                    try:
+                        first = int(file_name[len(prefix):-len(SEGMENT_SUFFIX)])
+                    except ValueError:
+                        continue
+                    segments.append((os.path.join(directory, file_name), first))
+        segments.sort(key=lambda segment: segment[1])
+
+        # A segment ends where the next one starts: skip those entirely outside the range
+        selected = []
+        for i, (path, first) in enumerate(segments):
+            if end is not None and first > end * 1000:
+                break
+            following = segments[i + 1][1] if i + 1 < len(segments) else None
+            if start is not None and following is not None and following < start * 1000:
+                continue
+            selected.append((path, first))
+        return selected
+
+
+    def iterate(self, source: str, start: float = None, end: float = None):
+        '''
+        Yield the snapshots of a source between start and end (both included), in time order, one at a time. Blocking,
+        iterate it from a thread in async code. The open segment is read up to its last flushed snapshot
+
+        Parameters:
+        - source: str. The source of the snapshots
+        - start: float, default=None. The start of the range (seconds since epoch). If None, the range is open
+        - end: float, default=None. The end of the range (seconds since epoch). If None, the range is open
+
+        Yields:
+        - The snapshots, each with its timestamp, source and response: dict
+        '''
+
+        for path, _ in self.list_segments(source, start=start, end=end):
+            try:
+                with gzip.open(path, "rb") as f:
+                    for line in f:
+                        try:
+                            snapshot = codec.loads(line)
+                        except ValueError:
+                            # Last line of a segment cut by a crash
+                            break
+                        if start is not None and snapshot["timestamp"] < start:
+                            continue
+                        if end is not None and snapshot["timestamp"] > end:
+                            return
+                        yield snapshot
+            except EOFError:
+                # The segment is still open (or was not closed properly): it has no gzip trailer yet
+                pass
+            except (OSError, zlib.error) as e:
+                log_message(entity="Stats store", message=f"Error reading {path}: {e}", type="ERROR")
+
+
+    def read(self, source: str, start: float = None, end: float = None, limit: int = 1000) -> list:
+        '''
+        Read the snapshots of a source between start and end (both included), in time order. Blocking, call it from a
+        thread in async code
+
+        Parameters:
+        - source: str. The source of the snapshots
+        - start: float, default=None. The start of the range (seconds since epoch). If None, the range is open
+        - end: float, default=None. The end of the range (seconds since epoch). If None, the range is open
+        - limit: int, default=1000. The maximum number of snapshots returned (the first ones of the range)
+
+        Returns:
+        - The snapshots, each with its timestamp, source and response: list[dict]
+        '''
+
+        return list(islice(self.iterate(source, start=start, end=end), limit))
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the counters of the store
+
+        Returns:
+        - A dictionary with the snapshots written, dropped and queued, the segments created and open
+        '''
+
+        return {"path": self.path, "written": self.written, "dropped": self.dropped, "queued": self._queue.qsize(),
+                "segments": self.segments, "open": len(self._open)}
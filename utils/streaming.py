@@ -0,0 +1,167 @@
+"""
+This module contains the server-push streaming of stats to many subscribers.
+
+Subscribers of the same source and interval share one upstream sampling loop. Each subscriber owns a bounded queue,
+when a slow consumer falls behind its oldest frames are dropped instead of growing the memory.
+"""
+
+import asyncio
+import time
+from utils.cli import Cli
+from utils.utils import log_message
+
+# Remote API message sampled for each stream source: (entity, message)
+STREAM_SOURCES = {
+    "enb": ("enb", {"message": "stats"}),
+    "ue": ("enb", {"message": "ue_get", "stats": True}),
+    "mme": ("mme", {"message": "stats"}),
+}
+
+
+class Subscription:
+    '''
+    This class holds the frames pending for one subscriber
+    '''
+
+    def __init__(self, source: str, interval: float, fields: list = None, maxsize: int = 8):
+        '''
+        Parameters:
+        - source: str. The stream source (a key of STREAM_SOURCES)
+        - interval: float. The sampling interval in seconds
+        - fields: list, default=None. The top-level fields of the response to keep. If None, the whole response is sent
+        - maxsize: int, default=8. The maximum number of frames pending before the oldest ones are dropped
+        '''
+
+        self.source = source
+        self.interval = interval
+        self.fields = fields
+        self.dropped = 0
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+
+    def push(self, frame: dict):
+        '''
+        Queue a frame, dropping the oldest pending one if the queue is full
+
+        Parameters:
+        - frame: dict. The frame to be sent
+
+        Returns:
+        - None
+        '''
+
+        if self.fields and isinstance(frame.get("response"), dict):
+            frame = dict(frame, response={key: value for key, value in frame["response"].items() if key in self.fields})
+
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+
+    async def get(self) -> dict:
+        '''
+        Wait for the next frame
+
+        Returns:
+        - The frame: dict
+        '''
+
+        return await self.queue.get()
+
+
+class StatsBroadcaster:
+    '''
+    This class runs one sampling loop per (source, interval) while it has subscribers and fans the frames out
+    '''
+
+    def __init__(self):
+        self._streams = {}
+
+
+    def subscribe(self, source: str, interval: float, fields: list = None, maxsize: int = 8) -> Subscription:
+        '''
+        Subscribe to a stream, starting its sampling loop if it is the first subscriber
+
+        Parameters:
+        - source: str. The stream source (a key of STREAM_SOURCES)
+        - interval: float. The sampling interval in seconds
+        - fields: list, default=None. The top-level fields of the response to keep
+        - maxsize: int, default=8. The maximum number of frames pending for the subscriber
+
+        Returns:
+        - The subscription: Subscription
+        '''
+
+        if source not in STREAM_SOURCES:
+            raise ValueError(f"Unknown stream source: {source}")
+
+        subscription = Subscription(source=source, interval=interval, fields=fields, maxsize=maxsize)
+        key = (source, interval)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = {"subscribers": set(), "task": None, "samples": 0}
+            stream["task"] = asyncio.create_task(self._sample_loop(key, stream))
+            log_message(entity="Streaming", message=f"Started sampling {source} every {interval}s", type="INFO")
+        stream["subscribers"].add(subscription)
+        return subscription
+
+
+    def unsubscribe(self, subscription: Subscription):
+        '''
+        Remove a subscription. The sampling loop stops when its last subscriber is gone
+
+        Parameters:
+        - subscription: Subscription. The subscription to be removed
+
+        Returns:
+        - None
+        '''
+
+        key = (subscription.source, subscription.interval)
+        stream = self._streams.get(key)
+        if stream is None:
+            return
+
+        stream["subscribers"].discard(subscription)
+        if not stream["subscribers"]:
+            del self._streams[key]
+            stream["task"].cancel()
+            log_message(entity="Streaming", message=f"Stopped sampling {subscription.source} every {subscription.interval}s", type="INFO")
+
+
+    async def _sample_loop(self, key: tuple, stream: dict):
+        '''Sample the source at the interval and push the frames to every subscriber'''
+
+        source, interval = key
+        entity, message = STREAM_SOURCES[source]
+        while True:
+            start = time.monotonic()
+            try:
+                output = await Cli.execute_command(entity=entity, message=message)
+            except Exception as e:
+                log_message(entity="Streaming", message=f"Error sampling {source}: {e}", type="ERROR")
+                output = {"status": 500, "response": None, "error": str(e)}
+
+            frame = {"source": source, "timestamp": time.time(), "status": output["status"], "response": output["response"]}
+            if "error" in output:
+                frame["error"] = output["error"]
+
+            stream["samples"] += 1
+            for subscription in list(stream["subscribers"]):
+                subscription.push(frame)
+
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+
+    def get_stats(self) -> list:
+        '''
+        Return the active streams
+
+        Returns:
+        - A list with the source, interval, subscribers, samples taken and frames dropped of each stream
+        '''
+
+        return [{"source": source, "interval": interval, "subscribers": len(stream["subscribers"]), "samples": stream["samples"],
+                 "dropped": sum(subscription.dropped for subscription in stream["subscribers"])}
+                for (source, interval), stream in self._streams.items()]
@@ -0,0 +1,277 @@
+"""
+This module contains the hot-path timing instrumentation of the API.
+
+The time spent in each stage of a request (auth, subprocess, upstream, parse, extract, encode) is recorded in a
+latency histogram per stage, and the total time in a histogram per endpoint. The stages of the request being served
+are also kept in a context variable, so they can be returned in the Server-Timing header. Counters track the
+subprocesses spawned and the bytes received from the callbox.
+
+When the instrumentation is disabled, stage() returns a shared no-op context manager and count() returns at once, so
+the instrumented code only pays an attribute lookup.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+# Upper bounds (seconds) of the histogram buckets. The last bucket holds everything slower
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+NULL_STAGE = nullcontext()
+
+
+class Histogram:
+    '''
+    This class counts latencies in fixed buckets and estimates their percentiles
+    '''
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+    def percentile(self, q: float) -> float:
+        '''
+        Estimate a percentile, interpolating linearly within its bucket
+
+        Parameters:
+        - q: float. The percentile (0-100)
+
+        Returns:
+        - The estimated latency (seconds): float
+        '''
+
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the summary of the histogram (milliseconds) and its non-empty buckets
+
+        Returns:
+        - A dictionary with the count, mean, p50, p90, p99, max and the count of each bucket (keyed by upper bound)
+        '''
+
+        return {"count": self.count, "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+                "p50_ms": self.percentile(50) * 1000, "p90_ms": self.percentile(90) * 1000,
+                "p99_ms": self.percentile(99) * 1000, "max_ms": self.max * 1000,
+                "buckets": {(str(BUCKETS[index]) if index < len(BUCKETS) else "+Inf"): count
+                            for index, count in enumerate(self.counts) if count}}
+
+
+class RequestTimings:
+    '''
+    This class holds the stages of one request, for its Server-Timing header
+    '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = []
+        # Tasks started by the request (e.g. a collector) keep its context, they stop recording once it is answered
+        self.open = True
+
+
+    def add(self, name: str, seconds: float):
+        if self.open:
+            self.stages.append((name, seconds))
+
+
+    def server_timing(self) -> str:
+        '''
+        Return the Server-Timing header value: the total time of each stage and of the request (milliseconds)
+
+        Returns:
+        - The header value (e.g. "auth;dur=0.1, upstream;dur=12.5, total;dur=14.0"): str
+        '''
+
+        totals = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        totals["total"] = time.perf_counter() - self.start
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items())
+
+
+class Stage:
+    '''
+    Context manager timing a stage into its histogram and into the stages of the current request
+    '''
+
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name: str):
+        self.timings = timings
+        self.name = name
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.timings.observe(self.name, time.perf_counter() - self.start, request=True)
+        return False
+
+
+class Timings:
+    '''
+    This class keeps the latency histograms of the endpoints and the stages, and the counters
+    '''
+
+    def __init__(self, enabled: bool = False):
+        '''
+        Parameters:
+        - enabled: bool, default=False. If False, nothing is recorded
+        '''
+
+        self.enabled = enabled
+        self.current = ContextVar("request_timings", default=None)
+        self.reset()
+
+
+    def reset(self):
+        '''
+        Clear the histograms and the counters
+
+        Returns:
+        - None
+        '''
+
+        self.started = time.time()
+        self.endpoints = {}
+        self.stages = {}
+        self.counters = {}
+
+
+    def stage(self, name: str):
+        '''
+        Return a context manager timing a stage (e.g. with timings.stage("parse"): ...)
+
+        Parameters:
+        - name: str. The name of the stage
+
+        Returns:
+        - The context manager, a shared no-op one if the instrumentation is disabled
+        '''
+
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+
+    def observe(self, name: str, seconds: float, request: bool = False):
+        '''
+        Record the duration of a stage
+
+        Parameters:
+        - name: str. The name of the stage
+        - seconds: float. The duration
+        - request: bool, default=False. If True, the stage is also added to the Server-Timing of the current request.
+          Leave it False in tasks shared by several requests (e.g. the Remote API reader)
+
+        Returns:
+        - None
+        '''
+
+        if not self.enabled:
+            return
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = Histogram()
+        histogram.observe(seconds)
+        if request:
+            current = self.current.get()
+            if current is not None:
+                current.add(name, seconds)
+
+
+    def count(self, name: str, value: int = 1):
+        '''
+        Increase a counter (e.g. subprocess_spawns, upstream_bytes)
+
+        Parameters:
+        - name: str. The name of the counter
+        - value: int, default=1. The increment
+
+        Returns:
+        - None
+        '''
+
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def begin_request(self) -> RequestTimings:
+        '''
+        Start recording the stages of a request in the current context
+
+        Returns:
+        - The stages of the request, or None if the instrumentation is disabled: RequestTimings
+        '''
+
+        if not self.enabled:
+            return None
+        request = RequestTimings()
+        self.current.set(request)
+        return request
+
+
+    def end_request(self, request: RequestTimings, endpoint: str):
+        '''
+        Stop recording the stages of a request and record its total time in the histogram of its endpoint
+
+        Parameters:
+        - request: RequestTimings. The stages of the request (see begin_request)
+        - endpoint: str. The endpoint (e.g. GET /enb/get_config)
+
+        Returns:
+        - None
+        '''
+
+        request.open = False
+        if not self.enabled:
+            return
+        histogram = self.endpoints.get(endpoint)
+        if histogram is None:
+            histogram = self.endpoints[endpoint] = Histogram()
+        histogram.observe(time.perf_counter() - request.start)
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the histograms and the counters
+
+        Returns:
+        - A dictionary with the state, the time (seconds) since the last reset, the summary of each endpoint and stage,
+          and the counters
+        '''
+
+        return {"enabled": self.enabled, "since": time.time() - self.started,
+                "endpoints": {name: histogram.get_stats() for name, histogram in sorted(self.endpoints.items())},
+                "stages": {name: histogram.get_stats() for name, histogram in sorted(self.stages.items())},
+                "counters": dict(sorted(self.counters.items()))}
+
+
+# Shared by the whole API, enabled from the config (TIMING_ENABLED) or at runtime
+timings = Timings()
@@ -0,0 +1,257 @@
+"""
+This module contains the indexed snapshot of the UE tables of the gNB and the core.
+
+The enb and mme ue_get lists are fetched together and joined on the core UE id (amf_ue_id / mme_ue_id, or the IMSI).
+Each joined UE is indexed by ue_id (enb_ue_id / ran_ue_id), RNTI, IMSI and IMEI, so point lookups are dictionary reads.
+The snapshot is replaced as a whole on every refresh, readers never see a half-built index.
+"""
+
+import asyncio
+import time
+from utils.cli import Cli
+from utils.utils import log_message
+
+# Fields of the gNB and core UE entries joining them
+JOIN_KEYS = ("amf_ue_id", "mme_ue_id")
+
+# Fields of the gNB UE entries identifying the UE on the RAN
+UE_ID_KEYS = ("enb_ue_id", "ran_ue_id")
+
+
+class UeSnapshot:
+    '''
+    This class holds the joined UE entries of one refresh and their indexes
+    '''
+
+    def __init__(self, enb_list: list, mme_list: list, timestamp: float):
+        '''
+        Parameters:
+        - enb_list: list. The ue_list of the gNB ue_get response
+        - mme_list: list. The ue_list of the core ue_get response
+        - timestamp: float. The time (seconds since epoch) of the refresh
+        '''
+
+        self.timestamp = timestamp
+        self.ues = []
+        self.by_ue_id = {}
+        self.by_rnti = {}
+        self.by_imsi = {}
+        self.by_imei = {}
+
+        mme_by_key = {}
+        for mme_ue in mme_list:
+            for key in JOIN_KEYS + ("imsi",):
+                if mme_ue.get(key) is not None:
+                    mme_by_key[(key, mme_ue[key])] = mme_ue
+
+        joined = set()
+        for enb_ue in enb_list:
+            mme_ue = None
+            for key in JOIN_KEYS + ("imsi",):
+                if enb_ue.get(key) is not None and (key, enb_ue[key]) in mme_by_key:
+                    mme_ue = mme_by_key[(key, enb_ue[key])]
+                    joined.add(id(mme_ue))
+                    break
+            self.add(enb_ue, mme_ue)
+
+        # Core UEs without a gNB context (e.g. idle)
+        for mme_ue in mme_list:
+            if id(mme_ue) not in joined:
+                self.add(None, mme_ue)
+
+
+    def add(self, enb_ue: dict, mme_ue: dict):
+        '''
+        Add a joined UE and index it
+
+        Parameters:
+        - enb_ue: dict. The gNB entry of the UE, or None
+        - mme_ue: dict. The core entry of the UE, or None
+
+        Returns:
+        - None
+        '''
+
+        ue = {"enb": enb_ue, "mme": mme_ue}
+        self.ues.append(ue)
+
+        for entry in (enb_ue, mme_ue):
+            if entry is None:
+                continue
+            for key in UE_ID_KEYS:
+                if entry.get(key) is not None:
+                    self.by_ue_id.setdefault(entry[key], ue)
+            if entry.get("rnti") is not None:
+                self.by_rnti.setdefault(entry["rnti"], ue)
+            if entry.get("imsi") is not None:
+                self.by_imsi.setdefault(str(entry["imsi"]), ue)
+            if entry.get("imei") is not None:
+                self.by_imei.setdefault(str(entry["imei"]), ue)
+
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+
+    def lookup(self, ue_id: int = None, rnti: int = None, imsi: str = None, imei: str = None) -> list:
+        '''
+        Return the UEs matching every given identifier. If no identifier is given, every UE is returned
+
+        Parameters:
+        - ue_id: int, default=None. The enb_ue_id / ran_ue_id of the UE
+        - rnti: int, default=None. The RNTI of the UE
+        - imsi: str, default=None. The IMSI of the UE
+        - imei: str, default=None. The IMEI of the UE
+
+        Returns:
+        - The joined UEs, each with its gNB (enb) and core (mme) entry: list[dict]
+        '''
+
+        matches = None
+        for index, value in ((self.by_ue_id, ue_id), (self.by_rnti, rnti), (self.by_imsi, None if imsi is None else str(imsi)),
+                             (self.by_imei, None if imei is None else str(imei))):
+            if value is None:
+                continue
+            ue = index.get(value)
+            if ue is None or (matches is not None and matches is not ue):
+                return []
+            matches = ue
+
+        if matches is None:
+            return list(self.ues)
+        return [matches]
+
+
+class UeIndex:
+    '''
+    This class keeps the current UeSnapshot, refreshing it periodically (if an interval is set) and on demand
+    '''
+
+    def __init__(self, interval: float = 0):
+        '''
+        Parameters:
+        - interval: float, default=0. The periodic refresh interval in seconds. If 0, the snapshot is only refreshed on demand
+        '''
+
+        self.interval = interval
+        self.snapshot = None
+        self.refreshes = 0
+        self.lookups = 0
+        self.errors = 0
+        self._refreshing = None
+        self._task = None
+
+
+    async def refresh(self) -> UeSnapshot:
+        '''
+        Fetch the enb and mme UE lists and replace the snapshot. Concurrent calls share the same refresh
+
+        Returns:
+        - The new snapshot, or the previous one if both lists failed: UeSnapshot
+        '''
+
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh())
+            self._refreshing.add_done_callback(lambda _: setattr(self, "_refreshing", None))
+        return await asyncio.shield(self._refreshing)
+
+
+    async def _refresh(self) -> UeSnapshot:
+        '''Fetch both lists at the same time and build the snapshot'''
+
+        timestamp = time.time()
+        enb_output, mme_output = await asyncio.gather(
+            Cli.execute_command(entity="enb", message={"message": "ue_get", "stats": True}),
+            Cli.execute_command(entity="mme", message={"message": "ue_get"}),
+            return_exceptions=True)
+
+        lists = []
+        for entity, output in (("enb", enb_output), ("mme", mme_output)):
+            if isinstance(output, BaseException) or output["status"] is not True or not isinstance(output["response"], dict):
+                self.errors += 1
+                log_message(entity="UE index", message=f"Could not refresh the {entity} UE list: {output if isinstance(output, BaseException) else output.get('error', output['status'])}", type="ERROR")
+                lists.append(None)
+            else:
+                lists.append(output["response"].get("ue_list") or [])
+
+        if lists == [None, None]:
+            return self.snapshot
+
+        # A failed list keeps its entries of the previous snapshot, which also keeps its age (the next lookup retries)
+        if self.snapshot is not None and None in lists:
+            lists = [current if current is not None else [ue[entity] for ue in self.snapshot.ues if ue[entity] is not None]
+                     for current, entity in zip(lists, ("enb", "mme"))]
+            timestamp = self.snapshot.timestamp
+        self.snapshot = UeSnapshot(enb_list=lists[0] or [], mme_list=lists[1] or [], timestamp=timestamp)
+        self.refreshes += 1
+        return self.snapshot
+
+
+    async def get_snapshot(self, max_age: float = None) -> UeSnapshot:
+        '''
+        Return the snapshot, refreshing it first if it is missing or older than max_age
+
+        Parameters:
+        - max_age: float, default=None. The maximum age (seconds) of the snapshot. If None, any age is accepted
+
+        Returns:
+        - The snapshot, or None if it could never be fetched: UeSnapshot
+        '''
+
+        self.lookups += 1
+        snapshot = self.snapshot
+        if snapshot is None or (max_age is not None and snapshot.age > max_age):
+            snapshot = await self.refresh()
+        return snapshot
+
+
+    def start(self):
+        '''
+        Start the periodic refresh, if an interval is set and it is not running
+
+        Returns:
+        - None
+        '''
+
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+
+    async def stop(self):
+        '''
+        Stop the periodic refresh
+
+        Returns:
+        - None
+        '''
+
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+    async def _refresh_loop(self):
+        '''Refresh the snapshot at the interval'''
+
+        while True:
+            start = time.monotonic()
+            try:
+                await self.refresh()
+            except Exception as e:
+                log_message(entity="UE index", message=f"Error refreshing the UE index: {e}", type="ERROR")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+
+
+    def get_stats(self) -> dict:
+        '''
+        Return the state of the index
+
+        Returns:
+        - A dictionary with the UEs indexed, the age of the snapshot, the refreshes, lookups and errors
+        '''
+
+        snapshot = self.snapshot
+        return {"ues": len(snapshot.ues) if snapshot else 0, "age": snapshot.age if snapshot else None, "interval": self.interval,
+                "refreshes": self.refreshes, "lookups": self.lookups, "errors": self.errors}
@@ -14,7 +14,19 @@ import os
 import re
 from datetime import datetime
 from config.configurator import ConfigManager
-from termcolor import colored
+from config.defaultParams import (API_DATA_PATH, LOG_LEVEL, LOG_LEVELS, LOG_MAX_LENGTH, LOG_SAMPLING, LOG_QUEUE_SIZE, LOG_FILE_SIZE,
+                                  LOG_FILE_COUNT)
+from utils.logs import LogWriter
+
+# Writes the log_message records from a background thread (console and {API_DATA_PATH}/logs/api.jsonl)
+logger = LogWriter(path=f"{ConfigManager.get_parameters('API_DATA_PATH', API_DATA_PATH)}/logs",
+                   level=ConfigManager.get_parameters('LOG_LEVEL', LOG_LEVEL),
+                   levels=ConfigManager.get_parameters('LOG_LEVELS', LOG_LEVELS),
+                   max_length=ConfigManager.get_parameters('LOG_MAX_LENGTH', LOG_MAX_LENGTH),
+                   sampling=ConfigManager.get_parameters('LOG_SAMPLING', LOG_SAMPLING),
+                   queue_size=ConfigManager.get_parameters('LOG_QUEUE_SIZE', LOG_QUEUE_SIZE),
+                   file_size=ConfigManager.get_parameters('LOG_FILE_SIZE', LOG_FILE_SIZE),
+                   file_count=ConfigManager.get_parameters('LOG_FILE_COUNT', LOG_FILE_COUNT))
 
 def get_timestamp():
     '''
@@ -101,9 +113,9 @@ def create_dir(path: str):
     
     if not check_dir(path):
         os.mkdir(path)
-        print("The directory {} has been created".format(path))
+        log_message(message=f"The directory {path} has been created")
     else:
-        print("The directory {} already exists".format(path))
+        log_message(message=f"The directory {path} already exists")
 
 
 def check_local_data_path(path: str):
@@ -274,41 +286,20 @@ def parse_string_to_int(input_str):
     return ""
 
 
-def log_message(message: str, type: str = 'INFO', entity: str = 'REST Server', limit: int = 1000, bold: bool = False):
+def log_message(message: str, type: str = 'INFO', entity: str = 'REST Server', limit: int = None, bold: bool = False):
     '''
-    This method logs a message to the console
+    This method logs a message to the console and the log file. The record is queued for the background writer, so
+    it never blocks
 
     Parameters:
     - message: str. The message to be logged
-    - type: str, default='INFO'. The type of the message (INFO or ERROR)
+    - type: str, default='INFO'. The type of the message (DEBUG, INFO, SUCCESS, HIGHLIGHT, WARNING or ERROR)
     - entity: str, default='REST Server'. The entity that logs the message
-    - limit: int, default=1000. The limit of the message to be logged
+    - limit: int, default=None. The limit of the message to be logged. If None, LOG_MAX_LENGTH is used
     - bold: bool, default=False. If True, the message is bold
 
     Returns:
     - None
     '''
-    
-    if len(message) > limit:
-        message = message[:limit] + '...'
 
-    if bold:
-        attr = ['bold']
-    else:
-        attr = []
-
-    # Log the message
-    if type == 'INFO':
-        print(f'{get_time()} ({entity}) --> {colored(message, "cyan", attrs=attr)}')
-    elif type == 'ERROR':
-        print(f'{get_time()} ({entity}) --> {colored(message, "red", attrs=attr)}')
-    elif type == 'WARNING':
-        print(f'{get_time()} ({entity}) --> {colored(message, "yellow", attrs=attr)}')
-    elif type == 'DEBUG':
-        print(f'{get_time()} ({entity}) --> {colored(message, "blue", attrs=attr)}')
-    elif type == 'HIGHLIGHT':
-        print(f'{get_time()} ({entity}) --> {colored(message, "magenta", attrs=attr)}')
-    elif type == 'SUCCESS':
-        print(f'{get_time()} ({entity}) --> {colored(message, "green", attrs=attr)}')
-    else:        
-        print(f'{get_time()} ({entity}) --> {colored(message, "white", attrs=attr)}')
\ No newline at end of file
+    logger.log(message=message, type=type, entity=entity, limit=limit, bold=bold)